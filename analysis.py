@@ -4,6 +4,10 @@ By Anders Ohrn, March 2020.
 No guarantee of being bug free
 
 '''
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import os
+
 import pandas as pd
 import numpy as np
 from bokeh.models import ColumnDataSource, SingleIntervalTicker, Range1d
@@ -11,15 +15,16 @@ from bokeh.plotting import figure, show
 from bokeh.layouts import column
 from bokeh.palettes import brewer
 
-def _bool_to_int(row):
-    if row['0'] == 'True':
-        ret_int = 1
-    elif row['0'] == 'False':
-        ret_int = 0
-    else:
-        raise ValueError('Invalid state variable value: {}'.format(row['0']))
-    row['0'] = ret_int
-    return row
+from graph_growth_classes import TrajectorySink
+from columnar_output import read_state_table
+from transition_log import reconstruct_counts
+from trajectory_analytics import EncodedTrajectory, frequencies
+
+_STATE_VALUES = {'True' : True, 'False' : False}
+
+def _parse_state_value(value):
+    '''Value of the long-format state data, with the state flags parsed as booleans and other values kept as read'''
+    return _STATE_VALUES.get(value, value)
 
 def select_caution(df, val_selector):
     '''Select only individuals who has a particular caution level
@@ -32,64 +37,187 @@ def select_caution(df, val_selector):
 
     return df_filtered
 
-def property_count_progression(growth_file, property_label, filter_caution_selector=None):
-    '''Construct property count progression data
+def _caution_names(growth_file, filter_caution_selector, chunksize):
+    '''Names of the persons of a caution level selected as by `select_caution`, read in chunks of rows'''
+
+    reader = pd.read_csv(growth_file, chunksize=chunksize, usecols=['name', 'property', '0'],
+                         dtype={'name' : 'category', 'property' : 'category', '0' : 'category'})
+
+    names_selected = set()
+    for df_chunk in reader:
+        df_caution = df_chunk.loc[df_chunk['property'] == 'caution_interaction']
+        caution = df_caution['0'].astype(str)
+        is_selected = dict([(value, bool(filter_caution_selector(float(value)))) for value in caution.unique()])
+        names_selected.update(df_caution['name'].loc[caution.map(is_selected).astype(bool)])
+
+    return names_selected
+
+def property_count_progression(growth_file, property_label, filter_caution_selector=None, chunksize=1000000):
+    '''Construct property count progression data. The data file is streamed in chunks of rows, of which only the rows
+    of the property, and of the caution level if filtered, are kept, and the counts per day are accumulated chunk by
+    chunk, so memory is bounded by the chunk size. If filtered, the persons of the caution level are first found by
+    a separate pass over the file, so the rows can be in any order
+
+    '''
+    names_selected = None
+    if not filter_caution_selector is None:
+        names_selected = _caution_names(growth_file, filter_caution_selector, chunksize)
+
+    reader = pd.read_csv(growth_file, chunksize=chunksize,
+                         dtype={'name' : 'category', 'time_coordinate' : np.int64, 'property' : 'category'},
+                         converters={'0' : _parse_state_value})
+
+    count = pd.Series(dtype=np.int64)
+    for df_chunk in reader:
+        df_state = df_chunk.loc[df_chunk['property'] == property_label]
+        if not names_selected is None:
+            df_state = df_state.loc[df_state['name'].isin(names_selected)]
+
+        is_flag = df_state['0'].map(type) == bool
+        if not is_flag.all():
+            raise ValueError('Invalid state variable value: {}'.format(df_state['0'].loc[~is_flag].iloc[0]))
+
+        is_true = df_state['0'].astype(np.int64)
+        count = count.add(is_true.groupby(df_state['time_coordinate']).sum(), fill_value=0)
+
+    df_count = count.astype(np.int64).rename('N_people_Yes').rename_axis('time_coordinate').reset_index()
+    df_count['property'] = property_label
+
+    return df_count[['time_coordinate', 'property', 'N_people_Yes']]
+
+def count_progression(counts_file, property_label, filter_caution_selector=None):
+    '''Construct property count progression data from a counts file, in the same layout as
+    `property_count_progression`
+
+    '''
+    df = pd.read_csv(counts_file)
+
+    if not filter_caution_selector is None and not 'caution_interaction' in df.columns:
+        raise ValueError('Counts file {} not stratified by caution'.format(counts_file))
+
+    return _counts_to_progression(df, property_label, filter_caution_selector)
+
+def batch_count_progression(batch_counts_file, property_label, replica=None):
+    '''Construct property count progression data of each replica from a batch counts file, in the same layout as
+    `property_count_progression` with the added column 'replica', or of one replica only. A replica that ended
+    before the last day of the batch keeps its final count
+
+    '''
+    df = pd.read_csv(batch_counts_file)
+    if not replica is None:
+        df = df.loc[df['replica'] == replica]
+
+    df_count = df.pivot(index='time_coordinate', columns='replica', values=property_label).ffill()
+    df_count = df_count.stack().rename('N_people_Yes').astype(np.int64).reset_index()
+    df_count['property'] = property_label
+
+    return df_count[['time_coordinate', 'replica', 'property', 'N_people_Yes']]
+
+def event_count_progression(events_file, property_label, filter_caution_selector=None,
+                            delete_dead_from_social_graph=False):
+    '''Construct property count progression data from a transition event log, in the same layout as
+    `property_count_progression`
 
     '''
-    def _true_counter(x):
-        return x.loc[x == 'True'].count()
+    df = reconstruct_counts(events_file, caution_strata=not filter_caution_selector is None,
+                            delete_dead_from_social_graph=delete_dead_from_social_graph)
 
-    def _false_counter(x):
-        return x.loc[x == 'False'].count()
+    return _counts_to_progression(df, property_label, filter_caution_selector)
 
-    df = pd.read_csv(growth_file)
+def _counts_to_progression(df, property_label, filter_caution_selector):
+    '''Property count progression data from state counts in the layout of `World.report_counts`, or from state
+    flags in the layout of `World.report_table`, which are counted the same way'''
 
     if not filter_caution_selector is None:
-        df_filtered = select_caution(df, filter_caution_selector)
-    else:
-        df_filtered = df
+        df = df.loc[df['caution_interaction'].apply(filter_caution_selector).astype(bool)]
 
-    df_state = df_filtered.loc[df_filtered['property'].isin(['contagious','infected','dead','immune','quarantined','revealed'])]
-    gg = df_state.groupby(['time_coordinate','property'])['0'].agg([_true_counter, _false_counter])
-    df_state_agg = gg.rename(columns={'_true_counter' : 'N_people_Yes', '_false_counter' : 'N_people_No'}).reset_index()
-    df_property_progression = df_state_agg.loc[df_state_agg['property'] == property_label]
+    df_count = df.groupby('time_coordinate')[property_label].sum().reset_index()
+    df_count = df_count.rename(columns={property_label : 'N_people_Yes'})
+    df_count['property'] = property_label
 
-    return df_property_progression[['time_coordinate', 'property', 'N_people_Yes']]
+    return df_count[['time_coordinate', 'property', 'N_people_Yes']]
 
-def state_analysis_main(state_files, slice_name='infected', data_names=None,
-                        shifter_key=None, shifter_kwargs={},
-                        group_indeces=None, agg_func=None):
-    '''Main analysis function for the state progression data
+def state_table_progression(state_path, property_label, filter_caution_selector=None, run=None):
+    '''Construct property count progression data from a Parquet file of typed state data, or from one run of a
+    dataset directory partitioned by run, in the same layout as `property_count_progression`
 
     '''
-    if data_names is None:
-        data_names = state_files
+    columns = ['time_coordinate', property_label]
+    if not filter_caution_selector is None:
+        columns.append('caution_interaction')
+    df = read_state_table(state_path, columns=columns, run=run)
+
+    return _counts_to_progression(df, property_label, filter_caution_selector)
+
+def map_files(reduce_file, files, n_workers=None):
+    '''Apply the reduction `reduce_file` to each of the files on a pool of `n_workers` processes, by default one per
+    CPU, and return the reductions in the order of the files. The files are parsed and reduced in the worker
+    processes, so only the reductions are sent back. With one worker, or one file, the files are reduced in turn
+    without a pool
+
+    '''
+    if n_workers is None:
+        n_workers = os.cpu_count()
+    n_workers = min(n_workers, len(files))
+
+    if n_workers <= 1:
+        return [reduce_file(file) for file in files]
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        return list(executor.map(reduce_file, files))
 
-    dfs_process = []
-    for k, file in enumerate(state_files):
-        df_file = property_count_progression(file, slice_name)
+def state_progression(state_file, slice_name, shifter_key=None, shifter_kwargs={}):
+    '''Property count progression of a state file of any of the output formats, aligned in time by the shifter. The
+    progression of a batch counts file is the mean over its replicas
 
-        # Align property count progression data
-        if shifter_key is None:
-            pass
+    '''
+    if state_file.endswith('_batch_counts.csv'):
+        df_file = batch_count_progression(state_file, slice_name)
+        df_file = df_file.groupby(['time_coordinate', 'property'])['N_people_Yes'].mean().reset_index()
+    elif state_file.endswith('_counts.csv'):
+        df_file = count_progression(state_file, slice_name)
+    elif state_file.endswith('_events.csv'):
+        df_file = event_count_progression(state_file, slice_name)
+    elif state_file.endswith('.parquet'):
+        df_file = state_table_progression(state_file, slice_name)
+    else:
+        df_file = property_count_progression(state_file, slice_name)
+
+    # Align property count progression data
+    if shifter_key is None:
+        pass
+
+    elif shifter_key == 'first_above_thrs':
+        try:
+            day_shift = df_file.loc[df_file['N_people_Yes'] > shifter_kwargs['thrs']].iloc[0]['time_coordinate']
+        except IndexError:
+            raise RuntimeError('The count value {} never exceeded for data in file {}'.format(shifter_kwargs['thrs'], state_file))
 
-        elif shifter_key == 'first_above_thrs':
-            try:
-                day_shift = df_file.loc[df_file['N_people_Yes'] > shifter_kwargs['thrs']].iloc[0]['time_coordinate']
-            except IndexError:
-                raise RuntimeError('The count value {} never exceeded for data in file {}'.format(shifter_kwargs['thrs'], file))
+        df_file['time_coordinate'] = df_file['time_coordinate'] - day_shift
 
-            df_file['time_coordinate'] = df_file['time_coordinate'] - day_shift
+    elif shifter_key == 'max':
+        idx_max = df_file['N_people_Yes'].idxmax()
+        day_shift = df_file['time_coordinate'][idx_max]
+        df_file['time_coordinate'] = df_file['time_coordinate'] - day_shift
 
-        elif shifter_key == 'max':
-            idx_max = df_file['N_people_Yes'].idxmax()
-            day_shift = df_file['time_coordinate'][idx_max]
-            df_file['time_coordinate'] = df_file['time_coordinate'] - day_shift
+    else:
+        raise ValueError('Unknown shifter_key value: {}'.format(shifter_key))
+
+    return df_file
+
+def state_analysis_main(state_files, slice_name='infected', data_names=None,
+                        shifter_key=None, shifter_kwargs={},
+                        group_indeces=None, agg_func=None, n_workers=None):
+    '''Main analysis function for the state progression data. The files are reduced to property count progressions
+    on a pool of `n_workers` processes
 
-        else:
-            raise ValueError('Unknown shifter_key value: {}'.format(shifter_key))
+    '''
+    if data_names is None:
+        data_names = state_files
 
-        dfs_process.append(df_file)
+    dfs_process = map_files(partial(state_progression, slice_name=slice_name, shifter_key=shifter_key,
+                                    shifter_kwargs=shifter_kwargs),
+                            state_files, n_workers)
 
     # Aggregate data groups
     if not group_indeces is None:
@@ -129,46 +257,63 @@ def state_analysis_main(state_files, slice_name='infected', data_names=None,
 
     show(p)
 
+def read_trajectory(traj_file):
+    '''Read the transmission trajectory file of a simulation, in the csv or the binary format, into a
+    DataFrame with the columns of the csv format
+
+    '''
+    if not traj_file.endswith('.bin'):
+        return pd.read_csv(traj_file)
+
+    records = np.fromfile(traj_file, dtype=TrajectorySink.binary_dtype)
+    if len(records) == 0:
+        return pd.DataFrame(columns=TrajectorySink.binary_dtype.names)
+    names = pd.read_csv(traj_file + '.names', header=None).iloc[:, 0].to_numpy()
+    df = pd.DataFrame(records)
+    df['transmitter'] = names[records['transmitter']]
+    df['receiver'] = names[records['receiver']]
+
+    return df.astype({'time since transmitter infected' : int, 'day counter' : int})
+
+def trajectory_reductions(traj_file, nth_infected=200):
+    '''Empirical frequencies of the number of transmissions by the earliest `nth_infected` infected, and of the lag
+    from infection to transmission, of a trajectory file
+
+    '''
+    trajectory = EncodedTrajectory.from_file(traj_file)
+
+    # Frequency of number of infection transmits, for the count zero and for every count of any transmitter. Without
+    # any transmission the frequencies are undefined
+    hist_transmits = trajectory.offspring_histogram(nth_infected)
+    if len(hist_transmits) == 0:
+        freq_transmits = np.array([np.nan])
+    else:
+        freq_transmits = frequencies(hist_transmits)
+    n_transmits = np.flatnonzero(freq_transmits)
+    n_transmits = np.concatenate([[0], n_transmits[n_transmits > 0]]).astype(np.int64)
+    df_transmit_events = pd.DataFrame({'empirical frequency' : freq_transmits[n_transmits]},
+                                      index=pd.Index(n_transmits, name='receiver'))
+
+    # Frequency of lag between infection and infection transmits, for every lag of any transmit
+    freq_lags = frequencies(trajectory.generation_interval_histogram(nth_infected))
+    lags = np.flatnonzero(freq_lags)
+    df_transmit_lags = pd.DataFrame({'empirical frequency' : freq_lags[lags]},
+                                    index=pd.Index(lags, name='time since transmitter infected'))
+
+    return df_transmit_events, df_transmit_lags
+
 def trajectory_analysis_main(traj_files, group_indeces=None, nth_infected=200,
-                             data_names=None):
-    '''Main analysis function for the trajectory data
+                             data_names=None, n_workers=None):
+    '''Main analysis function for the trajectory data. The files are reduced to frequency histograms on a pool of
+    `n_workers` processes
 
     '''
     if data_names is None:
         data_names = traj_files
 
-    dfs_transmit_events = []
-    dfs_transmit_lags = []
-    for k, file in enumerate(traj_files):
-        df = pd.read_csv(file)
-
-        # Select the earliest infections
-        df_early = df.iloc[:nth_infected]
-
-        # Determine cases infected but never transmitting
-        s_receive = set(df_early['receiver'].array)
-        s_transmit_all = set(df['transmitter'].array)
-        receive_never_transmit = s_receive - s_transmit_all
-        df_index = pd.Index(receive_never_transmit, name='receiver')
-        df_0_count = pd.DataFrame(data=[0] * len(df_index), index=df_index, columns=['day counter'])
-        n_0_count = len(df_0_count)
-
-        # Determine cases infected and transmitting and how many times
-        df_transmits = df.loc[df['transmitter'].isin(df_early['receiver'])]
-        df_transmits_per_transmitter = df_transmits.groupby(['transmitter']).count()
-        df_transmits_count = df_transmits_per_transmitter.groupby('receiver').count()
-        df_transmits_count.loc[0] = n_0_count
-
-        # Normalize so empirical frequency of number of infection transmits is obtained
-        total_count = df_transmits_count['day counter'].sum()
-        df_transmits_count['empirical frequency'] = df_transmits_count['day counter'].div(total_count)
-        dfs_transmit_events.append(df_transmits_count.drop(['time since transmitter infected', 'day counter'], axis=1))
-
-        # Compute empirical frequency of lag between infection transmits
-        df_transmits_lag = df_transmits.groupby('time since transmitter infected').count()
-        total_count = df_transmits_lag['day counter'].sum()
-        df_transmits_lag['empirical frequency'] = df_transmits_lag['day counter'].div(total_count)
-        dfs_transmit_lags.append(df_transmits_lag.drop(['transmitter', 'receiver', 'day counter'], axis=1))
+    reductions = map_files(partial(trajectory_reductions, nth_infected=nth_infected), traj_files, n_workers)
+    dfs_transmit_events = [df_events for df_events, _ in reductions]
+    dfs_transmit_lags = [df_lags for _, df_lags in reductions]
 
     # Aggregate data groups
     if not group_indeces is None:
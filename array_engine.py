@@ -0,0 +1,805 @@
+'''Array-backed engine for the disease spreading in the world. The disease state of all persons is held in NumPy
+arrays and each day of the disease is progressed by vectorized passes over the persons and the social graph edges.
+
+The classes of the engine are drop-in replacements for `World` and `Disease` of `graph_growth_classes`, with the
+same day-step semantics. Individual persons are available as thin views over the arrays, with the same query and
+state transition methods as `Person`.
+
+No guarantee of being bug free
+
+'''
+import numpy as np
+import pandas as pd
+
+from graph_growth_classes import World, Disease, NO_TIME_STAMP, STATE_LABELS, TRANSITION_LABELS
+
+class Population():
+    '''Disease state, state transition time stamps and predispositions of all persons in the world, held as arrays
+    indexed by person'''
+
+    def transition(self, label, inds):
+        '''Make state transition for the persons of the given indeces and record the time stamp of the transition'''
+
+        if label == 'infect':
+            self.infected[inds] = True
+        elif label == 'activate':
+            self.contagious[inds] = True
+        elif label == 'reveal':
+            self.revealed[inds] = True
+        elif label == 'succumb':
+            self.dead[inds] = True
+            self._reset(inds)
+        elif label == 'recover':
+            self._reset(inds)
+        elif label == 'immunize':
+            self.immune[inds] = True
+        elif label == 'quarantine':
+            self.quarantined[inds] = True
+        else:
+            raise RuntimeError('Unrecognized state transition label {}'.format(label))
+
+        self.time_stamp[TRANSITION_LABELS.index(label), inds] = self.time_coordinate
+
+        for observer in self.transition_observers:
+            observer(self, label, inds)
+
+    def add_transition_observer(self, observer):
+        '''Add callable to be called with the population, the transition label and the indeces of the persons after
+        every state transition'''
+        self.transition_observers = self.transition_observers + (observer,)
+
+    def _reset(self, inds):
+        self.infected[inds] = False
+        self.revealed[inds] = False
+        self.contagious[inds] = False
+        self.quarantined[inds] = False
+
+    def days_since(self, label):
+        '''Difference between current time and time of a given state transition for all persons. The value is
+        meaningless for persons who never made the transition'''
+        return self.time_coordinate - self.time_stamp[TRANSITION_LABELS.index(label)]
+
+    def state(self, label):
+        '''Array of a given disease state flag for all persons'''
+        return getattr(self, label)
+
+    def person(self, index):
+        '''View of the person of a given index'''
+        if self._views[index] is None:
+            self._views[index] = PersonView(self, index)
+        return self._views[index]
+
+    def persons(self):
+        '''Views of all persons in the population'''
+        return [self.person(k) for k in range(len(self))]
+
+    def reordered(self, order):
+        '''Population of the persons of the given indeces, in the given order, with their state, time stamps and
+        predispositions. Transition observers are not carried over'''
+
+        population = Population([self.names[k] for k in order], self.caution_interaction[order],
+                                self.general_health[order], self.time_coordinate)
+        for label in STATE_LABELS:
+            population.state(label)[:] = self.state(label)[order]
+        population.time_stamp[:] = self.time_stamp[:, order]
+
+        return population
+
+    def __len__(self):
+        return len(self.names)
+
+    def __init__(self, names, caution_interaction=None, general_health=None, time_coordinate=0):
+
+        n_people = len(names)
+        self.names = list(names)
+        self.time_coordinate = time_coordinate
+
+        if caution_interaction is None:
+            caution_interaction = np.zeros(n_people)
+        if general_health is None:
+            general_health = np.zeros(n_people)
+        self.caution_interaction = np.array(caution_interaction, dtype=np.float64)
+        self.general_health = np.array(general_health, dtype=np.float64)
+
+        self.infected = np.zeros(n_people, dtype=bool)
+        self.contagious = np.zeros(n_people, dtype=bool)
+        self.revealed = np.zeros(n_people, dtype=bool)
+        self.immune = np.zeros(n_people, dtype=bool)
+        self.dead = np.zeros(n_people, dtype=bool)
+        self.quarantined = np.zeros(n_people, dtype=bool)
+
+        self.time_stamp = np.full((len(TRANSITION_LABELS), n_people), NO_TIME_STAMP, dtype=np.int32)
+
+        self._views = [None] * n_people
+        self.transition_observers = ()
+
+
+class PersonView():
+    '''Person of a population, with the same methods to query and transition the disease state as `Person`, but with
+    all data held in the arrays of the population'''
+
+    def is_immune(self):
+        return bool(self.population.immune[self.index])
+
+    def is_contagious(self):
+        return bool(self.population.contagious[self.index])
+
+    def is_infected(self):
+        return bool(self.population.infected[self.index])
+
+    def is_dead(self):
+        return bool(self.population.dead[self.index])
+
+    def is_revealed(self):
+        return bool(self.population.revealed[self.index])
+
+    def is_quarantined(self):
+        return bool(self.population.quarantined[self.index])
+
+    def infect(self):
+        self.population.transition('infect', self.index)
+
+    def activate(self):
+        self.population.transition('activate', self.index)
+
+    def reveal(self):
+        self.population.transition('reveal', self.index)
+
+    def recover(self):
+        self.population.transition('recover', self.index)
+
+    def immunize(self):
+        self.population.transition('immunize', self.index)
+
+    def succumb(self):
+        self.population.transition('succumb', self.index)
+
+    def quarantine(self):
+        self.population.transition('quarantine', self.index)
+
+    def get_time_stamp(self, label):
+        '''Time stamp of the state transition of a given label, None if the transition was never made'''
+        time_stamp = self.population.time_stamp[TRANSITION_LABELS.index(label), self.index]
+        if time_stamp == NO_TIME_STAMP:
+            return None
+        else:
+            return int(time_stamp)
+
+    def _time_diff(self, label):
+        time_stamp = self.get_time_stamp(label)
+        if time_stamp is None:
+            return None
+        else:
+            return self.time_coordinate - time_stamp
+
+    def days_infected(self):
+        return self._time_diff('infect')
+
+    def days_revealed(self):
+        return self._time_diff('reveal')
+
+    def days_quarantined(self):
+        return self._time_diff('quarantine')
+
+    def days_immunized(self):
+        return self._time_diff('immunize')
+
+    def days_succumbed(self):
+        return self._time_diff('succumb')
+
+    def days_recovered(self):
+        return self._time_diff('recover')
+
+    @property
+    def name(self):
+        return self.population.names[self.index]
+
+    @property
+    def time_coordinate(self):
+        return self.population.time_coordinate
+
+    @property
+    def caution_interaction(self):
+        return float(self.population.caution_interaction[self.index])
+
+    @caution_interaction.setter
+    def caution_interaction(self, value):
+        self.population.caution_interaction[self.index] = value
+
+    @property
+    def general_health(self):
+        return float(self.population.general_health[self.index])
+
+    @general_health.setter
+    def general_health(self, value):
+        self.population.general_health[self.index] = value
+
+    @property
+    def time_stamp(self):
+        '''Time stamps of the state transitions of the person, None if transition never made'''
+        stamps = self.population.time_stamp[:, self.index]
+        return dict([(label, None if stamp == NO_TIME_STAMP else int(stamp))
+                     for label, stamp in zip(TRANSITION_LABELS, stamps)])
+
+    def report(self):
+        '''Report personal data, including disease state of person, at current time'''
+        series_person = pd.Series(data=[self.name, self.time_coordinate,
+                                        self.caution_interaction, self.general_health],
+                                  index=['name', 'time_coordinate',
+                                         'caution_interaction', 'general_health'])
+        series_state = pd.Series(data=[bool(self.population.state(label)[self.index]) for label in STATE_LABELS],
+                                 index=STATE_LABELS)
+        series_time = pd.Series(dict([('time_' + label, value) for label, value in self.time_stamp.items()]))
+
+        return pd.concat([series_person, series_state, series_time])
+
+    def __str__(self):
+        return 'Person {}'.format(self.name)
+
+    def __init__(self, population, index):
+
+        self.population = population
+        self.index = index
+
+
+def population_from_persons(persons):
+    '''Create population of arrays from the current state of a sequence of `Person` objects'''
+
+    population = Population(names=[person.name for person in persons],
+                            caution_interaction=[person.caution_interaction for person in persons],
+                            general_health=[person.general_health for person in persons])
+
+    for k, person in enumerate(persons):
+        population.time_coordinate = person.time_coordinate
+        for label in STATE_LABELS:
+            population.state(label)[k] = getattr(person.state, label)
+        for label, time_stamp in person.time_stamp.items():
+            if not time_stamp is None:
+                population.time_stamp[TRANSITION_LABELS.index(label), k] = time_stamp
+
+    return population
+
+
+class ArrayWorld(World):
+    '''World with persons held as a population of arrays and with the social graph held as arrays of the two end
+    persons and the weight of each edge. The edges are undirected and each is stored once. The adjacency index of
+    the edges can be given, if already built, else it is built when first needed. The edge arrays and the adjacency
+    index are only read, so they can be shared between worlds, including read-only arrays in shared memory.
+
+    '''
+    def do_they_meet_today(self, p_a, p_b):
+        '''Evaluate if two persons in the world meet, see `World.do_they_meet_today`'''
+
+        if p_a.is_quarantined() or p_b.is_quarantined() or p_a.is_dead() or p_b.is_dead():
+            they_meet = False
+
+        # The edge is looked up in the row of the one person in the adjacency index, at a cost of their degree
+        else:
+            indptr, indices, weights = self.adjacency()
+            row = slice(indptr[p_a.index], indptr[p_a.index + 1])
+            on_edge = np.flatnonzero(indices[row] == p_b.index)
+            if len(on_edge) > 0:
+                they_meet = self.random_stream.ranf() < weights[row][on_edge[0]]
+            else:
+                they_meet = False
+
+        return they_meet
+
+    def meeting_edges_today(self):
+        '''Indeces of the social graph edges along which the persons meet today. Outcome of one Bernoulli trial per
+        edge of persons neither quarantined nor dead, with probability equal to the edge weight'''
+
+        pop = self.population
+        available = ~(pop.quarantined | pop.dead)
+        candidates = np.flatnonzero(available[self.edge_a] & available[self.edge_b])
+
+        return candidates[self.random_stream.ranf(len(candidates)) < self.edge_weight[candidates]]
+
+    def meetings_today(self):
+        '''Indeces of the two persons of every meeting today, in order of the social graph edges, see
+        `meeting_edges_today`'''
+
+        meetings = self.meeting_edges_today()
+
+        return self.edge_a[meetings], self.edge_b[meetings]
+
+    def neighbour_edges(self, persons):
+        '''Indeces of the persons and their neighbours, along with the edge weights, of all edges of the given persons
+        in the adjacency index'''
+
+        indptr, indices, weights = self.adjacency()
+        positions, persons = csr_rows(indptr, persons)
+
+        return persons, indices[positions], weights[positions]
+
+    def _q_policy_revealed(self):
+        '''Person is quarantined if their disease is revealed, see `World._q_policy_revealed`'''
+        pop = self.population
+        pop.transition('quarantine', np.flatnonzero(pop.revealed & ~pop.quarantined))
+
+    def _q_policy_revealed_with_chance(self, chance):
+        '''Person is quarantined with some probability if their disease is revealed, see
+        `World._q_policy_revealed_with_chance`'''
+        pop = self.population
+        revealed = np.flatnonzero(pop.revealed & ~pop.quarantined)
+        self.population.transition('quarantine', revealed[self.random_stream.ranf(len(revealed)) < chance])
+
+    def is_disease_free(self):
+        '''If no person in the world is infected, return True'''
+        return not self.population.infected.any()
+
+    def synchronize(self, global_time):
+        '''Set all persons of the world to the same time'''
+        self.population.time_coordinate = global_time
+
+    def infected_persons(self):
+        '''Views of the persons of the world who are currently infected'''
+        return [self.population.person(k) for k in np.flatnonzero(self.population.infected)]
+
+    def dead_persons(self):
+        '''Views of the persons of the world who are dead'''
+        return [self.population.person(k) for k in np.flatnonzero(self.population.dead)]
+
+    def adjacency(self):
+        '''Adjacency index of the social graph in compressed sparse row layout, such that the neighbours of person k
+        and the weights of the corresponding edges are `indices[indptr[k]:indptr[k + 1]]` and
+        `weights[indptr[k]:indptr[k + 1]]`. Built on first call.'''
+        if self._adjacency is None:
+            self._adjacency = edges_to_csr(self.replica_size(), self.edge_a, self.edge_b, self.edge_weight)
+        return self._adjacency
+
+    def replica_size(self):
+        '''Number of persons the social graph joins, which is all persons of the world'''
+        return len(self.population)
+
+    def static_arrays(self):
+        '''Arrays of the world that do not change as the disease progresses, the edges of the social graph and its
+        adjacency index, if built, by key'''
+        arrays = {'edge_a' : self.edge_a, 'edge_b' : self.edge_b, 'edge_weight' : self.edge_weight}
+        if not self._adjacency is None:
+            arrays.update(zip(['indptr', 'indices', 'weights'], self._adjacency))
+        return arrays
+
+    @property
+    def persons(self):
+        '''Views of all persons in the world'''
+        return self.population.persons()
+
+    def report_table(self):
+        '''Report data about the world, including its persons and their disease state at current time, as a table
+        with one row per person, in the same layout as `World.report_table`'''
+
+        pop = self.population
+        n_people = len(pop)
+
+        if self.delete_dead_from_social_graph:
+            in_world = ~pop.dead
+        else:
+            in_world = np.ones(n_people, dtype=bool)
+
+        data = {'name' : pop.names,
+                'time_coordinate' : np.full(n_people, pop.time_coordinate, dtype=np.int32),
+                'caution_interaction' : pop.caution_interaction,
+                'general_health' : pop.general_health}
+        for label in STATE_LABELS:
+            data[label] = pop.state(label)
+        for k, label in enumerate(TRANSITION_LABELS):
+            data['time_' + label] = pop.time_stamp[k]
+        data['degree'], data['expectation_meetings_per_day'] = self._degree_and_weight_sum(in_world)
+
+        return pd.DataFrame(data).loc[in_world].reset_index(drop=True)
+
+    def report(self):
+        '''Report data about the world, including its persons and their disease state at current time, in the same
+        layout as `World.report`'''
+
+        total_df = self.report_table()
+        for label in TRANSITION_LABELS:
+            time_stamp = total_df['time_' + label].astype(np.float64)
+            time_stamp[total_df['time_' + label] == NO_TIME_STAMP] = np.nan
+            total_df['time_' + label] = time_stamp
+        total_df['time_coordinate'] = total_df['time_coordinate'].astype(np.int64)
+
+        total_df = total_df.set_index(['name', 'time_coordinate'])
+        total_df = total_df.stack()
+        new_index = total_df.index.set_names(['name','time_coordinate','property'])
+        total_df.index = new_index
+
+        return total_df
+
+    def report_counts(self, caution_strata=False):
+        '''Report the number of persons of the world in each disease state at current time, in the same layout as
+        `World.report_counts`'''
+
+        pop = self.population
+        if self.delete_dead_from_social_graph:
+            in_world = ~pop.dead
+        else:
+            in_world = np.ones(len(pop), dtype=bool)
+
+        if caution_strata:
+            levels, level_of_person = np.unique(pop.caution_interaction, return_inverse=True)
+            data = {'time_coordinate' : pop.time_coordinate,
+                    'caution_interaction' : levels,
+                    'n_people' : np.bincount(level_of_person, weights=in_world,
+                                             minlength=len(levels)).astype(np.int64)}
+            for label in STATE_LABELS:
+                data[label] = np.bincount(level_of_person, weights=pop.state(label),
+                                          minlength=len(levels)).astype(np.int64)
+
+        else:
+            data = {'time_coordinate' : [pop.time_coordinate],
+                    'n_people' : [np.count_nonzero(in_world)]}
+            for label in STATE_LABELS:
+                data[label] = [np.count_nonzero(pop.state(label))]
+
+        return pd.DataFrame(data)
+
+    def _degree_and_weight_sum(self, in_world):
+        '''Degree and sum of edge weights of all persons in the social graph of persons in the world'''
+
+        n_people = len(self.population)
+        edge_in_world = in_world[self.edge_a] & in_world[self.edge_b]
+        edge_a = self.edge_a[edge_in_world]
+        edge_b = self.edge_b[edge_in_world]
+        edge_weight = self.edge_weight[edge_in_world]
+
+        degree = (np.bincount(edge_a, minlength=n_people) +
+                  np.bincount(edge_b, minlength=n_people)).astype(np.float64)
+        weight_sum = np.bincount(edge_a, weights=edge_weight, minlength=n_people) + \
+                     np.bincount(edge_b, weights=edge_weight, minlength=n_people)
+
+        return degree, weight_sum
+
+    def __init__(self, name, population, edge_a, edge_b, edge_weight, delete_dead_from_social_graph=False,
+                 quarantine_policy=None, quarantine_policy_kwargs={}, random_stream=None, adjacency=None):
+
+        super().__init__(name, None, delete_dead_from_social_graph=delete_dead_from_social_graph,
+                         quarantine_policy=quarantine_policy,
+                         quarantine_policy_kwargs=quarantine_policy_kwargs,
+                         random_stream=random_stream)
+
+        self.population = population
+        self.edge_a = np.asarray(edge_a, dtype=np.int64)
+        self.edge_b = np.asarray(edge_b, dtype=np.int64)
+        self.edge_weight = np.asarray(edge_weight, dtype=np.float64)
+        self._adjacency = adjacency
+
+
+class CompleteMixWorld(ArrayWorld):
+    '''World in which every pair of persons is joined by a social graph edge of the same weight, which is implicit
+    and never stored. Memory is proportional to the number of persons.
+
+    Rather than a meeting trial per edge, each day the number of effective contacts of each susceptible person with
+    the contagious persons is drawn from a binomial distribution, for each caution level among the contagious
+    persons. The per-day cost is proportional to the number of persons times the number of distinct caution levels
+    among the contagious persons.
+
+    '''
+    def do_they_meet_today(self, p_a, p_b):
+        '''Evaluate if two persons in the world meet, see `World.do_they_meet_today`'''
+
+        if p_a.is_quarantined() or p_b.is_quarantined() or p_a.is_dead() or p_b.is_dead():
+            they_meet = False
+
+        elif p_a.index == p_b.index:
+            they_meet = False
+
+        else:
+            they_meet = self.random_stream.ranf() < self.meet_weight
+
+        return they_meet
+
+    def meeting_edges_today(self):
+        raise RuntimeError('Meetings along the implicit edges of a complete mix world are not enumerated')
+
+    def meetings_today(self):
+        raise RuntimeError('Meetings along the implicit edges of a complete mix world are not enumerated')
+
+    def neighbour_edges(self, persons):
+        raise RuntimeError('Neighbours along the implicit edges of a complete mix world are not enumerated')
+
+    def adjacency(self):
+        raise RuntimeError('No adjacency index is stored for a complete mix world')
+
+    def effective_contacts(self, transmission_base_prob):
+        '''Draw for each susceptible person able to meet others, the number of contacts today with contagious
+        persons able to meet others, that result in transmission. Persons meet only within their replica, if the
+        world holds several. Return the indeces of the susceptible persons, the indeces of the contagious persons
+        ordered by replica and caution level, the start in that order and the number of the contagious persons of
+        each caution level in the replica of each susceptible person, and the number of effective contacts by
+        susceptible person and caution level.'''
+
+        pop = self.population
+        n_people = self.replica_size()
+        able_to_meet = ~(pop.quarantined | pop.dead)
+        susceptible = np.flatnonzero(able_to_meet & ~(pop.infected | pop.immune))
+        sources = np.flatnonzero(pop.contagious & able_to_meet)
+
+        levels, level_of_source = np.unique(pop.caution_interaction[sources], return_inverse=True)
+        group_of_source = (sources // n_people) * len(levels) + level_of_source
+        sources = sources[np.argsort(group_of_source, kind='stable')]
+        group_counts = np.bincount(group_of_source, minlength=len(pop) // n_people * len(levels))
+        group_starts = np.cumsum(group_counts) - group_counts
+        replica_groups = (susceptible // n_people)[:, np.newaxis] * len(levels) + np.arange(len(levels))
+        level_counts = group_counts[replica_groups]
+        level_starts = group_starts[replica_groups]
+
+        caution = np.maximum(pop.caution_interaction[susceptible][:, np.newaxis], levels[np.newaxis, :])
+        thrs_contact = self.meet_weight * transmission_base_prob * (1.0 - caution)
+        n_contacts = self.random_stream.generator.binomial(level_counts, thrs_contact)
+
+        return susceptible, sources, level_starts, level_counts, n_contacts
+
+    def _degree_and_weight_sum(self, in_world):
+        '''Degree and sum of edge weights of all persons in the social graph of persons in the world'''
+
+        degree = np.full(len(self.population), in_world.sum() - 1, dtype=np.float64)
+
+        return degree, degree * self.meet_weight
+
+    def __init__(self, name, population, n_avg_meet, delete_dead_from_social_graph=False,
+                 quarantine_policy=None, quarantine_policy_kwargs={}, random_stream=None):
+
+        empty = np.empty(0, dtype=np.int64)
+        super().__init__(name, population, empty, empty, np.empty(0),
+                         delete_dead_from_social_graph=delete_dead_from_social_graph,
+                         quarantine_policy=quarantine_policy,
+                         quarantine_policy_kwargs=quarantine_policy_kwargs,
+                         random_stream=random_stream)
+
+        self.meet_weight = float(n_avg_meet) / (self.replica_size() - 1)
+        if self.meet_weight > 1.0:
+            raise ValueError('Too great weight: {}. Reduce average meetings or increase density of edges'.format(self.meet_weight))
+
+
+def edges_to_csr(n_people, edge_a, edge_b, edge_weight):
+    '''Convert arrays of undirected edges into the arrays `indptr`, `indices` and `weights` of a symmetric adjacency
+    index in compressed sparse row layout'''
+
+    heads = np.concatenate([edge_a, edge_b])
+    tails = np.concatenate([edge_b, edge_a])
+    weights = np.concatenate([edge_weight, edge_weight])
+
+    order = np.argsort(heads, kind='stable')
+    indptr = np.zeros(n_people + 1, dtype=np.int64)
+    np.cumsum(np.bincount(heads, minlength=n_people), out=indptr[1:])
+
+    return indptr, tails[order], weights[order]
+
+def csr_rows(indptr, rows):
+    '''Positions in the `indices` array of a compressed sparse row index of all entries of the given rows, along
+    with the row of each entry'''
+
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+
+    return offsets + np.arange(counts.sum()), np.repeat(rows, counts)
+
+
+def graph_edge_arrays(social_graph):
+    '''Persons of a social graph in node order, and arrays of the indeces of the two end persons and the weight of
+    every edge of the graph'''
+
+    persons = list(social_graph.nodes)
+    person_index = dict([(person, k) for k, person in enumerate(persons)])
+
+    n_edges = social_graph.number_of_edges()
+    edge_a = np.empty(n_edges, dtype=np.int64)
+    edge_b = np.empty(n_edges, dtype=np.int64)
+    edge_weight = np.empty(n_edges, dtype=np.float64)
+    for k, (p_a, p_b, weight) in enumerate(social_graph.edges(data='weight')):
+        edge_a[k] = person_index[p_a]
+        edge_b[k] = person_index[p_b]
+        edge_weight[k] = weight
+
+    return persons, edge_a, edge_b, edge_weight
+
+def make_array_world(name, social_graph, **world_kwargs):
+    '''Create array-backed world from a social graph with `Person` nodes and weighted edges, as obtained from
+    `create_population`. The state of the persons is copied into the population of arrays.
+
+    '''
+    persons, edge_a, edge_b, edge_weight = graph_edge_arrays(social_graph)
+    population = population_from_persons(persons)
+
+    return ArrayWorld(name, population, edge_a, edge_b, edge_weight, **world_kwargs)
+
+
+class ArrayDisease(Disease):
+    '''Disease that spreads and progresses by the same stochastic mechanisms as `Disease`, evaluated as vectorized
+    passes over the population and social graph arrays of an `ArrayWorld`.
+
+    The transmission mode is either 'all edges', in which a meeting trial is made for every edge of the social graph
+    each day, or 'frontier', in which only the edges from contagious persons able to meet to susceptible persons
+    able to meet are visited, from the adjacency index of the world. The two modes give the same distribution of
+    transmissions, though the cost of the latter scales with the number of contagious persons and their degree,
+    rather than with the total number of edges.
+
+    '''
+    def progress_one_more_day(self, world):
+        '''Make disease progress one more day in the world'''
+
+        self.open()
+        self.day_counter += 1
+        world.synchronize(self.day_counter)
+
+        # Transmit disease between people
+        if isinstance(world, CompleteMixWorld):
+            transmitters, receivers = self._transmission_complete_mix(world)
+        elif self.transmission_mode == 'all edges':
+            transmitters, receivers = self._transmission_edges(world)
+        else:
+            transmitters, receivers = self._transmission_frontier(world)
+        if self.transmit_trajectory:
+            self._stamp_trajectories(world.population, transmitters, receivers)
+        if len(self.transmission_observers) > 0:
+            delta_t = self.day_counter - world.population.time_stamp[TRANSITION_LABELS.index('infect'), transmitters]
+            for observer in self.transmission_observers:
+                observer(self, transmitters, receivers, delta_t)
+
+        # Evolve disease state within people
+        self._progression_nodes(world.population)
+
+        # Update social graph on basis of rules as policy. Dead persons meet nobody, so they need not be deleted
+        # from the edge arrays
+        world.enact_quarantine_policy()
+
+        if self.transmit_trajectory:
+            self._trajectory_sink.end_of_day()
+
+        for observer in self.day_observers:
+            observer(self, world)
+
+    def _transmission_edges(self, world):
+        '''Make disease progress along the social graph edges along which persons meet today. A transmission
+        requires one contagious person and one uninfected, non-immune person. Return the indeces of the transmitters
+        and receivers of the transmissions made, in order of the social graph edges.'''
+
+        pop = world.population
+        person_a, person_b = world.meetings_today()
+
+        a_to_b = pop.contagious[person_a] & ~pop.infected[person_b]
+        b_to_a = ~a_to_b & pop.contagious[person_b] & ~pop.infected[person_a]
+        transmitters = np.concatenate([person_a[a_to_b], person_b[b_to_a]])
+        receivers = np.concatenate([person_b[a_to_b], person_a[b_to_a]])
+        edge_order = np.concatenate([np.flatnonzero(a_to_b), np.flatnonzero(b_to_a)])
+
+        return self._try_transmissions(pop, transmitters, receivers, edge_order)
+
+    def _try_transmissions(self, pop, transmitters, receivers, edge_order):
+        '''Attempt transmissions of disease between contagious transmitters and healthy receivers. A receiver that
+        meets several transmitters is infected by the first one, in order of the edges, for which the trial succeeds'''
+
+        not_immune = ~pop.immune[receivers]
+        transmitters = transmitters[not_immune]
+        receivers = receivers[not_immune]
+        edge_order = edge_order[not_immune]
+
+        caution = np.maximum(pop.caution_interaction[transmitters],
+                             pop.caution_interaction[receivers])
+        thrs_transmission = self.transmission_base_prob * (1.0 - caution)
+        success = self.random_stream.ranf(len(receivers)) < thrs_transmission
+
+        by_edge = np.argsort(edge_order[success], kind='stable')
+
+        return self._infect_receivers(pop, transmitters[success][by_edge], receivers[success][by_edge])
+
+    def _transmission_frontier(self, world):
+        '''Make disease progress along the social graph edges of the contagious persons able to meet others today.
+        The meeting and the transmission trial of an edge are evaluated together as a single Bernoulli trial, with
+        probability equal to the product of the edge weight and the transmission probability.'''
+
+        pop = world.population
+        able_to_meet = ~(pop.quarantined | pop.dead)
+        susceptible = able_to_meet & ~(pop.infected | pop.immune)
+        frontier = np.flatnonzero(pop.contagious & able_to_meet)
+
+        transmitters, receivers, weights = world.neighbour_edges(frontier)
+        to_susceptible = susceptible[receivers]
+        transmitters = transmitters[to_susceptible]
+        receivers = receivers[to_susceptible]
+        weights = weights[to_susceptible]
+
+        caution = np.maximum(pop.caution_interaction[transmitters],
+                             pop.caution_interaction[receivers])
+        thrs_transmission = weights * self.transmission_base_prob * (1.0 - caution)
+        success = self.random_stream.ranf(len(receivers)) < thrs_transmission
+
+        return self._infect_receivers(pop, transmitters[success], receivers[success])
+
+    def _transmission_complete_mix(self, world):
+        '''Make disease progress by the effective contacts in a complete mix world. A susceptible person with one or
+        more effective contacts is infected, with a transmitter drawn at random among the effective contacts.'''
+
+        pop = world.population
+        susceptible, sources, level_starts, level_counts, n_contacts = \
+            world.effective_contacts(self.transmission_base_prob)
+
+        infected = np.flatnonzero(n_contacts.sum(axis=1) > 0)
+        receivers = susceptible[infected]
+        n_contacts = n_contacts[infected]
+        if len(receivers) == 0:
+            return sources[:0], receivers
+
+        # Select caution level of transmitter in proportion to effective contacts, then transmitter within level
+        contacts_cumulative = np.cumsum(n_contacts, axis=1)
+        k_contact = np.floor(self.random_stream.ranf(len(receivers)) * contacts_cumulative[:, -1])
+        level = (contacts_cumulative <= k_contact[:, np.newaxis]).sum(axis=1)
+        level_counts = level_counts[infected, level]
+        k_in_level = np.floor(self.random_stream.ranf(len(receivers)) * level_counts).astype(np.int64)
+        transmitters = sources[level_starts[infected, level] + k_in_level]
+
+        pop.transition('infect', receivers)
+
+        return transmitters, receivers
+
+    def _infect_receivers(self, pop, transmitters, receivers):
+        '''Infect receivers of successful transmission trials. A receiver with several successful trials is infected
+        by the transmitter of the first one. Return transmitters and receivers of the transmissions made.'''
+
+        _, first = np.unique(receivers, return_index=True)
+        first = np.sort(first)
+        transmitters = transmitters[first]
+        receivers = receivers[first]
+
+        pop.transition('infect', receivers)
+
+        return transmitters, receivers
+
+    def _stamp_trajectories(self, pop, transmitters, receivers):
+        '''Add trajectory items for the transmission events of the day'''
+
+        delta_t = self.day_counter - pop.time_stamp[TRANSITION_LABELS.index('infect'), transmitters]
+        self._trajectory_sink.add_indeces(transmitters, receivers, delta_t, self.day_counter, pop.names)
+
+    def _progression_nodes(self, pop):
+        '''Make disease progress within all persons. The state of each person at the start of the pass determines
+        which trials are made, as for `Disease._progression_node`'''
+
+        days_infected = pop.days_since('infect')
+        contagious = np.flatnonzero(pop.contagious & ~pop.dead)
+        latent = np.flatnonzero(pop.infected & ~pop.contagious & ~pop.dead)
+
+        # Attempt to reveal
+        unrevealed = contagious[~pop.revealed[contagious]]
+        tables = self._transition_tables
+        p_reveal = tables.cdf(days_infected[unrevealed], 'reveal', self.reveal_mean, self.reveal_spread)
+        pop.transition('reveal', unrevealed[self.random_stream.ranf(len(unrevealed)) < p_reveal])
+
+        # Scale recovery parameter by general health of person
+        health = pop.general_health[contagious]
+        recover_mean_actual = np.where(health >= 0.0,
+                                       self.recover_mean + health * (self.activate_mean - self.recover_mean),
+                                       self.recover_mean - health * (self.succumb_mean - self.recover_mean))
+
+        # Recover and succumb are mutually exclusive, so which is tried first is selected at random and evenly
+        p_recover = tables.cdf(days_infected[contagious], 'recover', recover_mean_actual, self.recover_spread)
+        p_succumb = tables.cdf(days_infected[contagious], 'succumb', self.succumb_mean, self.succumb_spread)
+        recover_first = self.random_stream.ranf(len(contagious)) < 0.5
+        first_outcome = self.random_stream.ranf(len(contagious)) < np.where(recover_first, p_recover, p_succumb)
+        second_outcome = ~first_outcome & \
+                         (self.random_stream.ranf(len(contagious)) < np.where(recover_first, p_succumb, p_recover))
+        recovered = contagious[(first_outcome & recover_first) | (second_outcome & ~recover_first)]
+        succumbed = contagious[(first_outcome & ~recover_first) | (second_outcome & recover_first)]
+        pop.transition('recover', recovered)
+        pop.transition('succumb', succumbed)
+
+        # If recover try event to immunize
+        pop.transition('immunize', recovered[self.random_stream.ranf(len(recovered)) < self.immunization_prob])
+
+        # If instead person is infected but not contagious, attempt to activate disease
+        p_activate = tables.cdf(days_infected[latent], 'activate', self.activate_mean, self.activate_spread)
+        pop.transition('activate', latent[self.random_stream.ranf(len(latent)) < p_activate])
+
+    def __init__(self, *args, transmission_mode='all edges', **kwargs):
+
+        super().__init__(*args, **kwargs)
+
+        if self.progression_mode != 'daily hazard':
+            raise ValueError('Progression mode {} not available in array engine'.format(self.progression_mode))
+
+        if not transmission_mode in ['all edges', 'frontier']:
+            raise ValueError('Unknown transmission mode: {}'.format(transmission_mode))
+        self.transmission_mode = transmission_mode
@@ -0,0 +1,128 @@
+'''Batch engine for the disease spreading in replicas of the same world. The disease state of the persons of all
+replicas is held in the NumPy arrays of one population, replica after replica, and each day of the disease is
+progressed in all replicas together by the vectorized passes of the array engine over the persons and the social
+graph edges, which the replicas share.
+
+The replicas differ only in their random draws, which are all taken from one random stream. The day-step semantics
+are those of `ArrayWorld` and `ArrayDisease` within each replica, so the distribution of the outcomes of a replica is
+the same as of a simulation by the array engine, although the random number streams differ. Replicas that are
+disease free are left out of the meeting trials.
+
+No guarantee of being bug free
+
+'''
+import numpy as np
+import pandas as pd
+
+from graph_growth_classes import STATE_LABELS
+from array_engine import ArrayDisease, ArrayWorld, CompleteMixWorld, Population, csr_rows
+
+class BatchPopulation(Population):
+    '''Disease state, state transition time stamps and predispositions of the persons of a batch of replicas, held as
+    arrays indexed by person, in which person k of replica r is at index `r * n_people + k`. All replicas are at the
+    same time'''
+
+    def replica_state(self, label):
+        '''Array of a given disease state flag indexed by replica and person'''
+        return self.state(label).reshape(self.n_replicas, self.n_people)
+
+    def __init__(self, n_replicas, names, caution_interaction=None, general_health=None, time_coordinate=0):
+
+        n_people = len(names)
+        if caution_interaction is None:
+            caution_interaction = np.zeros(n_people)
+        if general_health is None:
+            general_health = np.zeros(n_people)
+
+        super().__init__(list(names) * n_replicas, np.tile(caution_interaction, n_replicas),
+                         np.tile(general_health, n_replicas), time_coordinate)
+
+        self.n_replicas = n_replicas
+        self.n_people = n_people
+
+
+class BatchWorld(ArrayWorld):
+    '''World of a batch of replicas, with persons held as a batch population and with the social graph, which all
+    replicas share, held as arrays of the two end persons and the weight of each edge, indexed by the person within
+    a replica. The edges are undirected and each is stored once.
+
+    '''
+    def active_replicas(self):
+        '''Indeces of the replicas in which some person is infected'''
+        return np.flatnonzero(self.population.replica_state('infected').any(axis=1))
+
+    def meetings_today(self):
+        '''Indeces of the two persons of every meeting today, in order of replica and social graph edge, see
+        `ArrayWorld.meeting_edges_today`. The trials are made one replica at a time, for replicas not disease
+        free'''
+
+        pop = self.population
+        available = ~(pop.replica_state('quarantined') | pop.replica_state('dead'))
+        person_a = []
+        person_b = []
+        for k_rep in self.active_replicas():
+            candidates = np.flatnonzero(available[k_rep, self.edge_a] & available[k_rep, self.edge_b])
+            meetings = candidates[self.random_stream.ranf(len(candidates)) < self.edge_weight[candidates]]
+            person_a.append(k_rep * pop.n_people + self.edge_a[meetings])
+            person_b.append(k_rep * pop.n_people + self.edge_b[meetings])
+
+        return np.concatenate([self.edge_a[:0]] + person_a), np.concatenate([self.edge_b[:0]] + person_b)
+
+    def neighbour_edges(self, persons):
+        '''Indeces of the persons and their neighbours within their replica, along with the edge weights, of all edges
+        of the given persons in the adjacency index'''
+
+        indptr, indices, weights = self.adjacency()
+        in_replica = persons % self.population.n_people
+        positions, rows = csr_rows(indptr, in_replica)
+        offsets = np.repeat(persons - in_replica, indptr[in_replica + 1] - indptr[in_replica])
+
+        return rows + offsets, indices[positions] + offsets, weights[positions]
+
+    def replica_size(self):
+        '''Number of persons the social graph joins, which is the persons of one replica'''
+        return self.population.n_people
+
+    def report_counts(self, reps=None):
+        '''Report the number of persons in each disease state at current time of the given replicas, by default all,
+        as a table with one row per replica, in the layout of `World.report_counts` with the added column
+        'replica' '''
+
+        pop = self.population
+        if reps is None:
+            reps = np.arange(pop.n_replicas)
+
+        if self.delete_dead_from_social_graph:
+            n_people = np.count_nonzero(~pop.replica_state('dead')[reps], axis=1)
+        else:
+            n_people = np.full(len(reps), pop.n_people, dtype=np.int64)
+
+        data = {'time_coordinate' : np.full(len(reps), pop.time_coordinate, dtype=np.int64),
+                'replica' : reps,
+                'n_people' : n_people}
+        for label in STATE_LABELS:
+            data[label] = np.count_nonzero(pop.replica_state(label)[reps], axis=1)
+
+        return pd.DataFrame(data)
+
+
+class BatchCompleteMixWorld(CompleteMixWorld, BatchWorld):
+    '''World of a batch of replicas in which every pair of persons of a replica is joined by a social graph edge of
+    the same weight, see `CompleteMixWorld`. The effective contacts of each susceptible person are drawn with the
+    contagious persons of their replica.
+
+    '''
+
+
+class BatchDisease(ArrayDisease):
+    '''Disease that spreads and progresses by the passes of `ArrayDisease` over the persons of all replicas of a
+    `BatchWorld` or a `BatchCompleteMixWorld`. The transmission mode is 'all edges', the default, or 'frontier', as
+    for `ArrayDisease`. No transmission trajectory is written by the batch engine.
+
+    '''
+    def __init__(self, *args, transmission_mode='all edges', **kwargs):
+
+        super().__init__(*args, transmission_mode=transmission_mode, **kwargs)
+
+        if self.transmit_trajectory:
+            raise ValueError('No transmission trajectory is written by the batch engine')
@@ -0,0 +1,47 @@
+'''Benchmarks of the construction time and memory of the simulation objects
+
+No guarantee of being bug free
+
+'''
+import time
+import tracemalloc
+
+from graph_growth_classes import RandomStream
+from simulation_templates import make_persons, make_population
+
+def _time_and_memory(func, *args, **kwargs):
+    '''Wall time in seconds of a call to a function, and memory in bytes held by its return value'''
+
+    t_start = time.perf_counter()
+    func(*args, **kwargs)
+    wall_time = time.perf_counter() - t_start
+
+    tracemalloc.start()
+    ret = func(*args, **kwargs)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del ret
+
+    return wall_time, memory
+
+def benchmark_person_construction(n_people, n_infect_init=5):
+    '''Construction time and memory per person of `Person` objects by `make_persons`'''
+
+    wall_time, memory = _time_and_memory(make_persons, n_people, n_infect_init, random_stream=RandomStream(0))
+
+    return {'microseconds per person' : 1e6 * wall_time / n_people,
+            'bytes per person' : memory / n_people}
+
+def benchmark_population_construction(n_people, n_infect_init=5):
+    '''Construction time and memory per person of a population of arrays by `make_population`'''
+
+    wall_time, memory = _time_and_memory(make_population, n_people, n_infect_init, random_stream=RandomStream(0))
+
+    return {'microseconds per person' : 1e6 * wall_time / n_people,
+            'bytes per person' : memory / n_people}
+
+if __name__ == '__main__':
+
+    for n_people in [1000, 100000, 1000000]:
+        print ('Person objects, {} persons: {}'.format(n_people, benchmark_person_construction(n_people)))
+        print ('Population arrays, {} persons: {}'.format(n_people, benchmark_population_construction(n_people)))
@@ -0,0 +1,106 @@
+'''Checkpoints of running simulations, from which a simulation that is interrupted is resumed such that it continues
+as if never interrupted. A checkpoint holds the world, the disease, the random stream they draw from and the state of
+the loop over days, along with the size of every output file at the time of the checkpoint. Arrays that do not
+change as the simulation runs, such as the edges of the social graph of an array world, are written once to a file
+of static arrays next to the checkpoint, so each checkpoint of an array world only holds the arrays of the
+population and the state of the random stream
+
+No guarantee of being bug free
+
+'''
+import gzip
+import os
+import pickle
+
+import numpy as np
+
+def checkpoint_file_name(out_file_name):
+    '''Name of the checkpoint file of the simulation of given output file name'''
+    return out_file_name + '_checkpoint.pkl.gz'
+
+def static_arrays_file_name(file_name):
+    '''Name of the file of the static arrays of the checkpoint of given file name'''
+    return file_name + '.static.npz'
+
+class _CheckpointPickler(pickle.Pickler):
+    '''Pickler that references the static arrays by key rather than pickling them'''
+
+    def persistent_id(self, obj):
+        return self._static_ids.get(id(obj))
+
+    def __init__(self, file, static_arrays):
+
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._static_ids = dict([(id(array), key) for key, array in static_arrays.items()])
+
+class _CheckpointUnpickler(pickle.Unpickler):
+    '''Unpickler that loads the static arrays referenced by key from the file of static arrays, each once'''
+
+    def persistent_load(self, key):
+        if self._static_arrays is None:
+            with np.load(self._static_file_name) as data:
+                self._static_arrays = dict([(name, data[name]) for name in data.files])
+        return self._static_arrays[key]
+
+    def __init__(self, file, static_file_name):
+
+        super().__init__(file)
+        self._static_file_name = static_file_name
+        self._static_arrays = None
+
+def output_file_offsets(file_names):
+    '''Size in bytes of each of the given output files that exists'''
+    return dict([(file_name, os.path.getsize(file_name)) for file_name in file_names if os.path.isfile(file_name)])
+
+def truncate_output_files(file_offsets):
+    '''Truncate output files to the given sizes, which discards the output written after the sizes were recorded'''
+    for file_name, offset in file_offsets.items():
+        with open(file_name, 'r+b') as fout:
+            fout.truncate(offset)
+
+def write_checkpoint(file_name, file_offsets, state, static_arrays={}):
+    '''Write checkpoint of the output file sizes and of the state of a simulation, a dict of the objects of the
+    simulation. The objects are pickled together, such that objects they share, like the random stream, are shared
+    also when read. The checkpoint is written to a temporary file that replaces the previous checkpoint once complete,
+    so a simulation interrupted while writing leaves the previous checkpoint intact. The arrays of `static_arrays`, a
+    dict of arrays by key that do not change as the simulation runs, are written to the file of static arrays by the
+    first checkpoint, and referenced by key from the objects of the state in every checkpoint
+
+    '''
+    static_file_name = static_arrays_file_name(file_name)
+    if len(static_arrays) > 0 and not os.path.isfile(static_file_name):
+        tmp_static_file_name = '{}.tmp{}.npz'.format(static_file_name[:-len('.npz')], os.getpid())
+        np.savez(tmp_static_file_name, **static_arrays)
+        os.replace(tmp_static_file_name, static_file_name)
+
+    # Only arrays in the file of static arrays are referenced, such as arrays built after the first checkpoint
+    if os.path.isfile(static_file_name):
+        with np.load(static_file_name) as data:
+            static_arrays = dict([(key, static_arrays[key]) for key in data.files if key in static_arrays])
+    else:
+        static_arrays = {}
+
+    tmp_file_name = '{}.tmp{}'.format(file_name, os.getpid())
+    with gzip.open(tmp_file_name, 'wb', compresslevel=6) as fout:
+        pickler = _CheckpointPickler(fout, static_arrays)
+        pickler.dump(file_offsets)
+        pickler.dump(state)
+
+    os.replace(tmp_file_name, file_name)
+
+def read_checkpoint(file_name):
+    '''Read the state of a simulation from a checkpoint. The output files are first truncated to their sizes at the
+    time of the checkpoint, since objects of the state that write to output files reopen them when read'''
+
+    with gzip.open(file_name, 'rb') as fin:
+        unpickler = _CheckpointUnpickler(fin, static_arrays_file_name(file_name))
+        truncate_output_files(unpickler.load())
+        state = unpickler.load()
+
+    return state
+
+def remove_checkpoint(file_name):
+    '''Remove checkpoint and its file of static arrays, if any'''
+    for name in [file_name, static_arrays_file_name(file_name)]:
+        if os.path.isfile(name):
+            os.remove(name)
@@ -0,0 +1,88 @@
+'''Typed columnar output of the state data of simulations, as Parquet files of one table per run or as a Parquet
+dataset partitioned by run. Requires the optional dependency `pyarrow`
+
+No guarantee of being bug free
+
+'''
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError('Columnar output requires the package pyarrow')
+
+def state_file_name(out_file_name, dataset_dir=None):
+    '''Name of the Parquet file of the state data of a run. Without a dataset directory the file is placed next to
+    the other output files of the run, else in the partition of the run in the dataset directory, with the base
+    name of the output file name as run label
+
+    '''
+    if dataset_dir is None:
+        return out_file_name + '_data.parquet'
+
+    run_dir = os.path.join(dataset_dir, 'run={}'.format(os.path.basename(out_file_name)))
+    return os.path.join(run_dir, 'data.parquet')
+
+class StateTableWriter():
+    '''Writer of the state tables of a world, as reported by `World.report_table`, to one Parquet file. Each
+    table is written as a row group, the person names are dictionary encoded, and all other columns keep the types
+    of the table. The file is open for the lifetime of the writer
+
+    '''
+    def write(self, df_table):
+        '''Append state table to file'''
+
+        table = pa.Table.from_pandas(df_table, preserve_index=False)
+        table = table.set_column(table.schema.get_field_index('name'), 'name',
+                                 table.column('name').dictionary_encode())
+
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.file_name, table.schema, compression=self.compression)
+        else:
+            table = table.cast(self._writer.schema)
+
+        self._writer.write_table(table)
+
+    def close(self):
+        '''Close file. A writer closed before any table is written leaves no file'''
+        if not self._writer is None:
+            self._writer.close()
+            self._writer = None
+
+    def __init__(self, file_name, compression='zstd'):
+
+        _require_pyarrow()
+
+        self.file_name = file_name
+        self.compression = compression
+        self._writer = None
+
+        dir_name = os.path.dirname(file_name)
+        if len(dir_name) > 0:
+            os.makedirs(dir_name, exist_ok=True)
+        if os.path.exists(file_name):
+            os.remove(file_name)
+
+def read_state_table(path, columns=None, run=None):
+    '''Read the state data of a Parquet file of a run, or of a dataset directory partitioned by run, into a DataFrame
+    with typed columns. For a dataset directory the run label is the column 'run', and the data is optionally
+    restricted to one run
+
+    '''
+    _require_pyarrow()
+
+    if os.path.isdir(path):
+        filters = None if run is None else [('run', '=', run)]
+        table = pq.read_table(path, columns=columns, filters=filters, partitioning='hive')
+    else:
+        table = pq.read_table(path, columns=columns)
+
+    return table.to_pandas()
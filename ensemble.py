@@ -0,0 +1,369 @@
+'''Runner of ensembles of simulations, the grid of replicas, diseases and worlds, as tasks on a pool of worker
+processes. Every task is seeded independently from the seed of the ensemble and writes its output files to a
+directory of its own, which is put in place only once the task is complete
+
+No guarantee of being bug free
+
+'''
+import os
+import shutil
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy.stats import t as student_t
+
+from checkpoint import checkpoint_file_name
+from graph_cache import GraphCache, is_cacheable
+from shared_topology import SharedGraphCache, SharedTopologyPublisher
+from simulation_templates import DISEASES, WORLDS, EngineOptions, OutputOptions, simulation, resume_simulation, \
+    make_edge_weights
+from transition_log import epidemic_statistics
+
+MANIFEST_COLUMNS = ['label', 'disease', 'world', 'replica', 'output_dir', 'status', 'traceback', 'wall_time']
+EPIDEMIC_STATISTICS = ['peak_infected', 'peak_day', 'attack_size', 'deaths']
+
+# Graph cache of a worker process, set by the initializer of the pool
+_worker_graph_cache = None
+
+def _init_worker(graph_cache_dir, shared_handles):
+    global _worker_graph_cache
+    if not graph_cache_dir is None:
+        _worker_graph_cache = GraphCache(graph_cache_dir)
+    if len(shared_handles) > 0:
+        _worker_graph_cache = SharedGraphCache(shared_handles, _worker_graph_cache)
+
+def _publish_topologies(world_names, graph_cache_dir):
+    '''Publish the topologies of the worlds into shared memory, except those that are not the same on every
+    construction and complete graphs, which the array engine simulates without edges'''
+
+    publisher = SharedTopologyPublisher(GraphCache(graph_cache_dir))
+    for world_name in set(world_names):
+        g_params = WORLDS[world_name]['social_graph']
+        if g_params['social_graph_creator'] is nx.complete_graph:
+            continue
+        if is_cacheable(g_params['social_graph_creator'], g_params.get('social_graph_creator_kwargs', {})):
+            publisher.publish_world(g_params, make_edge_weights)
+
+    return publisher
+
+def run_label(disease_name, world_name, short_label={}):
+    '''Label of the runs of a disease in a world, by the short labels of the disease and world if given'''
+    return 'simfile_{}_{}'.format(short_label.get(disease_name, disease_name),
+                                  short_label.get(world_name, world_name)).replace(' ', '_')
+
+def task_label(disease_name, world_name, replica_index, short_label={}):
+    '''Label of the task of a replica of a disease in a world, by the short labels of the disease and world if given.
+    The label is the name of the output directory of the task as well as the prefix of its output files'''
+    return '{}_{}'.format(run_label(disease_name, world_name, short_label), replica_index)
+
+def _partial_dir(task_dir):
+    return task_dir + '.partial'
+
+def _outcome(task, status, task_traceback='', wall_time=0.0):
+    return {'label' : task['label'],
+            'disease' : task['disease'],
+            'world' : task['world'],
+            'replica' : task['replica'],
+            'output_dir' : task['task_dir'],
+            'status' : status,
+            'traceback' : task_traceback,
+            'wall_time' : wall_time}
+
+def run_task(task):
+    '''Run the simulation of a task in the partial output directory of the task, and on success rename the partial
+    directory to the output directory of the task. A task that left a checkpoint in its partial directory is resumed
+    from the checkpoint. Return the outcome of the task, without raising on failure'''
+
+    t_start = time.perf_counter()
+    partial_dir = _partial_dir(task['task_dir'])
+    out_file_name = os.path.join(partial_dir, task['label'])
+    try:
+        if os.path.isfile(checkpoint_file_name(out_file_name)):
+            resume_simulation(out_file_name)
+        else:
+            if os.path.isdir(partial_dir):
+                shutil.rmtree(partial_dir)
+            os.makedirs(partial_dir)
+            simulation(task['disease'], task['world'], task['n_days_max'], task['report_interval'], out_file_name,
+                       seed=task['seed'], graph_cache=_worker_graph_cache, **task['simulation_kwargs'])
+        os.rename(partial_dir, task['task_dir'])
+        outcome = _outcome(task, 'success')
+
+    except Exception:
+        outcome = _outcome(task, 'failure', traceback.format_exc())
+
+    outcome['wall_time'] = time.perf_counter() - t_start
+
+    return outcome
+
+def make_tasks(disease_names, world_names, n_replicas, n_days_max, report_interval, out_dir,
+               seed=None, replica_index_init=0, short_label={}, simulation_kwargs={}):
+    '''Tasks of the grid of replicas, diseases and worlds, in the order of the loops of replica, disease and world.
+    Each task is given a child of the seed sequence of the ensemble seed, in task order, so the seed of a task does
+    not depend on the number of workers or on the order in which the tasks complete. Without output options in
+    `simulation_kwargs` the social graphs are added to a graph store, which is shared by the tasks in `out_dir`
+    unless the output options name another'''
+
+    seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    output_options = simulation_kwargs.get('output_options', OutputOptions(graph_output='store'))
+    if output_options.graph_store_dir is None:
+        output_options = output_options.replaced(graph_store_dir=os.path.join(out_dir, 'graph_store'))
+    simulation_kwargs = dict(simulation_kwargs, output_options=output_options)
+
+    tasks = []
+    for replica_index in range(replica_index_init, replica_index_init + n_replicas):
+        for disease_name in disease_names:
+            for world_name in world_names:
+                label = task_label(disease_name, world_name, replica_index, short_label)
+                tasks.append({'label' : label,
+                              'disease' : disease_name,
+                              'world' : world_name,
+                              'replica' : replica_index,
+                              'n_days_max' : n_days_max,
+                              'report_interval' : report_interval,
+                              'task_dir' : os.path.join(out_dir, label),
+                              'simulation_kwargs' : simulation_kwargs})
+
+    for task, task_seed in zip(tasks, seed_sequence.spawn(len(tasks))):
+        task['seed'] = task_seed
+
+    return tasks
+
+def run_ensemble(disease_names, world_names, n_replicas, n_days_max, report_interval, out_dir,
+                 n_workers=None, seed=None, replica_index_init=0, short_label={}, simulation_kwargs={},
+                 graph_cache_dir=None, share_topology=False):
+    '''Run the simulations of the grid of replicas, diseases and worlds on a pool of `n_workers` processes, by
+    default one per CPU. Additional keyword arguments to `simulation` are given by `simulation_kwargs`, the same for
+    all tasks. The output files of each task are written to the directory of the task label in `out_dir`, and the
+    social graphs, unless other output options are given, to a graph store shared by the tasks in `out_dir`, in
+    which the replicas of a world share its topology. Tasks whose output directory exists are
+    considered complete and are not run again. If `graph_cache_dir` is given, each worker holds a graph cache on
+    that directory, shared across the tasks of the worker. If `share_topology`, which requires the array engine,
+    the topologies of the worlds are published once into shared memory, to which the workers attach read-only, so
+    the replicas of a world hold one copy of its edge arrays and adjacency index between them.
+
+    Return the manifest of the tasks, a table with one row per task of its label, disease, world, replica, output
+    directory, status, either 'success', 'failure' or 'skipped', traceback of a failure and wall time in seconds.
+    The manifest is also written to the file 'manifest.csv' in `out_dir`.
+
+    '''
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = make_tasks(disease_names, world_names, n_replicas, n_days_max, report_interval, out_dir,
+                       seed, replica_index_init, short_label, simulation_kwargs)
+
+    outcomes = []
+    tasks_to_run = []
+    for task in tasks:
+        if os.path.isdir(task['task_dir']):
+            outcomes.append(_outcome(task, 'skipped'))
+        else:
+            tasks_to_run.append(task)
+
+    publisher = None
+    shared_handles = {}
+    if share_topology:
+        if simulation_kwargs.get('engine_options', EngineOptions()).engine != 'array':
+            raise ValueError('Shared topologies require the array engine')
+        publisher = _publish_topologies(world_names, graph_cache_dir)
+        shared_handles = publisher.handles
+
+    try:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 initargs=(graph_cache_dir, shared_handles)) as executor:
+            futures = dict([(executor.submit(run_task, task), task) for task in tasks_to_run])
+            for future in as_completed(futures):
+                try:
+                    outcomes.append(future.result())
+                except Exception:
+                    outcomes.append(_outcome(futures[future], 'failure', traceback.format_exc(), np.nan))
+
+    finally:
+        if not publisher is None:
+            publisher.close()
+
+    order = dict([(task['label'], k) for k, task in enumerate(tasks)])
+    outcomes.sort(key=lambda outcome: order[outcome['label']])
+    df_manifest = pd.DataFrame(outcomes, columns=MANIFEST_COLUMNS)
+    df_manifest.to_csv(os.path.join(out_dir, 'manifest.csv'), index=False)
+
+    return df_manifest
+
+def confidence_interval_width(values, confidence=0.95):
+    '''Width of the confidence interval of the mean of the values, from the t-distribution. Infinite for fewer than
+    two values'''
+    n_values = len(values)
+    if n_values < 2:
+        return np.inf
+    return 2.0 * student_t.ppf(0.5 + 0.5 * confidence, n_values - 1) * np.std(values, ddof=1) / np.sqrt(n_values)
+
+def summarize_statistics(df_statistics, target_ci_width, confidence=0.95):
+    '''Table with one row per epidemic statistic of the number of replicas, the mean, the width of the confidence
+    interval of the mean, the target width, if any, and whether the width is within the target'''
+
+    rows = []
+    for label in EPIDEMIC_STATISTICS:
+        values = df_statistics[label].to_numpy(dtype=np.float64)
+        ci_width = confidence_interval_width(values, confidence)
+        target = target_ci_width.get(label, np.nan)
+        rows.append({'statistic' : label,
+                     'n_replicas' : len(values),
+                     'mean' : values.mean() if len(values) > 0 else np.nan,
+                     'ci_width' : ci_width,
+                     'target_ci_width' : target,
+                     'converged' : ci_width <= target if label in target_ci_width else True})
+
+    return pd.DataFrame(rows)
+
+def _task_statistics(task):
+    return epidemic_statistics(os.path.join(task['task_dir'], task['label'] + '_events.csv'))
+
+def _with_statistics(outcome, task):
+    '''Outcome of a complete task with the epidemic statistics of the task added, or turned into a failure if the
+    statistics cannot be obtained'''
+    try:
+        outcome.update(_task_statistics(task))
+    except Exception:
+        outcome['status'] = 'failure'
+        outcome['traceback'] = traceback.format_exc()
+
+    return outcome
+
+def run_adaptive_ensemble(disease_name, world_name, n_days_max, report_interval, out_dir, target_ci_width,
+                          confidence=0.95, min_replicas=3, max_replicas=50, max_wall_time=None,
+                          n_workers=None, seed=None, short_label={}, simulation_kwargs={}, graph_cache_dir=None):
+    '''Run replicas of a disease in a world on a pool of `n_workers` processes, by default one per CPU, until the
+    confidence intervals of the means of the epidemic statistics are within the target widths. The targets are given
+    by `target_ci_width`, a dict of target width by statistic, any of 'peak_infected', 'peak_day', 'attack_size'
+    and 'deaths'. Replicas are launched in order of replica index, with the seeds, output directories and skipping of
+    complete replicas of `run_ensemble`, as long as fewer than `min_replicas` replicas have succeeded or some target
+    is not met, up to `max_replicas` replicas, and, if `max_wall_time` is given, until that many seconds have passed.
+    Replicas running when launching stops are completed and included. The statistics are obtained from the
+    transition event log of each replica, so the simulations are run in report mode 'events'.
+
+    Return the manifest of the replicas, as of `run_ensemble` with one added column per statistic, and the summary
+    of the statistics, as of `summarize_statistics`. The two tables are written to the files with the run label and
+    the suffixes '_manifest.csv' and '_statistics.csv' in `out_dir`.
+
+    '''
+    unknown = set(target_ci_width).difference(EPIDEMIC_STATISTICS)
+    if len(unknown) > 0:
+        raise ValueError('Unknown epidemic statistics: {}'.format(', '.join(sorted(unknown))))
+
+    os.makedirs(out_dir, exist_ok=True)
+    output_options = simulation_kwargs.get('output_options', OutputOptions(graph_output='store'))
+    simulation_kwargs = dict(simulation_kwargs, output_options=output_options.replaced(report_mode='events'))
+    tasks = make_tasks([disease_name], [world_name], max_replicas, n_days_max, report_interval, out_dir,
+                       seed, 0, short_label, simulation_kwargs)
+    if n_workers is None:
+        n_workers = os.cpu_count()
+
+    t_start = time.perf_counter()
+    outcomes = []
+    k_next = 0
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                             initargs=(graph_cache_dir, {})) as executor:
+        running = {}
+        while True:
+
+            # Launch replicas until the pool is busy or launching stops
+            while len(running) < n_workers and k_next < len(tasks):
+                completed = [outcome for outcome in outcomes if outcome['status'] != 'failure']
+                df_summary = summarize_statistics(pd.DataFrame(completed, columns=EPIDEMIC_STATISTICS),
+                                                  target_ci_width, confidence)
+                if len(completed) >= min_replicas and df_summary['converged'].all():
+                    break
+                if not max_wall_time is None and time.perf_counter() - t_start > max_wall_time:
+                    break
+
+                task = tasks[k_next]
+                k_next += 1
+                if os.path.isdir(task['task_dir']):
+                    outcomes.append(_with_statistics(_outcome(task, 'skipped'), task))
+                else:
+                    running[executor.submit(run_task, task)] = task
+
+            if len(running) == 0:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                try:
+                    outcome = future.result()
+                except Exception:
+                    outcome = _outcome(task, 'failure', traceback.format_exc(), np.nan)
+                if outcome['status'] == 'success':
+                    outcome = _with_statistics(outcome, task)
+                outcomes.append(outcome)
+
+    outcomes.sort(key=lambda outcome: outcome['replica'])
+    df_manifest = pd.DataFrame(outcomes, columns=MANIFEST_COLUMNS + EPIDEMIC_STATISTICS)
+    df_summary = summarize_statistics(df_manifest.loc[df_manifest['status'] != 'failure'], target_ci_width,
+                                      confidence)
+
+    label = run_label(disease_name, world_name, short_label)
+    df_manifest.to_csv(os.path.join(out_dir, label + '_manifest.csv'), index=False)
+    df_summary.to_csv(os.path.join(out_dir, label + '_statistics.csv'), index=False)
+
+    return df_manifest, df_summary
+
+if __name__ == '__main__':
+
+    disease_sim = ['Virus Y Early Revealer']
+    world_sim = ['Small World Beta 1p Q']
+    short_label = {'Virus Y Early Revealer' : 'early',
+                   'Small World Beta 1p Q' : 'smallworld1pQ'}
+#    world_sim = ['Complete Mix Q',
+#                 'Complete Mix Q Cautious 50_200', 'Complete Mix Q Cautious 50_100',
+#                 'Complete Mix Q Cautious 25_200', 'Complete Mix Q Cautious 25_100',
+#                 'Small World Beta 0', 'Small World Beta 1p',
+#                 'Small World Beta 0 Q', 'Small World Beta 1p Q',
+#                 'Small World Beta 0 Q Cautious 50_200', 'Small World Beta 1p Q Cautious 50_200',
+#                 'Relaxed Caveman', 'Relaxed Caveman Cautious 50_200', 'Relaxed Caveman Q']
+#    short_label = {'Virus Y Baseline' : 'baseline',
+#                   'Virus Y Delayed Recovery' : 'delayed',
+#                   'Virus Y High Base Transmitter' : 'rapid',
+#                   'Complete Mix Q' : 'completeQ',
+#                   'Complete Mix Q Cautious 50_200' : 'completeQC50200',
+#                   'Complete Mix Q Cautious 50_100' : 'completeQC50100',
+#                   'Complete Mix Q Cautious 25_200' : 'completeQC25200',
+#                   'Complete Mix Q Cautious 25_100' : 'completeQC25100',
+#                   'Small World Beta 0' : 'ringlattice',
+#                   'Small World Beta 1p' : 'smallworld1p',
+#                   'Small World Beta 0 Q' : 'ringlatticeQ',
+#                   'Small World Beta 1p Q' : 'smallworld1pQ',
+#                   'Small World Beta 0 Q Cautious 50_200' : 'ringlatticeQC50200',
+#                   'Small World Beta 1p Q Cautious 50_200' : 'smallworld1pQC50200',
+#                   'Relaxed Caveman' : 'caveman',
+#                   'Relaxed Caveman Cautious 50_200' : 'cavemanC50200',
+#                   'Relaxed Caveman Q' : 'cavemanQ'}
+
+    sim_repeater = 5
+    sim_index_init = 0
+    sim_max_steps = 120
+    sim_reporter_interval = 1
+    sim_checkpoint_interval = 0
+    sim_workers = None
+    sim_seed = None
+    sim_out_dir = 'simfiles'
+
+    for dd in disease_sim:
+        if not dd in DISEASES.keys():
+            raise ValueError('Disease label {} not in DISEASES'.format(dd))
+    for ww in world_sim:
+        if not ww in WORLDS.keys():
+            raise ValueError('World label {} not in WORLDS'.format(ww))
+    for label in short_label:
+        if not ((label in disease_sim) or (label in world_sim)):
+            raise ValueError('Label {} not in World or Disease'.format(label))
+
+    df_manifest = run_ensemble(disease_sim, world_sim, sim_repeater, sim_max_steps, sim_reporter_interval,
+                               sim_out_dir, n_workers=sim_workers, seed=sim_seed,
+                               replica_index_init=sim_index_init, short_label=short_label,
+                               simulation_kwargs={'checkpoint_interval' : sim_checkpoint_interval})
+    for _, row in df_manifest.loc[df_manifest['status'] == 'failure'].iterrows():
+        print ('Problem: {}, {}, {}\n{}'.format(row['replica'], row['disease'], row['world'], row['traceback']))
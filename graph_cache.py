@@ -0,0 +1,180 @@
+'''Cache of the weighted topology of constructed social graphs, keyed by the graph generator, its keyword arguments
+and the average number of meetings per person, held in memory with least-recently-used eviction and optionally on
+local disk. A world built from a cached topology gets fresh persons attached to the topology
+
+No guarantee of being bug free
+
+'''
+import hashlib
+import os
+from collections import OrderedDict
+
+import networkx as nx
+import numpy as np
+
+from array_engine import edges_to_csr
+
+# Generators without a seed argument that construct the same graph for the same arguments
+DETERMINISTIC_GRAPH_CREATORS = (nx.complete_graph, nx.caveman_graph, nx.ring_of_cliques,
+                                nx.grid_2d_graph, nx.cycle_graph, nx.path_graph)
+
+def is_cacheable(social_graph_creator, social_graph_creator_kwargs):
+    '''Whether the generator with the given arguments constructs the same graph on every call, that is, whether it is
+    a deterministic generator or is given an integer seed'''
+    seed = social_graph_creator_kwargs.get('seed', None)
+    return isinstance(seed, (int, np.integer)) or social_graph_creator in DETERMINISTIC_GRAPH_CREATORS
+
+def graph_cache_key(social_graph_creator, social_graph_creator_kwargs, n_avg_meet):
+    '''Key of the topology constructed by the generator with the given arguments and weighted for the given average
+    number of meetings'''
+    creator_name = '{}.{}'.format(getattr(social_graph_creator, '__module__', ''),
+                                  getattr(social_graph_creator, '__qualname__', repr(social_graph_creator)))
+    kwargs_text = ','.join(['{}={!r}'.format(key, value) for key, value in sorted(social_graph_creator_kwargs.items())])
+    text = '{}({});n_avg_meet={!r}'.format(creator_name, kwargs_text, n_avg_meet)
+
+    return hashlib.sha256(text.encode()).hexdigest()
+
+class CachedTopology():
+    '''Weighted topology of a social graph constructed by a generator, with nodes given by the integer labels of the
+    generator. The nodes are in the node order of the generated graph, and the edges are held in two orders: the
+    order in which the edges of the generated graph are iterated, which is the order they are added in when the graph
+    is relabelled with persons, and the order in which the edges of the relabelled graph are iterated
+
+    '''
+    ARRAYS = ['nodes', 'edge_a', 'edge_b', 'edge_weight', 'iter_a', 'iter_b', 'iter_weight']
+
+    def social_graph(self, people):
+        '''Social graph with the persons of the given sequence, indexed by the integer labels of the generator, as
+        nodes. The graph is identical, in content and iteration order, to the graph obtained by relabelling the
+        generated graph with the persons and setting the edge weights'''
+        graph = nx.Graph()
+        graph.add_nodes_from([people[k] for k in self.nodes])
+        graph.add_weighted_edges_from(zip([people[k] for k in self.edge_a], [people[k] for k in self.edge_b],
+                                          self.edge_weight.tolist()))
+
+        return graph
+
+    def node_persons(self, people):
+        '''Persons of the given sequence, indexed by the integer labels of the generator, in the node order'''
+        return [people[k] for k in self.nodes]
+
+    def node_population(self, population):
+        '''Population of the persons of the given population, indexed by the integer labels of the generator, in the
+        node order'''
+        return population.reordered(self.nodes)
+
+    def edge_arrays(self):
+        '''Arrays of the two end persons, by position in the node order, and the weight of every edge, in the order
+        the edges of the social graph are iterated'''
+        return self.iter_a, self.iter_b, self.iter_weight
+
+    def adjacency(self):
+        '''Adjacency index of the topology in compressed sparse row layout, by position in the node order, as
+        `ArrayWorld.adjacency`. Built on first call'''
+        if self._adjacency is None:
+            self._adjacency = edges_to_csr(len(self.nodes), *self.edge_arrays())
+        return self._adjacency
+
+    @classmethod
+    def from_graph(cls, graph):
+        '''Topology of a generated graph with integer nodes and weighted edges'''
+
+        nodes = np.array(list(graph.nodes), dtype=np.int64)
+        edges = list(graph.edges(data='weight'))
+        arrays = {'nodes' : nodes,
+                  'edge_a' : np.array([edge[0] for edge in edges], dtype=np.int64),
+                  'edge_b' : np.array([edge[1] for edge in edges], dtype=np.int64),
+                  'edge_weight' : np.array([edge[2] for edge in edges], dtype=np.float64)}
+
+        relabelled = nx.Graph()
+        relabelled.add_nodes_from(range(len(nodes)))
+        position = dict([(node, k) for k, node in enumerate(nodes.tolist())])
+        relabelled.add_weighted_edges_from([(position[a], position[b], weight) for a, b, weight in edges])
+        iter_edges = list(relabelled.edges(data='weight'))
+        arrays['iter_a'] = np.array([edge[0] for edge in iter_edges], dtype=np.int64)
+        arrays['iter_b'] = np.array([edge[1] for edge in iter_edges], dtype=np.int64)
+        arrays['iter_weight'] = np.array([edge[2] for edge in iter_edges], dtype=np.float64)
+
+        return cls(arrays)
+
+    def __init__(self, arrays, adjacency=None):
+
+        for key in self.ARRAYS:
+            setattr(self, key, arrays[key])
+        self._adjacency = adjacency
+
+def construct_topology(social_graph_creator, social_graph_creator_kwargs, n_avg_meet, make_edge_weights):
+    '''Topology constructed by the generator with the given arguments and weighted by the function
+    `make_edge_weights` for the given average number of meetings, without a cache'''
+    graph = social_graph_creator(**social_graph_creator_kwargs)
+    graph = make_edge_weights(graph, n_avg_meet)
+    return CachedTopology.from_graph(graph)
+
+class GraphCache():
+    '''Cache of weighted social graph topologies, held in memory up to a maximum number of topologies with the least
+    recently used evicted first, and, if a cache directory is given, on disk as one .npz file per topology named by
+    its key. Only topologies of generators that construct the same graph on every call are cached
+
+    '''
+    def topology(self, social_graph_creator, social_graph_creator_kwargs, n_avg_meet, make_edge_weights):
+        '''Topology constructed by the generator with the given arguments and weighted by the function
+        `make_edge_weights` for the given average number of meetings, from the cache if present'''
+
+        if not is_cacheable(social_graph_creator, social_graph_creator_kwargs):
+            self.n_misses += 1
+            return construct_topology(social_graph_creator, social_graph_creator_kwargs, n_avg_meet, make_edge_weights)
+
+        key = graph_cache_key(social_graph_creator, social_graph_creator_kwargs, n_avg_meet)
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.n_hits += 1
+            return self._memory[key]
+
+        topology = self._load(key)
+        if topology is None:
+            self.n_misses += 1
+            topology = construct_topology(social_graph_creator, social_graph_creator_kwargs, n_avg_meet,
+                                       make_edge_weights)
+            self._save(key, topology)
+        else:
+            self.n_hits += 1
+
+        self._memory[key] = topology
+        if len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+        return topology
+
+    def _file_name(self, key):
+        return os.path.join(self.cache_dir, key + '.npz')
+
+    def _load(self, key):
+        if self.cache_dir is None or not os.path.isfile(self._file_name(key)):
+            return None
+        with np.load(self._file_name(key)) as data:
+            return CachedTopology(dict([(name, data[name]) for name in CachedTopology.ARRAYS]))
+
+    def _save(self, key, topology):
+        if self.cache_dir is None:
+            return
+        tmp_file_name = '{}.tmp{}.npz'.format(self._file_name(key)[:-len('.npz')], os.getpid())
+        np.savez(tmp_file_name, **dict([(name, getattr(topology, name)) for name in CachedTopology.ARRAYS]))
+        os.replace(tmp_file_name, self._file_name(key))
+
+    def clear(self):
+        '''Remove all topologies from memory, though not from disk'''
+        self._memory.clear()
+
+    def __len__(self):
+        return len(self._memory)
+
+    def __init__(self, cache_dir=None, max_entries=8):
+
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self.n_hits = 0
+        self.n_misses = 0
+
+        if not cache_dir is None:
+            os.makedirs(cache_dir, exist_ok=True)
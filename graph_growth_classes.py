@@ -4,13 +4,69 @@ By Anders Ohrn, March 2020.
 No guarantee of being bug free
 
 '''
+import heapq
+from array import array
+from collections import Counter, OrderedDict
+
+import numpy as np
 import pandas as pd
-from numpy import random as rnd
 from scipy.stats import norm
 
+class RandomStream():
+    '''Stream of random numbers of a simulation, from a NumPy random number generator seeded from a seed sequence.
+    Scalar uniform numbers are handed out from blocks drawn in advance, which avoids the overhead of one call to the
+    generator per number in the hot paths. Since the seed sequence determines the stream, a simulation that draws all
+    its random numbers from the stream is reproducible from the entropy and spawn key of the seed sequence.
+
+    '''
+    def ranf(self, size=None):
+        '''Uniform random number in [0, 1), or array of uniform random numbers of given size'''
+        if size is None:
+            if self._block_pos == len(self._block):
+                self._block = self.generator.random(self.block_size)
+                self._block_pos = 0
+            value = self._block[self._block_pos]
+            self._block_pos += 1
+            return value
+
+        else:
+            return self.generator.random(size)
+
+    def spawn(self, n_streams):
+        '''Create independent random streams from child seed sequences'''
+        return [RandomStream(seed_sequence, self.block_size) for seed_sequence in self.seed_sequence.spawn(n_streams)]
+
+    def metadata(self):
+        '''Entropy and spawn key that recreate the seed sequence of the stream'''
+        return {'entropy' : self.seed_sequence.entropy,
+                'spawn_key' : self.seed_sequence.spawn_key}
+
+    def __init__(self, seed=None, block_size=1024):
+
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_sequence = seed
+        else:
+            self.seed_sequence = np.random.SeedSequence(seed)
+
+        self.generator = np.random.Generator(np.random.PCG64(self.seed_sequence))
+        self.block_size = block_size
+        self._block = np.empty(0)
+        self._block_pos = 0
+
+
+NO_TIME_STAMP = -1
+
+# Labels of the disease states and of the state transitions, shared by the engines, in the order of their reports
+STATE_LABELS = ['infected', 'contagious', 'revealed', 'immune', 'dead', 'quarantined']
+TRANSITION_LABELS = ['infect', 'activate', 'reveal', 'recover', 'immunize', 'succumb', 'quarantine']
+
 class _State():
     '''State of disease for a person and the state transition methods'''
 
+    __slots__ = tuple(STATE_LABELS)
+
+    transition_labels = tuple(TRANSITION_LABELS)
+
     def infect(self):
         self.infected = True
 
@@ -49,7 +105,6 @@ class _State():
     def __init__(self, infected=False, contagious=False, revealed=False,
                  immune=False, dead=False, quarantined=False):
 
-        self.transition_labels = ['infect', 'activate', 'reveal', 'recover', 'immunize', 'succumb', 'quarantine']
         self.infected = infected
         self.contagious = contagious
         self.revealed = revealed
@@ -57,11 +112,19 @@ class _State():
         self.dead = dead
         self.quarantined = quarantined
 
+_TRANSITION_INDEX = dict([(label, k) for k, label in enumerate(_State.transition_labels)])
+_NO_TIME_STAMPS = array('l', [NO_TIME_STAMP] * len(_State.transition_labels))
+
 
 class Person():
-    '''Person with a disease state and a predisposition, plus methods to query the person's current disease state
+    '''Person with a disease state and a predisposition, plus methods to query the person's current disease state.
+    The time stamps of the state transitions are held in a fixed-layout integer array in the order of the transition
+    labels of the state, with `NO_TIME_STAMP` for transitions not made.
 
     '''
+    __slots__ = ('name', 'time_coordinate', 'caution_interaction', 'general_health',
+                 'state', '_time_stamps', 'transition_observers')
+
     def is_immune(self):
         return self.state.immune
 
@@ -80,28 +143,78 @@ class Person():
     def is_quarantined(self):
         return self.state.quarantined
 
+    def _transition(self, label):
+        '''Make the state transition of a given label, record its time stamp and notify the transition observers'''
+
+        self._time_stamps[_TRANSITION_INDEX[label]] = self.time_coordinate
+        getattr(self.state, label)()
+
+        for observer in self.transition_observers:
+            observer(self, label)
+
+    def infect(self):
+        self._transition('infect')
+
+    def activate(self):
+        self._transition('activate')
+
+    def reveal(self):
+        self._transition('reveal')
+
+    def recover(self):
+        self._transition('recover')
+
+    def immunize(self):
+        self._transition('immunize')
+
+    def succumb(self):
+        self._transition('succumb')
+
+    def quarantine(self):
+        self._transition('quarantine')
+
+    def get_time_stamp(self, label):
+        '''Time stamp of the state transition of a given label, None if the transition was never made'''
+        time_stamp = self._time_stamps[_TRANSITION_INDEX[label]]
+        if time_stamp == NO_TIME_STAMP:
+            return None
+        else:
+            return time_stamp
+
     def _time_diff(self, label):
-        '''Create function to evaluate difference between current time and time of a given state transition'''
+        '''Difference between current time and time of a given state transition'''
+        time_stamp = self._time_stamps[_TRANSITION_INDEX[label]]
+        if time_stamp == NO_TIME_STAMP:
+            return None
+        else:
+            return self.time_coordinate - time_stamp
 
-        def mapper():
-            if self.time_stamp[label] is None:
-                return None
-            else:
-                return self.time_coordinate - self.time_stamp[label]
+    def days_infected(self):
+        return self._time_diff('infect')
+
+    def days_revealed(self):
+        return self._time_diff('reveal')
 
-        return mapper
+    def days_quarantined(self):
+        return self._time_diff('quarantine')
 
-    def _decorate_time_stamp(self, func, label):
-        '''Decorate the state change function with the recording of a time stamp'''
+    def days_immunized(self):
+        return self._time_diff('immunize')
 
-        def mapper():
-            if not label in self.time_stamp:
-                raise RuntimeError('Unrecognized state transition label {}'.format(label))
+    def days_succumbed(self):
+        return self._time_diff('succumb')
 
-            self.time_stamp[label] = self.time_coordinate
-            func()
+    def days_recovered(self):
+        return self._time_diff('recover')
 
-        return mapper
+    @property
+    def time_stamp(self):
+        '''Time stamps of the state transitions of the person by label, None if transition never made'''
+        return dict([(label, self.get_time_stamp(label)) for label in self.state.transition_labels])
+
+    def add_transition_observer(self, observer):
+        '''Add function called with the person and the transition label after each state transition of the person'''
+        self.transition_observers = self.transition_observers + (observer,)
 
     def report(self):
         '''Report personal data, including disease state of person, at current time'''
@@ -126,27 +239,140 @@ class Person():
         self.general_health = general_health
 
         self.state = _State()
-        self.time_stamp = dict([(label, None) for label in self.state.transition_labels])
+        self._time_stamps = _NO_TIME_STAMPS[:]
+        self.transition_observers = ()
+
+
+class _StateIndex():
+    '''Index of the persons of the world in the disease state classes, maintained incrementally as the persons make
+    state transitions. Each class is an insertion-ordered dict with persons as keys, such that iteration over a class
+    is in a reproducible order.'''
+
+    def update(self, person, label=None):
+        '''Place person in the state classes of their current state. Called on every state transition of the person'''
+        self._place(self.infected, person, person.is_infected())
+        self._place(self.contagious, person, person.is_contagious())
+        self._place(self.revealed, person, person.is_revealed())
+        self._place(self.immune, person, person.is_immune())
+        self._place(self.dead, person, person.is_dead())
+        self._place(self.quarantined, person, person.is_quarantined())
+        self._place(self.revealed_not_quarantined, person, person.is_revealed() and not person.is_quarantined())
+
+    def _place(self, state_class, person, is_member):
+        if is_member:
+            state_class[person] = None
+        else:
+            state_class.pop(person, None)
 
-        self.infect = self._decorate_time_stamp(self.state.infect, 'infect')
-        self.succumb = self._decorate_time_stamp(self.state.succumb, 'succumb')
-        self.activate = self._decorate_time_stamp(self.state.activate, 'activate')
-        self.reveal = self._decorate_time_stamp(self.state.reveal, 'reveal')
-        self.recover = self._decorate_time_stamp(self.state.recover, 'recover')
-        self.immunize = self._decorate_time_stamp(self.state.immunize, 'immunize')
-        self.quarantine = self._decorate_time_stamp(self.state.quarantine, 'quarantine')
+    def __init__(self, persons):
 
-        self.days_infected = self._time_diff('infect')
-        self.days_revealed = self._time_diff('reveal')
-        self.days_quarantined = self._time_diff('quarantine')
-        self.days_immunized = self._time_diff('immunize')
-        self.days_succumbed = self._time_diff('succumb')
-        self.days_recovered = self._time_diff('recover')
+        self.infected = {}
+        self.contagious = {}
+        self.revealed = {}
+        self.immune = {}
+        self.dead = {}
+        self.quarantined = {}
+        self.revealed_not_quarantined = {}
+
+        for person in persons:
+            self.update(person)
+            person.add_transition_observer(self.update)
 
 
 class World():
     '''The world within which persons exist and interact and can be infected with the disease, wherein the world can
-    be comprised of heterogenous interactions between persons as defined by a social graph'''
+    be comprised of heterogenous interactions between persons as defined by a social graph.
+
+    The meetings of a day are sampled in one of two ways:
+
+    'per edge' : a Bernoulli trial is made for each edge of the social graph.
+
+    'geometric skip' : the edges are grouped by weight, and within each group the gaps between consecutive edges
+    along which persons meet are drawn from the geometric distribution, such that the cost is proportional to the
+    number of meetings rather than the number of edges. This requires the weights to take a few distinct values, as
+    in the uniform weights of `make_edge_weights`, otherwise the sampling falls back to per edge trials. The edges
+    and their weights are cached on first use, so changes to the social graph other than by `remove_persons` are
+    not seen by the sampler.
+
+    '''
+    def meetings_today(self):
+        '''Pairs of persons of the social graph who meet today, in the order of the edges of the social graph'''
+
+        if self.meeting_sampler == 'geometric skip':
+            edges, edge_groups = self._edge_weight_groups()
+            if not edge_groups is None:
+                return self._meetings_geometric_skip(edges, edge_groups)
+
+        return self._meetings_per_edge()
+
+    def _meetings_per_edge(self):
+        for person_a, person_b in self.social_graph.edges:
+            if self.do_they_meet_today(person_a, person_b):
+                yield person_a, person_b
+
+    def _meetings_geometric_skip(self, edges, edge_groups):
+
+        meeting_inds = []
+        for weight, group in edge_groups:
+            meeting_inds.append(group[self._geometric_skip_positions(weight, len(group))])
+        meeting_inds = np.sort(np.concatenate(meeting_inds))
+
+        # Quarantined and dead people meet nobody
+        meetings = []
+        for k_edge in meeting_inds:
+            person_a, person_b = edges[k_edge]
+            if not (person_a.is_quarantined() or person_b.is_quarantined() or person_a.is_dead() or person_b.is_dead()):
+                meetings.append((person_a, person_b))
+
+        return meetings
+
+    def _geometric_skip_positions(self, prob, n_items):
+        '''Positions of the successes of Bernoulli trials of given probability over a given number of items, drawn as
+        geometric gaps between successes'''
+
+        if prob <= 0.0 or n_items == 0:
+            return np.empty(0, dtype=np.int64)
+        elif prob >= 1.0:
+            return np.arange(n_items)
+
+        positions = []
+        position = -1
+        n_expected = n_items * prob
+        while position < n_items:
+            n_draw = int(n_expected + 4.0 * np.sqrt(n_expected)) + 16
+            gaps = self.random_stream.generator.geometric(prob, n_draw)
+            new_positions = position + np.cumsum(gaps)
+            positions.append(new_positions)
+            position = new_positions[-1]
+
+        positions = np.concatenate(positions)
+
+        return positions[positions < n_items]
+
+    def _edge_weight_groups(self):
+        '''Edges of the social graph and the indeces of the edges grouped by weight, or None in place of the latter
+        if the weights take more distinct values than the maximum number of groups'''
+
+        if self._edge_cache is None:
+            edges = list(self.social_graph.edges(data='weight'))
+            weights = np.array([weight for _, _, weight in edges], dtype=np.float64)
+            weights_unique, weight_inverse = np.unique(weights, return_inverse=True)
+            if len(weights_unique) > self.max_weight_groups:
+                edge_groups = None
+            else:
+                edge_groups = [(weight, np.flatnonzero(weight_inverse == k))
+                               for k, weight in enumerate(weights_unique)]
+            self._edge_cache = ([(person_a, person_b) for person_a, person_b, _ in edges], edge_groups)
+
+        return self._edge_cache
+
+    def remove_persons(self, persons):
+        '''Remove persons and their edges from the social graph'''
+        persons_in_graph = [person for person in persons if person in self.social_graph]
+        if len(persons_in_graph) > 0:
+            self.social_graph.remove_nodes_from(persons_in_graph)
+            self._edge_cache = None
+            self._caution_strata = None
 
     def do_they_meet_today(self, p_a, p_b):
         '''Evaluate if two persons in the world meet. If meeting takes place is an outcome of a Bernoulli trial
@@ -162,7 +388,7 @@ class World():
         else:
             try:
                 intensity_social_edge = self.social_graph[p_a][p_b]['weight']
-                they_meet = rnd.ranf() < intensity_social_edge
+                they_meet = self.random_stream.ranf() < intensity_social_edge
 
             except KeyError:
                 they_meet = False
@@ -177,28 +403,92 @@ class World():
         pass
 
     def _q_policy_revealed(self):
-        '''Person is quarantined if their disease is revealed'''
-        for person in self.social_graph.nodes:
-            if person.is_revealed():
-                person.quarantine()
+        '''Person is quarantined if their disease is revealed. Only persons not yet quarantined are quarantined, so
+        the time stamp of the quarantine is the day the person entered quarantine, from which `days_quarantined`
+        counts'''
+        for person in list(self._state_index.revealed_not_quarantined):
+            person.quarantine()
 
     def _q_policy_revealed_with_chance(self, chance):
-        '''Person is quarantined with some probability if their disease is revealed'''
-        for person in self.social_graph.nodes:
-            if person.is_revealed():
-                if rnd.ranf() < chance:
-                    person.quarantine()
+        '''Person is quarantined with some probability if their disease is revealed. The trial is made every day for
+        the revealed persons not yet quarantined, and the time stamp of the quarantine is the day of the first
+        successful trial'''
+        for person in list(self._state_index.revealed_not_quarantined):
+            if self.random_stream.ranf() < chance:
+                person.quarantine()
 
     def is_disease_free(self):
         '''If no person in the world is infected, return True, which implies by the disease spreading mechanism that
         no person can become infected, hence a stable state has been attained.'''
-        return not any([person.is_infected() for person in self.social_graph.nodes])
+        return len(self._state_index.infected) == 0
+
+    def infected_persons(self):
+        '''Persons of the world who are currently infected'''
+        return list(self._state_index.infected)
+
+    def dead_persons(self):
+        '''Persons of the world who are dead'''
+        return list(self._state_index.dead)
 
     def synchronize(self, global_time):
         '''Set all persons of the world to the same time'''
+        self.time_coordinate = global_time
         for person in self.social_graph.nodes:
             person.time_coordinate = global_time
 
+    def report_counts(self, caution_strata=False):
+        '''Report the number of persons of the world in each disease state at current time, as a table of one row,
+        or of one row per caution level if `caution_strata`. The counts are obtained from the state index, so the
+        cost is proportional to the number of persons in any state other than susceptible. Dead persons are counted
+        also if they have been deleted from the social graph'''
+
+        if caution_strata:
+            if self._caution_strata is None:
+                self._caution_strata = Counter([person.caution_interaction for person in self.social_graph.nodes])
+
+            counts = dict([(label, Counter([person.caution_interaction
+                                            for person in getattr(self._state_index, label)]))
+                           for label in STATE_LABELS])
+
+            rows = []
+            for caution_level in sorted(set(self._caution_strata).union(*counts.values())):
+                row = {'time_coordinate' : self.time_coordinate,
+                       'caution_interaction' : caution_level,
+                       'n_people' : self._caution_strata[caution_level]}
+                for label in STATE_LABELS:
+                    row[label] = counts[label][caution_level]
+                rows.append(row)
+
+        else:
+            row = {'time_coordinate' : self.time_coordinate,
+                   'n_people' : len(self.social_graph)}
+            for label in STATE_LABELS:
+                row[label] = len(getattr(self._state_index, label))
+            rows = [row]
+
+        return pd.DataFrame(rows)
+
+    def report_table(self):
+        '''Report data about the world, including its persons and their disease state at current time, as a table
+        with one row per person and one typed column per property. Transitions not made have time stamp
+        `NO_TIME_STAMP`'''
+        persons = list(self.social_graph.nodes)
+
+        data = {'name' : [person.name for person in persons],
+                'time_coordinate' : np.array([person.time_coordinate for person in persons], dtype=np.int32),
+                'caution_interaction' : np.array([person.caution_interaction for person in persons], dtype=np.float64),
+                'general_health' : np.array([person.general_health for person in persons], dtype=np.float64)}
+        for label in STATE_LABELS:
+            data[label] = np.array([getattr(person.state, label) for person in persons], dtype=bool)
+        for label in _State.transition_labels:
+            data['time_' + label] = np.array([person._time_stamps[_TRANSITION_INDEX[label]] for person in persons],
+                                             dtype=np.int32)
+        data['degree'] = np.array([self.social_graph.degree[person] for person in persons], dtype=np.int32)
+        data['expectation_meetings_per_day'] = np.array([self.social_graph.degree(person, weight='weight')
+                                                         for person in persons], dtype=np.float64)
+
+        return pd.DataFrame(data)
+
     def report(self):
         '''Report data about the world, including its persons and their disease state at current time'''
         total_df_data = []
@@ -224,12 +514,25 @@ class World():
         return total_df
 
     def __init__(self, name, social_graph, delete_dead_from_social_graph=False,
-                 quarantine_policy=None, quarantine_policy_kwargs={}):
+                 quarantine_policy=None, quarantine_policy_kwargs={},
+                 random_stream=None, meeting_sampler='per edge', max_weight_groups=16):
 
         self.name = name
         self.social_graph = social_graph
         self.delete_dead_from_social_graph = delete_dead_from_social_graph
 
+        if not meeting_sampler in ['per edge', 'geometric skip']:
+            raise ValueError('Unknown meeting sampler: {}'.format(meeting_sampler))
+        self.meeting_sampler = meeting_sampler
+        self.max_weight_groups = max_weight_groups
+        self._edge_cache = None
+        self._caution_strata = None
+        self.time_coordinate = 0
+
+        if random_stream is None:
+            random_stream = RandomStream()
+        self.random_stream = random_stream
+
         self._q_policy_kwargs = quarantine_policy_kwargs
         if quarantine_policy is None:
             self._q_policy = self._q_policy_none
@@ -246,44 +549,315 @@ class World():
         else:
             raise ValueError('Unknown quarantine policy: {}'.format(quarantine_policy))
 
+        # Worlds without a social graph of persons, such as the array-backed worlds, hold no state index
+        if social_graph is None:
+            self._state_index = None
+        else:
+            self._state_index = _StateIndex(social_graph.nodes)
+
+class _TransitionTables():
+    '''Cache of tables of the probability of a state transition trial by integer day since infection, keyed by
+    transition type and the parameters of its distribution. The probability of the trial is the CDF of the
+    distribution of the transition, by default the normal distribution. The location parameter is binned to a given
+    resolution, which bounds the number of tables for the continuous general health adjusted recovery mean, and the
+    least recently used tables are evicted beyond a maximum number of tables.
+
+    '''
+    def cdf(self, n_days, label, loc, scale):
+        '''Probability of transition trial on given day or days since infection. The location parameter can be an
+        array of the same shape as the days'''
+
+        if np.ndim(loc) == 0:
+            table = self._table(label, loc, scale)
+            return table[np.clip(n_days, 0, len(table) - 1)]
+
+        else:
+            n_days = np.asarray(n_days)
+            loc_binned = np.round(np.asarray(loc) / self.loc_resolution)
+            probs = np.empty(n_days.shape, dtype=np.float64)
+            loc_unique, loc_inverse = np.unique(loc_binned, return_inverse=True)
+            for k_loc, loc_bin in enumerate(loc_unique):
+                in_bin = loc_inverse == k_loc
+                table = self._table(label, loc_bin * self.loc_resolution, scale)
+                probs[in_bin] = table[np.clip(n_days[in_bin], 0, len(table) - 1)]
+
+            return probs
+
+    def last_day(self, label, loc, scale):
+        '''Last day of the table of a transition, beyond which the probability of the trial is one in practice'''
+        return len(self._table(label, loc, scale)) - 1
+
+    def _table(self, label, loc, scale):
+
+        key = (label, int(round(loc / self.loc_resolution)), scale)
+        if key in self._tables:
+            self._tables.move_to_end(key)
+
+        else:
+            distribution, shape_kwargs = self.distributions.get(label, (norm, {}))
+            loc_binned = key[1] * self.loc_resolution
+            last_day = distribution.ppf(1.0 - self.tail_prob, loc=loc_binned, scale=scale, **shape_kwargs)
+            last_day = int(min(max(np.ceil(last_day), 0), self.max_days))
+            self._tables[key] = distribution.cdf(np.arange(last_day + 1),
+                                                 loc=loc_binned, scale=scale, **shape_kwargs)
+            if len(self._tables) > self.max_tables:
+                self._tables.popitem(last=False)
+
+        return self._tables[key]
+
+    def __getstate__(self):
+        '''State of the cache without the tables, which are computed anew as needed'''
+        state = self.__dict__.copy()
+        state['_tables'] = OrderedDict()
+        return state
+
+    def __init__(self, distributions={}, loc_resolution=0.01, max_tables=256, max_days=10000, tail_prob=1e-12):
+
+        self.distributions = distributions
+        self.loc_resolution = loc_resolution
+        self.max_tables = max_tables
+        self.max_days = max_days
+        self.tail_prob = tail_prob
+        self._tables = OrderedDict()
+
+
+class TrajectorySink():
+    '''Sink of the transmission events of a disease, open for the lifetime of a simulation. The events are buffered
+    in memory and written in bulk at the end of each day, when the buffer reaches a size threshold, and on close.
+
+    The format is either 'csv', with the header `TrajectorySink.header` and one line per event, or 'binary', with one
+    record of `TrajectorySink.binary_dtype` per event, in which the persons are integer ids. The name of the person of
+    each id is written, one per line in order of id, to a names file with the suffix '.names' added to the file name.
+
+    Persons are given either by name, or by index into a sequence of names, as by `add_indeces`, which in the binary
+    format maps the indeces to ids without a lookup of the names. The two are not to be mixed in one sink.
+
+    A sink can be pickled, as part of a checkpoint of a simulation, and is unpickled with its files open for appending.
+
+    '''
+    header = 'transmitter,receiver,time since transmitter infected,day counter'
+    binary_dtype = np.dtype([('transmitter', '<i4'), ('receiver', '<i4'),
+                             ('time since transmitter infected', '<i4'), ('day counter', '<i4')])
+
+    def add(self, transmitter_name, receiver_name, delta_t, day_counter):
+        '''Add transmission event'''
+        if self.file_format == 'binary':
+            transmitter_name, receiver_name = self._name_id(transmitter_name), self._name_id(receiver_name)
+        self._buffer.append((transmitter_name, receiver_name, int(delta_t), int(day_counter)))
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def add_many(self, transmitter_names, receiver_names, delta_t, day_counter):
+        '''Add transmission events of the same day'''
+        for transmitter_name, receiver_name, dt in zip(transmitter_names, receiver_names, delta_t):
+            self.add(transmitter_name, receiver_name, dt, day_counter)
+
+    def add_indeces(self, transmitters, receivers, delta_t, day_counter, names):
+        '''Add transmission events of the same day, with the transmitters and receivers given by arrays of indeces
+        into the sequence of names of the persons'''
+
+        if self.file_format == 'csv':
+            self.add_many([names[k] for k in transmitters], [names[k] for k in receivers], delta_t, day_counter)
+            return
+
+        if self._index_ids is None:
+            self._index_ids = np.full(len(names), -1, dtype=np.int64)
+
+        # Ids are given in order of first appearance, the transmitter before the receiver of each event
+        persons = np.column_stack([transmitters, receivers]).ravel()
+        new = np.flatnonzero(self._index_ids[persons] == -1)
+        _, first = np.unique(persons[new], return_index=True)
+        new_persons = persons[new[np.sort(first)]]
+        self._index_ids[new_persons] = np.arange(len(self._names), len(self._names) + len(new_persons))
+        self._names.extend([names[k] for k in new_persons])
+
+        self._buffer.extend(zip(self._index_ids[transmitters].tolist(), self._index_ids[receivers].tolist(),
+                                np.asarray(delta_t).tolist(), [int(day_counter)] * len(transmitters)))
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def end_of_day(self):
+        self.flush()
+
+    def flush(self):
+        '''Write buffered events to file'''
+
+        if len(self._buffer) == 0:
+            return
+
+        if self.file_format == 'csv':
+            self._fout.write(''.join(['{},{},{},{}\n'.format(*event) for event in self._buffer]))
+
+        else:
+            records = np.array(self._buffer, dtype=self.binary_dtype)
+            self._fout.write(records.tobytes())
+            self._fout_names.write(''.join(['{}\n'.format(name) for name in self._names[self._n_names_written:]]))
+            self._fout_names.flush()
+            self._n_names_written = len(self._names)
+
+        self._fout.flush()
+        self._buffer = []
+
+    def _name_id(self, name):
+        if not name in self._name_ids:
+            self._name_ids[name] = len(self._names)
+            self._names.append(name)
+        return self._name_ids[name]
+
+    def close(self):
+        '''Flush buffered events and close file'''
+        if not self._fout.closed:
+            self.flush()
+            self._fout.close()
+            if self.file_format == 'binary':
+                self._fout_names.close()
+
+    def __getstate__(self):
+        '''State of the sink without the open files, after the buffered events are flushed'''
+        self.flush()
+        state = self.__dict__.copy()
+        state.pop('_fout')
+        state.pop('_fout_names', None)
+        return state
+
+    def __setstate__(self, state):
+        '''Restore state of the sink and reopen its files for appending'''
+        self.__dict__.update(state)
+        if self.file_format == 'csv':
+            self._fout = open(self.file_name, 'a')
+        else:
+            self._fout = open(self.file_name, 'ab')
+            self._fout_names = open(self.file_name + '.names', 'a')
+
+    def __init__(self, file_name, file_format='csv', buffer_size=10000):
+
+        self.file_name = file_name
+        self.file_format = file_format
+        self.buffer_size = buffer_size
+        self._buffer = []
+
+        if file_format == 'csv':
+            self._fout = open(file_name, 'w')
+            print(self.header, file=self._fout)
+            self._fout.flush()
+
+        elif file_format == 'binary':
+            self._fout = open(file_name, 'wb')
+            self._fout_names = open(file_name + '.names', 'w')
+            self._names = []
+            self._name_ids = {}
+            self._index_ids = None
+            self._n_names_written = 0
+
+        else:
+            raise ValueError('Unknown trajectory file format: {}'.format(file_format))
+
+
 class Disease():
     '''Disease that can spread between persons in the world according to a stochastic mechanism and which progress
-    within a person according to a stochastic mechanism'''
+    within a person according to a stochastic mechanism.
+
+    The progression within a person is evaluated in one of two modes:
+
+    'daily hazard' : every day each infected person is subjected to Bernoulli trials for the transitions available
+    to them, with success probability given by the CDF of the days since infection.
+
+    'event driven' : when a person is infected, the day of activation is drawn up front and pushed onto a priority
+    queue keyed by day. When activation is popped, the days of reveal and of recovery or death are drawn and pushed
+    the same way. Each day only the transitions that are due are popped and made.
+
+    The days are drawn by inverse transform sampling of the distribution of the first success of the daily trials,
+    including the even random order of the mutually exclusive recover and succumb trials, so the two modes give the
+    same distribution of transition days. They differ in that the event driven mode makes no per-day per-person
+    trials, that the general health of a person is read once at activation, and that persons infected other than
+    by transmission or before the first day of the disease, are not scheduled. The random number streams of the two
+    modes differ, so the same seed gives different trajectories in the two modes.
+
+    The CDF of each transition is the normal distribution with the mean and spread of the transition, unless another
+    scipy.stats distribution is given for the transition in `transition_distributions`, as a tuple of the
+    distribution and a dict of its shape parameters, if any. The mean and spread are then the location and scale
+    parameters of the distribution. The CDF values are looked up from tables by day since infection, which are
+    computed once per transition and parameters.
+
+    '''
 
     def progress_one_more_day(self, world):
         '''Make disease progress one more day in the world'''
 
+        self.open()
         self.day_counter += 1
         world.synchronize(self.day_counter)
 
-        # Transmit disease between people
-        for pp_interaction in world.social_graph.edges:
-            person_a = pp_interaction[0]
-            person_b = pp_interaction[1]
-
-            if world.do_they_meet_today(person_a, person_b):
-                transmit_happened = self._progression_edge(person_a, person_b)
+        # Schedule the persons infected before the first day, before any person is scheduled by transmission
+        if self.progression_mode == 'event driven' and not self._event_queue_initialized:
+            self._initialize_event_queue(world)
 
-                if transmit_happened and self.transmit_trajectory:
-                    self._stamp_trajectory(person_a, person_b)
-
-        # Evolve disease state within people
-        persons_dead = []
-        for person in world.social_graph.nodes:
-            self._progression_node(person)
-            if person.is_dead():
-                persons_dead.append(person)
+        # Transmit disease between people
+        transmissions = []
+        for person_a, person_b in world.meetings_today():
+            transmit_happened = self._progression_edge(person_a, person_b)
+
+            if transmit_happened:
+                transmitter, receiver = self._transmission_pair(person_a, person_b)
+                if self.transmit_trajectory:
+                    self._stamp_trajectory(transmitter, receiver)
+                if len(self.transmission_observers) > 0:
+                    transmissions.append((transmitter, receiver))
+                if self.progression_mode == 'event driven':
+                    self._schedule_activation(receiver)
+
+        if len(self.transmission_observers) > 0:
+            transmitters = [transmitter for transmitter, _ in transmissions]
+            receivers = [receiver for _, receiver in transmissions]
+            delta_t = np.array([self.day_counter - transmitter.get_time_stamp('infect')
+                                for transmitter in transmitters], dtype=np.int64)
+            for observer in self.transmission_observers:
+                observer(self, transmitters, receivers, delta_t)
+
+        # Evolve disease state within people. Only infected people can make a transition
+        if self.progression_mode == 'daily hazard':
+            for person in world.infected_persons():
+                self._progression_node(person)
+        else:
+            self._progression_events(world)
 
         # Update social graph on basis of rules as policy
         if world.delete_dead_from_social_graph:
-            world.social_graph.remove_nodes_from(persons_dead)
+            world.remove_persons(world.dead_persons())
         world.enact_quarantine_policy()
 
-    def _stamp_trajectory(self, p_a, p_b):
-        '''Add trajectory item for transmission event'''
+        if self.transmit_trajectory:
+            self._trajectory_sink.end_of_day()
+
+        for observer in self.day_observers:
+            observer(self, world)
+
+    def add_transmission_observer(self, observer):
+        '''Add function called once per day with the disease, the transmitters and the receivers of the transmissions
+        of the day, and the days since the infection of each transmitter. The transmitters and receivers are the
+        persons of the world, or their indeces in the population of an array world'''
+        self.transmission_observers = self.transmission_observers + (observer,)
+
+    def add_day_observer(self, observer):
+        '''Add function called with the disease and the world at the end of each day'''
+        self.day_observers = self.day_observers + (observer,)
 
-        time_stamp_a = p_a.time_stamp['infect']
-        time_stamp_b = p_b.time_stamp['infect']
+    def open(self):
+        '''Open the output of the disease, unless already open. Called on the first day the disease progresses, or
+        before, within the part of the simulation that closes the output on failure'''
+        if self.transmit_trajectory and self._trajectory_sink is None:
+            self._trajectory_sink = TrajectorySink(self.transmit_trajectory_file, self.transmit_trajectory_format)
+
+    def close(self):
+        '''Close the output of the disease, to be called at the end of the simulation'''
+        if not self._trajectory_sink is None:
+            self._trajectory_sink.close()
+
+    def _transmission_pair(self, p_a, p_b):
+        '''Determine transmitter and receiver of transmission event between two persons'''
+
+        time_stamp_a = p_a.get_time_stamp('infect')
+        time_stamp_b = p_b.get_time_stamp('infect')
         if time_stamp_a == self.day_counter:
             p_transmitter = p_b
             p_receiver = p_a
@@ -293,15 +867,13 @@ class Disease():
         else:
             raise RuntimeError('Faulty transmission to already infected person encountered')
 
-        delta_t = self.day_counter - p_transmitter.time_stamp['infect']
+        return p_transmitter, p_receiver
 
-        with open(self.transmit_trajectory_file, 'a') as fout:
-            if fout.tell() == 0:
-                print('transmitter,receiver,time since transmitter infected,day counter', file=fout)
+    def _stamp_trajectory(self, p_transmitter, p_receiver):
+        '''Add trajectory item for transmission event'''
 
-            print('{},{},{},{}'.format(p_transmitter.name, p_receiver.name,
-                                       delta_t, self.day_counter),
-                  file=fout)
+        delta_t = self.day_counter - p_transmitter.get_time_stamp('infect')
+        self._trajectory_sink.add(p_transmitter.name, p_receiver.name, delta_t, self.day_counter)
 
     def _try_transmission(self, transmitter, receiver):
         '''Attempt transmission of disease between a contagious transmitter and a healthy receiver'''
@@ -319,7 +891,7 @@ class Disease():
         '''Generic trial function of event to create a state transition'''
 
         transition_performed = False
-        if rnd.ranf() < transition_cdf(n_days, **transition_cdf_kwargs):
+        if self.random_stream.ranf() < transition_cdf(n_days, **transition_cdf_kwargs):
             person_transition_func()
             transition_performed = True
 
@@ -351,44 +923,48 @@ class Disease():
 
             # Attempt to reveal
             if not person.is_revealed():
-                self._trial(person.reveal, person.days_infected(), norm.cdf,
-                            {'loc' : self.reveal_mean,
+                self._trial(person.reveal, person.days_infected(), self._transition_tables.cdf,
+                            {'label' : 'reveal',
+                             'loc' : self.reveal_mean,
                              'scale' : self.reveal_spread})
 
             # Scale recovery parameter by general health of person
-            if person.general_health >= 0.0:
-                recover_mean_actual = self.recover_mean + person.general_health * \
-                                      (self.activate_mean - self.recover_mean)
-            else:
-                recover_mean_actual = self.recover_mean - person.general_health * \
-                                      (self.succumb_mean - self.recover_mean)
+            recover_mean_actual = self._recover_mean_actual(person)
 
             # Because recover and succumb are mutually exclusive, an unbiased trial of either transition requires
             # the first trial to be selected at random and evenly between recover and succumb
-            event_first = rnd.choice(['recover', 'succumb'])
+            if self.random_stream.ranf() < 0.5:
+                event_first = 'recover'
+            else:
+                event_first = 'succumb'
             if event_first == 'recover':
                 first_func = person.recover
+                first_func_label = 'recover'
                 first_func_mean = recover_mean_actual
                 first_func_spread = self.recover_spread
                 second_func = person.succumb
+                second_func_label = 'succumb'
                 second_func_mean = self.succumb_mean
                 second_func_spread = self.succumb_spread
 
             else:
                 first_func = person.succumb
+                first_func_label = 'succumb'
                 first_func_mean = self.succumb_mean
                 first_func_spread = self.succumb_spread
                 second_func = person.recover
+                second_func_label = 'recover'
                 second_func_mean = recover_mean_actual
                 second_func_spread = self.recover_spread
 
-            # TODO: generalize to non-normal transition probabilities
-            first_outcome = self._trial(first_func, person.days_infected(), norm.cdf,
-                                        {'loc' : first_func_mean,
+            first_outcome = self._trial(first_func, person.days_infected(), self._transition_tables.cdf,
+                                        {'label' : first_func_label,
+                                         'loc' : first_func_mean,
                                          'scale' : first_func_spread})
             if not first_outcome:
-                second_outcome = self._trial(second_func, person.days_infected(), norm.cdf,
-                                             {'loc' : second_func_mean,
+                second_outcome = self._trial(second_func, person.days_infected(), self._transition_tables.cdf,
+                                             {'label' : second_func_label,
+                                              'loc' : second_func_mean,
                                               'scale' : second_func_spread})
             else:
                 second_outcome = False
@@ -399,10 +975,110 @@ class Disease():
 
         # If instead person is infected but not contagious, attempt to activate disease
         elif person.is_infected():
-            self._trial(person.activate, person.days_infected(), norm.cdf,
-                        {'loc' : self.activate_mean,
+            self._trial(person.activate, person.days_infected(), self._transition_tables.cdf,
+                        {'label' : 'activate',
+                         'loc' : self.activate_mean,
                          'scale' : self.activate_spread})
 
+    def _recover_mean_actual(self, person):
+        '''Mean of recovery scaled by general health of person'''
+        if person.general_health >= 0.0:
+            recover_mean_actual = self.recover_mean + person.general_health * \
+                                  (self.activate_mean - self.recover_mean)
+        else:
+            recover_mean_actual = self.recover_mean - person.general_health * \
+                                  (self.succumb_mean - self.recover_mean)
+
+        return recover_mean_actual
+
+    def _progression_events(self, world):
+        '''Make disease progress within persons by the transitions due today in the event queue'''
+
+        while len(self._event_queue) > 0 and self._event_queue[0][0] <= self.day_counter:
+            _, _, _, person, label = heapq.heappop(self._event_queue)
+
+            if label == 'activate':
+                person.activate()
+                self._schedule_contagious(person)
+
+            elif label == 'reveal':
+                person.reveal()
+
+            elif label == 'recover':
+                person.recover()
+                self._trial(person.immunize, None, lambda _ : self.immunization_prob)
+
+            elif label == 'succumb':
+                person.succumb()
+
+    def _initialize_event_queue(self, world):
+        '''Schedule the transitions of the persons infected when the disease starts to progress, once'''
+
+        for person in world.infected_persons():
+            if person.is_contagious():
+                self._schedule_contagious(person)
+            else:
+                self._schedule_activation(person)
+        self._event_queue_initialized = True
+
+    def _push_event(self, day, person, label):
+        '''Add state transition of person on given day to the event queue. Transitions on the same day are popped
+        in the order reveal, recover or succumb, activate, as in the daily hazard mode'''
+        rank = {'reveal' : 0, 'recover' : 1, 'succumb' : 1, 'activate' : 2}[label]
+        heapq.heappush(self._event_queue, (day, rank, self._event_counter, person, label))
+        self._event_counter += 1
+
+    def _trial_days(self, first_day, last_day):
+        '''Days since infection of the daily trials from a given first day to a last day, beyond which the
+        probability of the trials is one in practice'''
+        return np.arange(first_day, max(first_day, last_day) + 1)
+
+    def _first_success(self, success_probs):
+        '''Draw index of the first success of a sequence of independent trials with given success probabilities.
+        If no trial succeeds, which the choice of trial days makes negligible, the last index is returned'''
+        prob_done = 1.0 - np.cumprod(1.0 - success_probs)
+        k_success = np.searchsorted(prob_done, self.random_stream.ranf(), side='right')
+        return min(k_success, len(success_probs) - 1)
+
+    def _schedule_activation(self, person):
+        '''Draw day of activation of a newly infected person, the first trial of which is today'''
+
+        day_infected = person.get_time_stamp('infect')
+        tables = self._transition_tables
+        days = self._trial_days(self.day_counter - day_infected,
+                                tables.last_day('activate', self.activate_mean, self.activate_spread))
+        p_activate = tables.cdf(days, 'activate', self.activate_mean, self.activate_spread)
+
+        self._push_event(day_infected + days[self._first_success(p_activate)], person, 'activate')
+
+    def _schedule_contagious(self, person):
+        '''Draw days of reveal and of recovery or death of a newly contagious person, the first trials of which are
+        tomorrow. Recover and succumb are tried in even random order each day, so on a given day of the trials
+        recovery has probability P_r * (1 - P_s / 2) and death has probability P_s * (1 - P_r / 2)'''
+
+        tables = self._transition_tables
+        day_infected = person.get_time_stamp('infect')
+        recover_mean_actual = self._recover_mean_actual(person)
+        days = self._trial_days(self.day_counter + 1 - day_infected,
+                                min(tables.last_day('recover', recover_mean_actual, self.recover_spread),
+                                    tables.last_day('succumb', self.succumb_mean, self.succumb_spread)))
+
+        p_recover = tables.cdf(days, 'recover', recover_mean_actual, self.recover_spread)
+        p_succumb = tables.cdf(days, 'succumb', self.succumb_mean, self.succumb_spread)
+        p_end = p_recover + p_succumb - p_recover * p_succumb
+        k_end = self._first_success(p_end)
+        if self.random_stream.ranf() * p_end[k_end] < p_recover[k_end] * (1.0 - 0.5 * p_succumb[k_end]):
+            label_end = 'recover'
+        else:
+            label_end = 'succumb'
+        self._push_event(day_infected + days[k_end], person, label_end)
+
+        if not person.is_revealed():
+            p_reveal = tables.cdf(days, 'reveal', self.reveal_mean, self.reveal_spread)
+            k_reveal = self._first_success(p_reveal)
+            if k_reveal <= k_end:
+                self._push_event(day_infected + days[k_reveal], person, 'reveal')
+
     def __init__(self, name, transmission_base_prob,
                        activate_mean, activate_spread,
                        reveal_mean, reveal_spread,
@@ -410,11 +1086,19 @@ class Disease():
                        succumb_mean, succumb_spread,
                        immunization_prob,
                  transmit_trajectory_file=None,
-                 day_counter_init=0):
+                 transmit_trajectory_format='csv',
+                 day_counter_init=0,
+                 progression_mode='daily hazard',
+                 transition_distributions={},
+                 random_stream=None):
 
         self.name = name
         self.day_counter = day_counter_init
 
+        if random_stream is None:
+            random_stream = RandomStream()
+        self.random_stream = random_stream
+
         self.transmission_base_prob = transmission_base_prob
         self.activate_mean = activate_mean
         self.activate_spread = activate_spread
@@ -425,11 +1109,24 @@ class Disease():
         self.succumb_mean = succumb_mean
         self.succumb_spread = succumb_spread
         self.immunization_prob = immunization_prob
+        self._transition_tables = _TransitionTables(transition_distributions)
 
         if not transmit_trajectory_file is None:
+            if not transmit_trajectory_format in ['csv', 'binary']:
+                raise ValueError('Unknown trajectory file format: {}'.format(transmit_trajectory_format))
             self.transmit_trajectory = True
             self.transmit_trajectory_file = transmit_trajectory_file
-            open(self.transmit_trajectory_file, 'w').close()
+            self.transmit_trajectory_format = transmit_trajectory_format
         else:
             self.transmit_trajectory = False
+        self._trajectory_sink = None
+        self.transmission_observers = ()
+        self.day_observers = ()
+
+        if not progression_mode in ['daily hazard', 'event driven']:
+            raise ValueError('Unknown progression mode: {}'.format(progression_mode))
+        self.progression_mode = progression_mode
+        self._event_queue = []
+        self._event_counter = 0
+        self._event_queue_initialized = False
 
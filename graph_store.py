@@ -0,0 +1,174 @@
+'''Store of social graphs in a binary format, which is written once per distinct graph and loaded by memory mapping.
+Each graph is held as the arrays of a symmetric adjacency index in compressed sparse row layout, written once per
+distinct topology, plus the arrays of the node attributes, written once per distinct population of the topology, and
+is referenced by the hashes of the content of the two
+
+No guarantee of being bug free
+
+'''
+import hashlib
+import os
+import shutil
+
+import networkx as nx
+import numpy as np
+
+from array_engine import edges_to_csr, graph_edge_arrays
+
+TOPOLOGY_ARRAYS = ['indptr', 'indices', 'weights']
+NODE_ARRAYS = ['names', 'caution_interaction', 'general_health']
+GRAPH_ARRAYS = TOPOLOGY_ARRAYS + NODE_ARRAYS
+
+def content_hash(arrays, keys):
+    '''Hash of the type, shape and bytes of the arrays of the given keys, in the order of the keys'''
+    digest = hashlib.sha256()
+    for key in keys:
+        array = np.ascontiguousarray(arrays[key])
+        digest.update('{}:{}:{};'.format(key, array.dtype.str, array.shape).encode())
+        digest.update(array.tobytes())
+
+    return digest.hexdigest()
+
+def graph_arrays(social_graph):
+    '''Graph arrays of a social graph with `Person` nodes and weighted edges, as obtained from `create_population`,
+    with the persons in the node order of the graph'''
+
+    return edge_graph_arrays(*graph_edge_arrays(social_graph))
+
+def edge_graph_arrays(persons, edge_a, edge_b, edge_weight):
+    '''Graph arrays of a sequence of persons and arrays of the indeces of the two end persons and the weight of every
+    edge'''
+
+    indptr, indices, weights = edges_to_csr(len(persons), edge_a, edge_b, edge_weight)
+
+    return {'indptr' : indptr,
+            'indices' : indices,
+            'weights' : weights,
+            'names' : np.array([str(person.name) for person in persons]),
+            'caution_interaction' : np.array([person.caution_interaction for person in persons], dtype=np.float64),
+            'general_health' : np.array([person.general_health for person in persons], dtype=np.float64)}
+
+def population_graph_arrays(population, edge_a, edge_b, edge_weight):
+    '''Graph arrays of a population of arrays and arrays of the indeces of the two end persons and the weight of
+    every edge'''
+
+    indptr, indices, weights = edges_to_csr(len(population), edge_a, edge_b, edge_weight)
+
+    return {'indptr' : indptr,
+            'indices' : indices,
+            'weights' : weights,
+            'names' : np.array(population.names, dtype=str),
+            'caution_interaction' : np.array(population.caution_interaction, dtype=np.float64),
+            'general_health' : np.array(population.general_health, dtype=np.float64)}
+
+class StoredGraph():
+    '''Social graph of a graph store, with the graph arrays as attributes. Neighbours of person k and the weights of
+    the corresponding edges are `indices[indptr[k]:indptr[k + 1]]` and `weights[indptr[k]:indptr[k + 1]]`'''
+
+    def __len__(self):
+        return len(self.names)
+
+    def edge_arrays(self):
+        '''Arrays of the two end persons and the weight of every undirected edge, each edge once'''
+        heads = np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.indptr))
+        once = heads < self.indices
+
+        return heads[once], np.asarray(self.indices[once], dtype=np.int64), np.asarray(self.weights[once])
+
+    def to_networkx(self):
+        '''Graph with integer nodes in the order of the persons, the person data as node attributes and the weights
+        as edge attributes'''
+        graph = nx.Graph()
+        for k in range(len(self)):
+            graph.add_node(k, name=str(self.names[k]),
+                           caution_interaction=float(self.caution_interaction[k]),
+                           general_health=float(self.general_health[k]))
+        edge_a, edge_b, edge_weight = self.edge_arrays()
+        graph.add_weighted_edges_from(zip(edge_a.tolist(), edge_b.tolist(), edge_weight.tolist()))
+
+        return graph
+
+    def __init__(self, graph_hash, arrays):
+
+        self.graph_hash = graph_hash
+        for key in GRAPH_ARRAYS:
+            setattr(self, key, arrays[key])
+
+class GraphStore():
+    '''Directory of social graphs, one subdirectory per topology named by the hash of the topology arrays, and within
+    it one subdirectory per population of the topology named by the hash of the node arrays, with one .npy file per
+    graph array. A graph is referenced by the two hashes joined by '/'. The person predispositions drawn anew for
+    every simulation make the node arrays differ between replicas, so only the topology is shared between them. Each
+    directory is written only if not already in the store, and is written to a temporary directory that is renamed
+    once complete, so concurrent writers of the same graph do not corrupt the store
+
+    '''
+    def put(self, social_graph):
+        '''Add social graph with `Person` nodes to the store and return its hash'''
+        return self.put_arrays(graph_arrays(social_graph))
+
+    def put_arrays(self, arrays):
+        '''Add graph given by its graph arrays to the store and return its hash'''
+
+        topology_hash = content_hash(arrays, TOPOLOGY_ARRAYS)
+        self._write(topology_hash, arrays, TOPOLOGY_ARRAYS)
+        graph_hash = '{}/{}'.format(topology_hash, content_hash(arrays, NODE_ARRAYS))
+        self._write(graph_hash, arrays, NODE_ARRAYS)
+
+        return graph_hash
+
+    def _write(self, graph_hash, arrays, keys):
+        if graph_hash in self:
+            return
+
+        tmp_dir = '{}.tmp{}'.format(self._graph_dir(graph_hash), os.getpid())
+        os.makedirs(tmp_dir, exist_ok=True)
+        for key in keys:
+            np.save(os.path.join(tmp_dir, key + '.npy'), arrays[key])
+
+        try:
+            os.rename(tmp_dir, self._graph_dir(graph_hash))
+        except OSError:
+            if not graph_hash in self:
+                raise
+            shutil.rmtree(tmp_dir)
+
+    def get(self, graph_hash, mmap_mode='r'):
+        '''Graph of the given hash, with the graph arrays memory mapped in the given mode, or read into memory if
+        `mmap_mode` is None'''
+
+        if not graph_hash in self:
+            raise KeyError('No graph {} in graph store {}'.format(graph_hash, self.root_dir))
+
+        topology_dir = self._graph_dir(graph_hash.split('/')[0])
+        arrays = dict([(key, np.load(os.path.join(topology_dir, key + '.npy'), mmap_mode=mmap_mode))
+                       for key in TOPOLOGY_ARRAYS])
+        arrays.update([(key, np.load(os.path.join(self._graph_dir(graph_hash), key + '.npy'), mmap_mode=mmap_mode))
+                       for key in NODE_ARRAYS])
+
+        return StoredGraph(graph_hash, arrays)
+
+    def _graph_dir(self, graph_hash):
+        return os.path.join(self.root_dir, *graph_hash.split('/'))
+
+    def __contains__(self, graph_hash):
+        return os.path.isdir(self._graph_dir(graph_hash))
+
+    def __init__(self, root_dir):
+
+        self.root_dir = root_dir
+        os.makedirs(root_dir, exist_ok=True)
+
+def read_run_graph(sim_data_file, mmap_mode='r'):
+    '''Graph of a simulation run, as referenced by hash and store directory in the metadata file of the run'''
+
+    metadata = {}
+    with open(sim_data_file) as fin:
+        for line in fin:
+            key, _, value = line.partition(',')
+            metadata[key.strip()] = value.strip()
+
+    if not 'Social Graph Hash' in metadata:
+        raise ValueError('No stored social graph referenced in {}'.format(sim_data_file))
+
+    return GraphStore(metadata['Social Graph Store']).get(metadata['Social Graph Hash'], mmap_mode)
@@ -0,0 +1,262 @@
+'''Online metrics of the epidemic of a simulation, accumulated as the disease progresses from the state transitions
+and the transmissions of the persons, and the state counts of the world at the end of each day, and written as a
+compact summary of the run. The summary replaces the analysis of state and trajectory files for the daily incidence
+and prevalence, the peak of the epidemic, the offspring distribution, the effective reproduction number by cohort of
+infection and the generation interval distribution
+
+No guarantee of being bug free
+
+'''
+import json
+
+import numpy as np
+
+from graph_growth_classes import NO_TIME_STAMP
+from array_engine import ArrayWorld, STATE_LABELS, TRANSITION_LABELS
+
+def _add_at(counts, k, value):
+    '''Add value to element k of an array of counts, which is extended with zeros as needed'''
+    if k >= len(counts):
+        counts = np.concatenate([counts, np.zeros(max(k + 1 - len(counts), len(counts)), dtype=counts.dtype)])
+    counts[k] += value
+    return counts
+
+class OnlineMetric():
+    '''Base of the online metrics. A metric is given the number of persons at the start, then the state transitions
+    and the transmissions of the persons by integer id, as they happen, and the state counts of the world at the end
+    of each day, and reduces them to a summary of lists and numbers
+
+    '''
+    def start(self, n_persons, day):
+        pass
+
+    def transitions(self, label, ids, day):
+        pass
+
+    def transmissions(self, transmitters, receivers, delta_t, day):
+        pass
+
+    def end_of_day(self, day, counts):
+        pass
+
+    def summary(self):
+        return {}
+
+class Incidence(OnlineMetric):
+    '''Number of transitions of each label per day, such as the daily number of new infections and deaths'''
+
+    def start(self, n_persons, day):
+        self.day_first = day
+        self.counts = dict([(label, np.zeros(0, dtype=np.int64)) for label in TRANSITION_LABELS])
+
+    def transitions(self, label, ids, day):
+        self.counts[label] = _add_at(self.counts[label], day - self.day_first, len(ids))
+
+    def summary(self):
+        n_days = max([len(counts) for counts in self.counts.values()])
+        summary = {'day' : list(range(self.day_first, self.day_first + n_days))}
+        for label, counts in self.counts.items():
+            summary[label] = np.pad(counts, (0, n_days - len(counts))).tolist()
+
+        return summary
+
+class Prevalence(OnlineMetric):
+    '''Number of persons in each state at the end of each day, and the peak of the number of infected persons'''
+
+    def start(self, n_persons, day):
+        self.days = []
+        self.counts = dict([(label, []) for label in STATE_LABELS])
+
+    def end_of_day(self, day, counts):
+        self.days.append(day)
+        for label in STATE_LABELS:
+            self.counts[label].append(counts[label])
+
+    def summary(self):
+        summary = {'day' : list(self.days)}
+        summary.update(self.counts)
+        if len(self.days) > 0:
+            k_peak = int(np.argmax(self.counts['infected']))
+            summary['peak_infected'] = self.counts['infected'][k_peak]
+            summary['peak_day'] = self.days[k_peak]
+
+        return summary
+
+class _CohortMetric(OnlineMetric):
+    '''Metric of the early infected cohort, the persons infected by the first `nth_infected` transmissions, by
+    default by all transmissions. Whether a person is in the cohort is settled when the person is infected, so before
+    any transmission by the person'''
+
+    def start(self, n_persons, day):
+        self.in_cohort = np.zeros(n_persons, dtype=bool)
+        self.n_cohort = 0
+
+    def _add_to_cohort(self, receivers):
+        if self.nth_infected is None:
+            n_added = len(receivers)
+        else:
+            n_added = max(0, min(len(receivers), self.nth_infected - self.n_cohort))
+        self.in_cohort[receivers[:n_added]] = True
+        self.n_cohort += n_added
+
+    def __init__(self, nth_infected=None):
+
+        self.nth_infected = nth_infected
+
+class Offspring(_CohortMetric):
+    '''Number of transmissions by each person, reduced to the offspring histogram of the early infected cohort and to
+    the effective reproduction number by day of infection, the mean number of transmissions by the persons infected
+    on the day. The latter is censored for the last days of the run. A person infected again is counted by their first
+    infection, as in the transmission tree of the trajectory'''
+
+    def start(self, n_persons, day):
+        super().start(n_persons, day)
+        self.offspring = np.zeros(n_persons, dtype=np.int64)
+        self.infection_day = np.full(n_persons, NO_TIME_STAMP, dtype=np.int64)
+
+    def transitions(self, label, ids, day):
+        if label == 'infect':
+            ids = ids[self.infection_day[ids] == NO_TIME_STAMP]
+            self.infection_day[ids] = day
+
+    def transmissions(self, transmitters, receivers, delta_t, day):
+        self._add_to_cohort(receivers)
+        np.add.at(self.offspring, transmitters, 1)
+
+    def summary(self):
+        infected = np.flatnonzero(self.infection_day != NO_TIME_STAMP)
+        summary = {'offspring_histogram' : np.bincount(self.offspring[self.in_cohort]).tolist()}
+        if len(infected) > 0:
+            day_first = self.infection_day[infected].min()
+            cohort = self.infection_day[infected] - day_first
+            n_cohort = np.bincount(cohort)
+            n_transmits = np.bincount(cohort, weights=self.offspring[infected])
+            has_cohort = n_cohort > 0
+            summary['cohort_day'] = (np.flatnonzero(has_cohort) + day_first).tolist()
+            summary['cohort_size'] = n_cohort[has_cohort].tolist()
+            summary['R_t'] = (n_transmits[has_cohort] / n_cohort[has_cohort]).tolist()
+
+        return summary
+
+class GenerationInterval(_CohortMetric):
+    '''Histogram of the days from infection of the transmitter to transmission, for the transmissions by the early
+    infected cohort'''
+
+    def start(self, n_persons, day):
+        super().start(n_persons, day)
+        self.histogram = np.zeros(0, dtype=np.int64)
+
+    def transmissions(self, transmitters, receivers, delta_t, day):
+        self._add_to_cohort(receivers)
+        lags = np.bincount(delta_t[self.in_cohort[transmitters]])
+        if len(lags) > len(self.histogram):
+            self.histogram = np.pad(self.histogram, (0, len(lags) - len(self.histogram)))
+        self.histogram[:len(lags)] += lags
+
+    def summary(self):
+        return {'generation_interval_histogram' : self.histogram.tolist()}
+
+METRICS = {'incidence' : Incidence,
+           'prevalence' : Prevalence,
+           'offspring' : Offspring,
+           'generation_interval' : GenerationInterval}
+
+def make_metrics(metric_kwargs):
+    '''Online metrics of given names, a dict of the name and keyword arguments of each metric'''
+    metrics = {}
+    for name, kwargs in metric_kwargs.items():
+        if not name in METRICS:
+            raise ValueError('Unknown online metric: {}'.format(name))
+        metrics[name] = METRICS[name](**kwargs)
+
+    return metrics
+
+def metrics_file_name(out_file_name):
+    '''Name of the summary file of the online metrics of the simulation of given output file name'''
+    return out_file_name + '_metrics.json'
+
+def read_metrics(metrics_file):
+    '''Read the summary of the online metrics of a simulation'''
+    with open(metrics_file) as fin:
+        return json.load(fin)
+
+class MetricRecorder():
+    '''Recorder of online metrics of a simulation, which feeds the metrics the state transitions of the persons of the
+    world and the transmissions and the state counts of the disease each day. The state counts are only computed if
+    some metric overrides `end_of_day`. Transitions the persons made before the recorder was attached are fed at
+    attachment, by day and in the order of the transition labels. The recorder can be pickled, as part of a
+    checkpoint of a simulation, along with the world and disease it is attached to
+
+    '''
+    def attach(self, world, disease):
+        '''Attach recorder to the persons of a world, either a `World` of `Person` objects or an `ArrayWorld`, and to
+        the disease progressing in it'''
+
+        if isinstance(world, ArrayWorld):
+            pop = world.population
+            n_persons = len(pop)
+            time_stamps = pop.time_stamp
+            day = pop.time_coordinate
+            pop.add_transition_observer(self._population_transition)
+
+        else:
+            persons = list(world.social_graph.nodes)
+            n_persons = len(persons)
+            self._person_ids = dict([(person, k) for k, person in enumerate(persons)])
+            time_stamps = np.array([[NO_TIME_STAMP if person.get_time_stamp(label) is None
+                                     else person.get_time_stamp(label) for person in persons]
+                                    for label in TRANSITION_LABELS], dtype=np.int64)
+            day = world.time_coordinate
+            for person in persons:
+                person.add_transition_observer(self._person_transition)
+
+        for metric in self.metrics.values():
+            metric.start(n_persons, day)
+
+        for k_label, label in enumerate(TRANSITION_LABELS):
+            for day_stamp in np.unique(time_stamps[k_label][time_stamps[k_label] != NO_TIME_STAMP]):
+                self._transitions(label, np.flatnonzero(time_stamps[k_label] == day_stamp), day_stamp)
+
+        disease.add_transmission_observer(self._transmissions)
+
+        # The state counts are computed each day only if some metric uses them
+        if any([type(metric).end_of_day is not OnlineMetric.end_of_day for metric in self.metrics.values()]):
+            self._end_of_day(disease, world)
+            disease.add_day_observer(self._end_of_day)
+
+    def _person_transition(self, person, label):
+        self._transitions(label, np.array([self._person_ids[person]]), person.get_time_stamp(label))
+
+    def _population_transition(self, pop, label, inds):
+        self._transitions(label, np.atleast_1d(inds), pop.time_coordinate)
+
+    def _transitions(self, label, ids, day):
+        for metric in self.metrics.values():
+            metric.transitions(label, ids, day)
+
+    def _transmissions(self, disease, transmitters, receivers, delta_t):
+        if not self._person_ids is None:
+            transmitters = np.array([self._person_ids[person] for person in transmitters], dtype=np.int64)
+            receivers = np.array([self._person_ids[person] for person in receivers], dtype=np.int64)
+        for metric in self.metrics.values():
+            metric.transmissions(transmitters, receivers, delta_t, disease.day_counter)
+
+    def _end_of_day(self, disease, world):
+        counts = world.report_counts().iloc[0]
+        for metric in self.metrics.values():
+            metric.end_of_day(disease.day_counter, counts)
+
+    def summary(self):
+        '''Summary of the online metrics, a dict of the summary of each metric by name'''
+        return dict([(name, metric.summary()) for name, metric in self.metrics.items()])
+
+    def write(self):
+        '''Write summary of the online metrics to the metrics file'''
+        with open(self.metrics_file, 'w') as fout:
+            json.dump(self.summary(), fout, default=int)
+
+    def __init__(self, metrics_file, metrics):
+
+        self.metrics_file = metrics_file
+        self.metrics = metrics
+        self._person_ids = None
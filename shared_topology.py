@@ -0,0 +1,118 @@
+'''Social graph topologies published once into shared memory by the parent process of an ensemble, to which the
+worker processes attach read-only. Replicas of the same world that run in parallel then hold one copy of the edge
+arrays and the adjacency index of the world between them, and each replica only holds the state of its persons
+
+No guarantee of being bug free
+
+'''
+import multiprocessing
+import os
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from graph_cache import CachedTopology, GraphCache, graph_cache_key
+
+ADJACENCY_ARRAYS = ['indptr', 'indices', 'weights']
+
+def _attach_block(block_name, owner_pid):
+    '''Attach to a shared memory block without tracking it, since the block is owned and unlinked by the publishing
+    process of the given process id. Before Python 3.13, which added the `track` argument, attaching registers the
+    block with the resource tracker of the attaching process, which unlinks the blocks registered with it once the
+    process ends. The worker processes started by the publishing process share its resource tracker, with which the
+    block is registered already, while any other process unregisters the block explicitly'''
+    try:
+        return shared_memory.SharedMemory(name=block_name, track=False)
+    except TypeError:
+        block = shared_memory.SharedMemory(name=block_name)
+        parent = multiprocessing.parent_process()
+        if parent is None or parent.pid != owner_pid:
+            resource_tracker.unregister(block._name, 'shared_memory')
+        return block
+
+class SharedTopologyPublisher():
+    '''Publisher of topologies into shared memory, one block per array of a topology, which owns the blocks and
+    unlinks them on close. The handles of the published topologies are picklable and are given to the worker
+    processes, which attach to the topologies by a `SharedGraphCache`
+
+    '''
+    def publish(self, key, topology):
+        '''Publish the arrays and the adjacency index of a topology under a graph cache key'''
+
+        if key in self.handles:
+            return
+
+        arrays = dict([(name, getattr(topology, name)) for name in CachedTopology.ARRAYS])
+        arrays.update(zip(ADJACENCY_ARRAYS, topology.adjacency()))
+
+        handle = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self._blocks.append(block)
+            handle[name] = (block.name, array.dtype.str, array.shape, os.getpid())
+        self.handles[key] = handle
+
+    def publish_world(self, social_graph_params, make_edge_weights):
+        '''Publish the topology of the social graph of a world, as given by the social graph parameters of a world
+        of the templates. The topology is constructed by the graph cache of the publisher'''
+
+        social_graph_creator = social_graph_params['social_graph_creator']
+        social_graph_creator_kwargs = social_graph_params.get('social_graph_creator_kwargs', {})
+        n_avg_meet = social_graph_params['n_avg_meet']
+        topology = self.graph_cache.topology(social_graph_creator, social_graph_creator_kwargs, n_avg_meet,
+                                             make_edge_weights)
+        self.publish(graph_cache_key(social_graph_creator, social_graph_creator_kwargs, n_avg_meet), topology)
+
+    def close(self):
+        '''Release and remove all shared memory blocks of the publisher. Workers must be done with the topologies'''
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+        self.handles = {}
+
+    def __init__(self, graph_cache=None):
+
+        if graph_cache is None:
+            graph_cache = GraphCache()
+        self.graph_cache = graph_cache
+        self.handles = {}
+        self._blocks = []
+
+class SharedGraphCache():
+    '''Graph cache of a worker process, with the same `topology` method as `GraphCache`, that gives the topologies
+    published into shared memory as topologies with read-only arrays backed by the shared memory. Topologies not
+    published are taken from a fallback graph cache
+
+    '''
+    def topology(self, social_graph_creator, social_graph_creator_kwargs, n_avg_meet, make_edge_weights):
+        '''Topology constructed by the generator with the given arguments and weighted by the function
+        `make_edge_weights` for the given average number of meetings, from shared memory if published'''
+
+        key = graph_cache_key(social_graph_creator, social_graph_creator_kwargs, n_avg_meet)
+        if not key in self.handles:
+            return self.fallback.topology(social_graph_creator, social_graph_creator_kwargs, n_avg_meet,
+                                          make_edge_weights)
+
+        if not key in self._attached:
+            arrays = {}
+            for name, (block_name, dtype, shape, owner_pid) in self.handles[key].items():
+                block = _attach_block(block_name, owner_pid)
+                self._blocks.append(block)
+                array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+                array.flags.writeable = False
+                arrays[name] = array
+            self._attached[key] = CachedTopology(arrays, tuple([arrays[name] for name in ADJACENCY_ARRAYS]))
+
+        return self._attached[key]
+
+    def __init__(self, handles, fallback=None):
+
+        if fallback is None:
+            fallback = GraphCache()
+        self.handles = handles
+        self.fallback = fallback
+        self._attached = {}
+        self._blocks = []
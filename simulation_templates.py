@@ -4,10 +4,21 @@ By Anders Ohrn, March 2020.
 No guarantee of being bug free
 
 '''
+import os
+
 import networkx as nx
-from numpy import random as rnd
+import numpy as np
 
-from graph_growth_classes import Person, World, Disease
+from graph_growth_classes import Person, World, Disease, RandomStream
+from array_engine import ArrayDisease, ArrayWorld, CompleteMixWorld, Population
+from columnar_output import StateTableWriter, state_file_name
+from transition_log import TransitionEventLog
+from online_metrics import MetricRecorder, make_metrics, metrics_file_name
+from batch_engine import BatchCompleteMixWorld, BatchDisease, BatchPopulation, BatchWorld
+from graph_store import GraphStore, population_graph_arrays
+from graph_cache import GraphCache, construct_topology
+from checkpoint import checkpoint_file_name, output_file_offsets, read_checkpoint, write_checkpoint, \
+    remove_checkpoint
 
 #
 # Template disease parameter sets
@@ -643,26 +654,68 @@ WORLDS['Relaxed Caveman Q'] = \
                                                              'p' : 0.01,
                                                              'seed' : 42}}}
 
-def make_persons(n_people, n_infect_init=1, caution_level=0.0, cautious_size=0):
-    '''Create persons to simulate and infected subset
+def _initial_assignments(n_people, n_infect_init, cautious_size, random_stream):
+    '''Draw the indeces of the cautious persons and of the initially infected persons of one world'''
 
-    '''
     if cautious_size > n_people:
         raise ValueError('Number of cautious persons must be less than total')
 
-    people = [Person('Person {}'.format(k)) for k in range(n_people)]
-
+    cautious = []
     if cautious_size > 0:
         inds = list(range(n_people))
-        rnd.shuffle(inds)
-        for ind_more_cautious in inds[0:cautious_size]:
-            people[ind_more_cautious].caution_interaction = caution_level
+        random_stream.generator.shuffle(inds)
+        cautious = inds[0:cautious_size]
+
+    return cautious, random_stream.generator.integers(0, n_people, n_infect_init)
 
-    for k_infect in rnd.randint(0, n_people, n_infect_init):
+def make_persons(n_people, n_infect_init=1, caution_level=0.0, cautious_size=0, random_stream=None):
+    '''Create persons to simulate and infected subset
+
+    '''
+    if random_stream is None:
+        random_stream = RandomStream()
+    cautious, infected = _initial_assignments(n_people, n_infect_init, cautious_size, random_stream)
+
+    people = [Person('Person {}'.format(k)) for k in range(n_people)]
+    for ind_more_cautious in cautious:
+        people[ind_more_cautious].caution_interaction = caution_level
+    for k_infect in infected:
         people[k_infect].infect()
 
     return people
 
+def make_population(n_people, n_infect_init=1, caution_level=0.0, cautious_size=0, random_stream=None):
+    '''Create population of arrays of persons to simulate and infected subset, with the same random draws as
+    `make_persons`
+
+    '''
+    if random_stream is None:
+        random_stream = RandomStream()
+    cautious, infected = _initial_assignments(n_people, n_infect_init, cautious_size, random_stream)
+
+    population = Population(['Person {}'.format(k) for k in range(n_people)])
+    population.caution_interaction[cautious] = caution_level
+    population.transition('infect', infected)
+
+    return population
+
+def make_batch_population(n_replicas, n_people, n_infect_init=1, caution_level=0.0, cautious_size=0,
+                          random_stream=None):
+    '''Create batch population of arrays of persons of replicas to simulate and infected subset of each replica,
+    with the random draws of `make_population` for one replica after the other
+
+    '''
+    if random_stream is None:
+        random_stream = RandomStream()
+
+    population = BatchPopulation(n_replicas, ['Person {}'.format(k) for k in range(n_people)])
+    for k_rep in range(n_replicas):
+        cautious, infected = _initial_assignments(n_people, n_infect_init, cautious_size, random_stream)
+        population.caution_interaction[k_rep * n_people + np.array(cautious, dtype=np.int64)] = caution_level
+        population.transition('infect', k_rep * n_people + infected)
+
+    return population
+
 def make_edge_weights(graph, n_avg_meet):
     '''Compute weights for graph
 
@@ -679,38 +732,33 @@ def make_edge_weights(graph, n_avg_meet):
 def create_population(n_people, n_infect_init, n_avg_meet,
                       caution_level=0.0, cautious_size=0,
                       social_graph_creator = None,
-                      social_graph_creator_kwargs = {}):
-    '''Create population of people in a social graph
+                      social_graph_creator_kwargs = {},
+                      random_stream=None, graph_cache=None):
+    '''Create population of people in a social graph. If a graph cache is given, the weighted topology of the
+    social graph is taken from the cache when present
 
     '''
-    people = make_persons(n_people, n_infect_init, caution_level, cautious_size)
+    people = make_persons(n_people, n_infect_init, caution_level, cautious_size, random_stream)
 
     if not callable(social_graph_creator):
         raise ValueError('Social graph creator required to be executable')
 
+    if not graph_cache is None:
+        topology = graph_cache.topology(social_graph_creator, social_graph_creator_kwargs, n_avg_meet,
+                                        make_edge_weights)
+        return topology.social_graph(people)
+
     social_graph = social_graph_creator(**social_graph_creator_kwargs)
     social_graph = nx.relabel_nodes(social_graph, dict([(k, p) for k, p in enumerate(people)]))
     social_graph = make_edge_weights(social_graph, n_avg_meet)
 
     return social_graph
 
-def simulation(disease_name, world_name, n_days_max, report_interval, out_file_name):
-    '''Set up world and disease and run the simulation for a set number of days or until
-    no infections remain
-
-    '''
-    viral_disease = Disease(name=disease_name,
-                            transmit_trajectory_file='{}_traj.csv'.format(out_file_name),
-                            **DISEASES[disease_name])
+def write_metadata(out_file_name, disease_name, world_name, random_stream, graph_hash=None, graph_store_dir=None,
+                   n_replicas=None):
+    '''Write the metadata of a simulation to the metadata file'''
 
     w_params = WORLDS[world_name]
-    social_graph = create_population(**w_params['social_graph'])
-    the_world = World(name=world_name,
-                      social_graph=social_graph,
-                      quarantine_policy=w_params['quarantine_policy'])
-    nx.write_gml(nx.convert_node_labels_to_integers(social_graph), '{}_social_graph.gml'.format(out_file_name))
-
-    # Simulation metadata
     with open(out_file_name + '_sim_data.csv', 'w') as fout:
         print ('World Name, {}'.format(world_name), file=fout)
         print ('Number of Persons, {}'.format(w_params['social_graph']['n_people']), file=fout)
@@ -725,71 +773,364 @@ def simulation(disease_name, world_name, n_days_max, report_interval, out_file_n
         for key, value in DISEASES[disease_name].items():
             print('Disease Argument {}, {}'.format(key, value), file=fout)
 
+        seed_metadata = random_stream.metadata()
+        print ('Random Seed Entropy, {}'.format(seed_metadata['entropy']), file=fout)
+        print ('Random Seed Spawn Key, {}'.format(' '.join([str(k) for k in seed_metadata['spawn_key']])), file=fout)
+
+        if not graph_hash is None:
+            print ('Social Graph Hash, {}'.format(graph_hash), file=fout)
+            print ('Social Graph Store, {}'.format(graph_store_dir), file=fout)
+
+        if not n_replicas is None:
+            print ('Number of Replicas, {}'.format(n_replicas), file=fout)
+
+class EngineOptions():
+    '''Options of the engine of a simulation. The engine is either 'object', with a `Person` object per node of the
+    social graph, or 'array', with the state of all persons held in arrays and progressed by vectorized passes. With
+    the array engine, a world with a complete social graph is simulated as a `CompleteMixWorld`, in which the edges
+    are implicit. Additional keyword arguments to the disease class of the engine, such as the `transmission_mode` of
+    the array engine, are given by `disease_kwargs`
+
+    '''
+    def __init__(self, engine='object', disease_kwargs=None):
+
+        if not engine in ['object', 'array']:
+            raise ValueError('Unknown simulation engine: {}'.format(engine))
+        self.engine = engine
+        self.disease_kwargs = {} if disease_kwargs is None else dict(disease_kwargs)
+
+
+class OutputOptions():
+    '''Options of the output files of a simulation.
+
+    The report mode is one of:
+
+    'snapshot' : the state of every person is written to the data file every report interval.
+
+    'counts' : the number of persons in each state, per caution level if `report_caution_strata`, is appended as a
+    row to the counts file every report interval.
+
+    'events' : every state transition of every person is appended to the events file, from which the state on any
+    day can be reconstructed.
+
+    'none' : nothing is reported.
+
+    In all report modes but 'snapshot', the state of every person is written only on the days in `snapshot_days`.
+    The state is written as 'csv', stacked with one row per property, or as 'parquet', with one typed column per
+    property, to one file per run or, if `state_dataset_dir` is given, to the partition of the run in a dataset across
+    runs. The transmission trajectory is written as 'csv', as 'binary', with integer person ids, or not at all if the
+    trajectory format is None. The social graph is written as 'gml' or added to the binary graph store in
+    `graph_store_dir`, by default the directory 'graph_store' next to the output files, and referenced by its hash in
+    the metadata. The online metrics, a dict of the names of metrics of `online_metrics.METRICS` and their keyword
+    arguments, are accumulated as the simulation runs and their summary written to the metrics file at the end
+
+    '''
+    def replaced(self, **options):
+        '''Output options with the given options replaced'''
+        return OutputOptions(**dict(vars(self), **options))
+
+    def __init__(self, report_mode='snapshot', report_caution_strata=False, snapshot_days=None,
+                 trajectory_format='csv', state_format='csv', state_dataset_dir=None,
+                 graph_output='gml', graph_store_dir=None, online_metrics=None):
+
+        if not report_mode in ['snapshot', 'counts', 'events', 'none']:
+            raise ValueError('Unknown report mode: {}'.format(report_mode))
+        if not trajectory_format in [None, 'csv', 'binary']:
+            raise ValueError('Unknown trajectory file format: {}'.format(trajectory_format))
+        if not state_format in ['csv', 'parquet']:
+            raise ValueError('Unknown state format: {}'.format(state_format))
+        if not graph_output in ['gml', 'store']:
+            raise ValueError('Unknown graph output: {}'.format(graph_output))
+
+        self.report_mode = report_mode
+        self.report_caution_strata = report_caution_strata
+        self.snapshot_days = [] if snapshot_days is None else list(snapshot_days)
+        self.trajectory_format = trajectory_format
+        self.state_format = state_format
+        self.state_dataset_dir = state_dataset_dir
+        self.graph_output = graph_output
+        self.graph_store_dir = graph_store_dir
+        self.online_metrics = {} if online_metrics is None else dict(online_metrics)
+
+
+def _trajectory_file_name(out_file_name, trajectory_format):
+    '''Name of the trajectory file of a simulation, None if no trajectory is written'''
+    if trajectory_format is None:
+        return None
+    return '{}_traj.{}'.format(out_file_name, 'bin' if trajectory_format == 'binary' else 'csv')
+
+def _make_world(world_name, engine_options, random_stream, graph_cache=None):
+    '''World of the engine of the options, along with the social graph of persons of the object engine and the
+    topology of the array engine, either of which is None if not constructed'''
+
+    w_params = WORLDS[world_name]
+    g_params = w_params['social_graph']
+    social_graph = None
+    topology = None
+    if engine_options.engine == 'array':
+        population = make_population(g_params['n_people'], g_params['n_infect_init'],
+                                     g_params.get('caution_level', 0.0), g_params.get('cautious_size', 0),
+                                     random_stream)
+
+    if engine_options.engine == 'array' and g_params['social_graph_creator'] is nx.complete_graph:
+        the_world = CompleteMixWorld(world_name, population, g_params['n_avg_meet'],
+                                     quarantine_policy=w_params['quarantine_policy'],
+                                     random_stream=random_stream)
+
+    elif engine_options.engine == 'array':
+        if graph_cache is None:
+            topology = construct_topology(g_params['social_graph_creator'],
+                                          g_params.get('social_graph_creator_kwargs', {}),
+                                          g_params['n_avg_meet'], make_edge_weights)
+        else:
+            topology = graph_cache.topology(g_params['social_graph_creator'],
+                                            g_params.get('social_graph_creator_kwargs', {}),
+                                            g_params['n_avg_meet'], make_edge_weights)
+        population = topology.node_population(population)
+        if engine_options.disease_kwargs.get('transmission_mode', 'all edges') == 'frontier':
+            adjacency = topology.adjacency()
+        else:
+            adjacency = None
+        the_world = ArrayWorld(world_name, population, *topology.edge_arrays(),
+                               quarantine_policy=w_params['quarantine_policy'],
+                               random_stream=random_stream, adjacency=adjacency)
+
+    else:
+        social_graph = create_population(random_stream=random_stream, graph_cache=graph_cache, **g_params)
+        the_world = World(name=world_name,
+                          social_graph=social_graph,
+                          quarantine_policy=w_params['quarantine_policy'],
+                          random_stream=random_stream)
+
+    return the_world, social_graph, topology
+
+def _write_social_graph(out_file_name, output_options, the_world, social_graph, topology):
+    '''Write the social graph of a world as set by the output options. Return the hash of the graph in the graph store
+    and the directory of the store, or None for both if the graph is not stored'''
+
+    graph_hash = None
+    graph_store_dir = None
+    if output_options.graph_output == 'store':
+        graph_store_dir = output_options.graph_store_dir
+        if graph_store_dir is None:
+            graph_store_dir = os.path.join(os.path.dirname(out_file_name), 'graph_store')
+        if not social_graph is None:
+            graph_hash = GraphStore(graph_store_dir).put(social_graph)
+        elif not topology is None:
+            graph_hash = GraphStore(graph_store_dir).put_arrays(population_graph_arrays(the_world.population,
+                                                                                        *topology.edge_arrays()))
+
+    else:
+        if social_graph is None and not topology is None:
+            social_graph = topology.social_graph(list(range(len(the_world.population))))
+        if not social_graph is None:
+            nx.write_gml(nx.convert_node_labels_to_integers(social_graph), '{}_social_graph.gml'.format(out_file_name))
+
+    return graph_hash, graph_store_dir
+
+def simulation(disease_name, world_name, n_days_max, report_interval, out_file_name, seed=None,
+               engine_options=None, output_options=None, checkpoint_interval=0, graph_cache=None):
+    '''Set up world and disease and run the simulation for a set number of days or until
+    no infections remain. All random numbers are drawn from one stream seeded by `seed`, an integer or a
+    `numpy.random.SeedSequence`, which is recorded in the metadata. The engine and the output files are set by
+    `EngineOptions` and `OutputOptions`. The topology of the social graph is taken from the graph cache, if given.
+    If `checkpoint_interval` is greater than zero, a checkpoint is written every checkpoint interval days, from
+    which an interrupted simulation is continued by `resume_simulation`
+
+    '''
+    if engine_options is None:
+        engine_options = EngineOptions()
+    if output_options is None:
+        output_options = OutputOptions()
+    if checkpoint_interval > 0 and output_options.state_format == 'parquet':
+        raise ValueError('Checkpoints not available with state format parquet')
+
+    random_stream = RandomStream(seed)
+    disease_class = ArrayDisease if engine_options.engine == 'array' else Disease
+    viral_disease = disease_class(name=disease_name,
+                                  transmit_trajectory_file=_trajectory_file_name(out_file_name,
+                                                                                 output_options.trajectory_format),
+                                  transmit_trajectory_format=output_options.trajectory_format,
+                                  random_stream=random_stream,
+                                  **DISEASES[disease_name], **engine_options.disease_kwargs)
+
+    the_world, social_graph, topology = _make_world(world_name, engine_options, random_stream, graph_cache)
+    graph_hash, graph_store_dir = _write_social_graph(out_file_name, output_options, the_world, social_graph,
+                                                      topology)
+
+    # Simulation metadata
+    write_metadata(out_file_name, disease_name, world_name, random_stream, graph_hash, graph_store_dir)
+
     # Run the simulation
-    open(out_file_name + '_data.csv', 'w').close()
+    state_writer = None
+    event_log = None
+    if output_options.state_format == 'csv':
+        open(out_file_name + '_data.csv', 'w').close()
+    else:
+        state_writer = StateTableWriter(state_file_name(out_file_name, output_options.state_dataset_dir))
+    if output_options.report_mode == 'counts':
+        open(out_file_name + '_counts.csv', 'w').close()
+    elif output_options.report_mode == 'events':
+        event_log = TransitionEventLog(out_file_name + '_events.csv')
+        event_log.attach(the_world)
+
+    metric_recorder = None
+    if len(output_options.online_metrics) > 0:
+        metric_recorder = MetricRecorder(metrics_file_name(out_file_name), make_metrics(output_options.online_metrics))
+        metric_recorder.attach(the_world, viral_disease)
+
+    run_params = {'n_days_max' : n_days_max,
+                  'report_interval' : report_interval,
+                  'out_file_name' : out_file_name,
+                  'output_options' : output_options,
+                  'checkpoint_interval' : checkpoint_interval}
+    remove_checkpoint(checkpoint_file_name(out_file_name))
+    _simulate_days(the_world, viral_disease, 0, run_params, state_writer, event_log, metric_recorder)
+
+def resume_simulation(out_file_name):
+    '''Resume the simulation of the given output file name from its last checkpoint. The output files are
+    truncated to their state at the checkpoint and the simulation continues with the same random stream, such that
+    the output is identical to that of the simulation had it not been interrupted
+
+    '''
+    state = read_checkpoint(checkpoint_file_name(out_file_name))
+    print ('Resume Simulation At Day: {}'.format(state['k_day'] + 1))
+
+    _simulate_days(state['world'], state['disease'], state['k_day'], state['run_params'],
+                  event_log=state['event_log'], metric_recorder=state.get('metric_recorder'))
+
+def _output_files(run_params):
+    '''Output files of a simulation that are appended to as the simulation runs'''
+    out_file_name = run_params['out_file_name']
+    file_names = [out_file_name + '_data.csv', out_file_name + '_counts.csv', out_file_name + '_events.csv']
+    traj_file_name = _trajectory_file_name(out_file_name, run_params['output_options'].trajectory_format)
+    if not traj_file_name is None:
+        file_names += [traj_file_name, traj_file_name + '.names']
+
+    return file_names
+
+def _write_day_checkpoint(k_day, the_world, viral_disease, run_params, event_log, metric_recorder):
+    '''Write the checkpoint of a simulation at the end of a given day, along with the sizes of its output files'''
+
+    if not event_log is None:
+        event_log.flush()
+    write_checkpoint(checkpoint_file_name(run_params['out_file_name']), output_file_offsets(_output_files(run_params)),
+                     {'k_day' : k_day + 1,
+                      'world' : the_world,
+                      'disease' : viral_disease,
+                      'random_stream' : viral_disease.random_stream,
+                      'event_log' : event_log,
+                      'metric_recorder' : metric_recorder,
+                      'run_params' : run_params},
+                     the_world.static_arrays() if isinstance(the_world, ArrayWorld) else {})
+
+def _simulate_days(the_world, viral_disease, k_day_start, run_params, state_writer=None, event_log=None,
+                   metric_recorder=None):
+    '''Simulate the days of a world and disease from a given day, with the reports written as set by the output
+    options of the run parameters, see `simulation`. If the checkpoint interval of the run parameters is greater than
+    zero, a checkpoint is written every checkpoint interval, which is removed once the simulation is complete. The
+    summary of the online metrics of the metric recorder, if any, is written once the simulation is complete
+
+    '''
+    n_days_max = run_params['n_days_max']
+    report_interval = run_params['report_interval']
+    out_file_name = run_params['out_file_name']
+    output_options = run_params['output_options']
+    report_mode = output_options.report_mode
+    checkpoint_interval = run_params['checkpoint_interval']
+
+    try:
+        viral_disease.open()
+        for k_day in range(k_day_start, n_days_max):
+            print ('Simulate Day: {}'.format(k_day + 1))
+
+            viral_disease.progress_one_more_day(the_world)
+            if report_mode == 'snapshot':
+                write_snapshot = k_day % report_interval == 0
+            else:
+                write_snapshot = viral_disease.day_counter in output_options.snapshot_days
+                if report_mode == 'counts' and k_day % report_interval == 0:
+                    df_counts = the_world.report_counts(output_options.report_caution_strata)
+                    with open(out_file_name + '_counts.csv', 'a') as f:
+                        df_counts.to_csv(f, mode='a', header=f.tell() == 0, index=False)
+
+            if write_snapshot and output_options.state_format == 'csv':
+                df_report = the_world.report()
+                with open(out_file_name + '_data.csv', 'a') as f:
+                    df_report.to_csv(f, mode='a', header=f.tell() == 0)
+            elif write_snapshot:
+                state_writer.write(the_world.report_table())
+
+            if the_world.is_disease_free():
+                break
+
+            if checkpoint_interval > 0 and (k_day + 1) % checkpoint_interval == 0:
+                _write_day_checkpoint(k_day, the_world, viral_disease, run_params, event_log, metric_recorder)
+
+    finally:
+        viral_disease.close()
+        if not state_writer is None:
+            state_writer.close()
+        if not event_log is None:
+            event_log.close()
+
+    if not metric_recorder is None:
+        metric_recorder.write()
+    remove_checkpoint(checkpoint_file_name(out_file_name))
+
+def batch_simulation(disease_name, world_name, n_replicas, n_days_max, report_interval, out_file_name,
+                     disease_kwargs=None, seed=None, graph_cache=None):
+    '''Set up replicas of a world and disease, which the batch engine advances together, and run the simulation for
+    a set number of days or until no infections remain in any replica. Every report interval, the number of persons
+    in each state of every replica is appended as a row, with the replica index, to the batch counts file, which is
+    named apart from the counts file of a single simulation. A replica that is disease free is left out of the
+    simulation, so its rows repeat its final state. Additional keyword arguments to `BatchDisease`, such as the
+    `transmission_mode`, are given by `disease_kwargs`. All random numbers of all replicas are drawn from one stream
+    seeded by `seed`. The topology of the social graph is taken from the graph cache, if given. In a complete mix
+    world, the contacts are drawn as by `CompleteMixWorld`, and no social graph is constructed
+
+    '''
+    if disease_kwargs is None:
+        disease_kwargs = {}
+    random_stream = RandomStream(seed)
+
+    viral_disease = BatchDisease(name=disease_name, random_stream=random_stream,
+                                 **DISEASES[disease_name], **disease_kwargs)
+
+    w_params = WORLDS[world_name]
+    g_params = w_params['social_graph']
+    population = make_batch_population(n_replicas, g_params['n_people'], g_params['n_infect_init'],
+                                       g_params.get('caution_level', 0.0), g_params.get('cautious_size', 0),
+                                       random_stream)
+
+    if g_params['social_graph_creator'] is nx.complete_graph:
+        the_world = BatchCompleteMixWorld(world_name, population, g_params['n_avg_meet'],
+                                          quarantine_policy=w_params['quarantine_policy'],
+                                          random_stream=random_stream)
+
+    # The persons of the batch population are indexed by the integer labels of the generator
+    else:
+        if graph_cache is None:
+            graph_cache = GraphCache()
+        topology = graph_cache.topology(g_params['social_graph_creator'],
+                                        g_params.get('social_graph_creator_kwargs', {}),
+                                        g_params['n_avg_meet'], make_edge_weights)
+        edge_a, edge_b, edge_weight = topology.edge_arrays()
+        the_world = BatchWorld(world_name, population, topology.nodes[edge_a], topology.nodes[edge_b], edge_weight,
+                               quarantine_policy=w_params['quarantine_policy'],
+                               random_stream=random_stream)
+
+    write_metadata(out_file_name, disease_name, world_name, random_stream, n_replicas=n_replicas)
+
+    open(out_file_name + '_batch_counts.csv', 'w').close()
     for k_day in range(n_days_max):
         print ('Simulate Day: {}'.format(k_day + 1))
 
         viral_disease.progress_one_more_day(the_world)
         if k_day % report_interval == 0:
-            df_report = the_world.report()
-            with open(out_file_name + '_data.csv', 'a') as f:
-                df_report.to_csv(f, mode='a', header=f.tell() == 0)
+            df_counts = the_world.report_counts()
+            with open(out_file_name + '_batch_counts.csv', 'a') as f:
+                df_counts.to_csv(f, mode='a', header=f.tell() == 0, index=False)
 
         if the_world.is_disease_free():
             break
-
-if __name__ == '__main__':
-
-    disease_sim = ['Virus Y Early Revealer']
-    world_sim = ['Small World Beta 1p Q']
-    short_label = {'Virus Y Early Revealer' : 'early',
-                   'Small World Beta 1p Q' : 'smallworld1pQ'}
-#    world_sim = ['Complete Mix Q',
-#                 'Complete Mix Q Cautious 50_200', 'Complete Mix Q Cautious 50_100',
-#                 'Complete Mix Q Cautious 25_200', 'Complete Mix Q Cautious 25_100',
-#                 'Small World Beta 0', 'Small World Beta 1p',
-#                 'Small World Beta 0 Q', 'Small World Beta 1p Q',
-#                 'Small World Beta 0 Q Cautious 50_200', 'Small World Beta 1p Q Cautious 50_200',
-#                 'Relaxed Caveman', 'Relaxed Caveman Cautious 50_200', 'Relaxed Caveman Q']
-#    short_label = {'Virus Y Baseline' : 'baseline',
-#                   'Virus Y Delayed Recovery' : 'delayed',
-#                   'Virus Y High Base Transmitter' : 'rapid',
-#                   'Complete Mix Q' : 'completeQ',
-#                   'Complete Mix Q Cautious 50_200' : 'completeQC50200',
-#                   'Complete Mix Q Cautious 50_100' : 'completeQC50100',
-#                   'Complete Mix Q Cautious 25_200' : 'completeQC25200',
-#                   'Complete Mix Q Cautious 25_100' : 'completeQC25100',
-#                   'Small World Beta 0' : 'ringlattice',
-#                   'Small World Beta 1p' : 'smallworld1p',
-#                   'Small World Beta 0 Q' : 'ringlatticeQ',
-#                   'Small World Beta 1p Q' : 'smallworld1pQ',
-#                   'Small World Beta 0 Q Cautious 50_200' : 'ringlatticeQC50200',
-#                   'Small World Beta 1p Q Cautious 50_200' : 'smallworld1pQC50200',
-#                   'Relaxed Caveman' : 'caveman',
-#                   'Relaxed Caveman Cautious 50_200' : 'cavemanC50200',
-#                   'Relaxed Caveman Q' : 'cavemanQ'}
-
-    sim_repeater = 5
-    sim_index_init = 0
-    sim_max_steps = 120
-    sim_reporter_interval = 1
-
-    for dd in disease_sim:
-        if not dd in DISEASES.keys():
-            raise ValueError('Disease label {} not in DISEASES'.format(dd))
-    for ww in world_sim:
-        if not ww in WORLDS.keys():
-            raise ValueError('World label {} not in WORLDS'.format(ww))
-    for label in short_label:
-        if not ((label in disease_sim) or (label in world_sim)):
-            raise ValueError('Label {} not in World or Disease'.format(label))
-
-    for repeat_index in range(sim_repeater):
-        for disease in disease_sim:
-            for world in world_sim:
-                out_name_prefix = 'simfile_{}_{}_{}'.format(short_label[disease], short_label[world], repeat_index + sim_index_init)
-                try:
-                    simulation(disease, world, sim_max_steps, sim_reporter_interval, out_name_prefix)
-                except:
-                    print ('Problem: {}, {}, {}'.format(repeat_index + sim_index_init, disease,world))
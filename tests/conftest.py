@@ -0,0 +1,7 @@
+'''Put the modules of the repository, which live at its top level, on the path of the tests
+
+'''
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,71 @@
+'''Tests of the analysis of the long-format state data files
+
+'''
+import contextlib
+from functools import partial
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import map_files, property_count_progression, select_caution, state_progression
+from simulation_templates import EngineOptions, OutputOptions, simulation
+
+SELECTORS = [None, lambda caution: caution > 0.0, lambda caution: caution == 0.0]
+
+@pytest.fixture(scope='module')
+def data_file(tmp_path_factory):
+    out = str(tmp_path_factory.mktemp('analysis') / 'run')
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulation('Virus Y High Base Transmitter', 'Small World Beta 1p Cautious 50_200', 12, 2, out, seed=7,
+                   engine_options=EngineOptions(engine='array'), output_options=OutputOptions(trajectory_format=None))
+    return out + '_data.csv'
+
+def _unchunked_count(growth_file, property_label, filter_caution_selector):
+    '''Count per day of the persons in a state, from the whole file, with the caution filter of `select_caution`'''
+    df = pd.read_csv(growth_file, dtype={'0' : str})
+    if not filter_caution_selector is None:
+        df = select_caution(df, filter_caution_selector)
+    df_state = df.loc[df['property'] == property_label]
+    return (df_state['0'] == 'True').groupby(df_state['time_coordinate']).sum()
+
+@pytest.mark.parametrize('chunksize', [97, 1000000])
+@pytest.mark.parametrize('selector', SELECTORS)
+def test_chunked_count_as_unchunked(data_file, chunksize, selector):
+    df = property_count_progression(data_file, 'infected', selector, chunksize=chunksize)
+    expected = _unchunked_count(data_file, 'infected', selector)
+
+    assert df['time_coordinate'].tolist() == expected.index.tolist() == [1, 3, 5, 7, 9, 11]
+    assert df['N_people_Yes'].tolist() == expected.tolist()
+    assert df['N_people_Yes'].iloc[-1] > 0
+
+@pytest.mark.parametrize('selector', SELECTORS[1:])
+def test_caution_filter_independent_of_row_order(data_file, tmp_path, selector):
+    shuffled_file = str(tmp_path / 'shuffled_data.csv')
+    pd.read_csv(data_file, dtype={'0' : str}).sample(frac=1.0, random_state=np.random.RandomState(3)).to_csv(
+        shuffled_file, index=False)
+
+    df_shuffled = property_count_progression(shuffled_file, 'infected', selector, chunksize=97)
+    df = property_count_progression(data_file, 'infected', selector)
+
+    pd.testing.assert_frame_equal(df_shuffled, df)
+
+def test_invalid_state_value(data_file):
+    with pytest.raises(ValueError):
+        property_count_progression(data_file, 'caution_interaction')
+
+def test_pool_reductions_as_serial(tmp_path):
+    counts_files = []
+    for k in range(5):
+        counts_file = str(tmp_path / 'run{}_counts.csv'.format(k))
+        pd.DataFrame({'time_coordinate' : [1, 2, 3], 'infected' : [k, 2 * k, 3 * k]}).to_csv(counts_file, index=False)
+        counts_files.append(counts_file)
+    reduce_file = partial(state_progression, slice_name='infected')
+
+    serial = map_files(reduce_file, counts_files, n_workers=1)
+    pooled = map_files(reduce_file, counts_files, n_workers=3)
+
+    assert [df['N_people_Yes'].tolist() for df in pooled] == [[k, 2 * k, 3 * k] for k in range(5)]
+    for df_pooled, df_serial in zip(pooled, serial):
+        pd.testing.assert_frame_equal(df_pooled, df_serial)
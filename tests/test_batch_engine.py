@@ -0,0 +1,85 @@
+'''Tests of the batch engine, of its counts file and of the analysis of the counts file
+
+'''
+import contextlib
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import batch_count_progression, state_progression
+from array_engine import ArrayDisease
+from batch_engine import BatchDisease
+from simulation_templates import DISEASES, EngineOptions, OutputOptions, batch_simulation, simulation
+
+WORLD = 'Small World Beta 1p'
+
+def _quiet(func, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+def test_batch_transmission_mode_default_as_array_engine():
+    assert BatchDisease('test', **DISEASES['Virus Y Baseline']).transmission_mode == \
+           ArrayDisease('test', **DISEASES['Virus Y Baseline']).transmission_mode
+
+def test_batch_counts_row_per_replica_and_day(tmp_path):
+    out = str(tmp_path / 'batch')
+    _quiet(batch_simulation, 'Virus Y Baseline', WORLD, 4, 80, 1, out, seed=3)
+
+    assert not os.path.exists(out + '_counts.csv')
+    df = pd.read_csv(out + '_batch_counts.csv')
+    for _, df_day in df.groupby('time_coordinate'):
+        assert sorted(df_day['replica']) == [0, 1, 2, 3]
+
+def test_batch_count_progression_by_replica(tmp_path):
+    '''Replica 1 ends on day 2, and its final count is kept for the mean over replicas'''
+    batch_counts_file = str(tmp_path / 'hand_batch_counts.csv')
+    pd.DataFrame({'time_coordinate' : [1, 1, 2, 2, 3],
+                  'replica' : [0, 1, 0, 1, 0],
+                  'infected' : [2, 4, 6, 8, 10]}).to_csv(batch_counts_file, index=False)
+
+    df = batch_count_progression(batch_counts_file, 'infected')
+    assert df.loc[df['replica'] == 1, 'N_people_Yes'].tolist() == [4, 8, 8]
+    assert batch_count_progression(batch_counts_file, 'infected', replica=0)['N_people_Yes'].tolist() == [2, 6, 10]
+    assert state_progression(batch_counts_file, 'infected')['N_people_Yes'].tolist() == [3.0, 7.0, 9.0]
+
+@pytest.mark.parametrize('transmission_mode', ['all edges', 'frontier'])
+def test_batch_attack_size_as_array_engine(tmp_path, transmission_mode):
+    '''The batch engine and the array engine give the same distribution of the final number of immune persons'''
+    n_replicas = 8
+    disease_kwargs = {'transmission_mode' : transmission_mode}
+
+    out = str(tmp_path / 'batch')
+    _quiet(batch_simulation, 'Virus Y Baseline', WORLD, n_replicas, 100, 1, out, seed=11,
+           disease_kwargs=disease_kwargs)
+    df_batch = pd.read_csv(out + '_batch_counts.csv')
+    immune_batch = df_batch.loc[df_batch['time_coordinate'] == df_batch['time_coordinate'].max(), 'immune']
+
+    immune_array = []
+    for k in range(n_replicas):
+        out = str(tmp_path / 'array_{}'.format(k))
+        _quiet(simulation, 'Virus Y Baseline', WORLD, 100, 1, out, seed=100 + k,
+               engine_options=EngineOptions(engine='array', disease_kwargs=disease_kwargs),
+               output_options=OutputOptions(report_mode='counts', trajectory_format=None))
+        immune_array.append(pd.read_csv(out + '_counts.csv')['immune'].iloc[-1])
+
+    assert np.mean(immune_batch) == pytest.approx(np.mean(immune_array), rel=0.1)
+
+def test_batch_of_one_complete_mix_as_array_engine(tmp_path):
+    '''A batch of one replica of a complete mix world makes the random draws of the array engine'''
+    world = 'Complete Mix Q Cautious 50_200'
+
+    out = str(tmp_path / 'batch')
+    _quiet(batch_simulation, 'Virus Y High Base Transmitter', world, 1, 40, 1, out, seed=5)
+    df_batch = pd.read_csv(out + '_batch_counts.csv')
+
+    out = str(tmp_path / 'array')
+    _quiet(simulation, 'Virus Y High Base Transmitter', world, 40, 1, out, seed=5,
+           engine_options=EngineOptions(engine='array'),
+           output_options=OutputOptions(report_mode='counts', trajectory_format=None))
+    df_array = pd.read_csv(out + '_counts.csv')
+
+    assert df_batch['immune'].iloc[-1] > 0
+    pd.testing.assert_frame_equal(df_batch[df_array.columns], df_array, check_dtype=False)
@@ -0,0 +1,52 @@
+'''Tests of the checkpoints of simulations and of the resume of interrupted simulations
+
+'''
+import contextlib
+import io
+import os
+
+import pytest
+
+from array_engine import ArrayDisease
+from checkpoint import checkpoint_file_name, static_arrays_file_name
+from simulation_templates import EngineOptions, OutputOptions, resume_simulation, simulation
+
+WORLD = 'Small World Beta 1p'
+
+def _simulate(out, disease_kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulation('Virus Y High Base Transmitter', WORLD, 60, 1, out, seed=8,
+                   engine_options=EngineOptions(engine='array', disease_kwargs=disease_kwargs),
+                   output_options=OutputOptions(report_mode='counts'), checkpoint_interval=10)
+
+@pytest.mark.parametrize('transmission_mode', ['all edges', 'frontier'])
+def test_resume_as_uninterrupted(tmp_path, monkeypatch, transmission_mode):
+    disease_kwargs = {'transmission_mode' : transmission_mode}
+    complete = str(tmp_path / 'complete')
+    _simulate(complete, disease_kwargs)
+    assert not os.path.exists(checkpoint_file_name(complete))
+    assert not os.path.exists(static_arrays_file_name(checkpoint_file_name(complete)))
+
+    progress_one_more_day = ArrayDisease.progress_one_more_day
+    def interrupted(self, world):
+        if self.day_counter == 25:
+            raise KeyboardInterrupt()
+        progress_one_more_day(self, world)
+    monkeypatch.setattr(ArrayDisease, 'progress_one_more_day', interrupted)
+
+    resumed = str(tmp_path / 'resumed')
+    with pytest.raises(KeyboardInterrupt):
+        _simulate(resumed, disease_kwargs)
+    checkpoint_file = checkpoint_file_name(resumed)
+    static_file = static_arrays_file_name(checkpoint_file)
+
+    # The edges are in the static arrays, written once, and not in the checkpoint
+    assert os.path.getsize(checkpoint_file) < os.path.getsize(static_file) / 4
+
+    monkeypatch.setattr(ArrayDisease, 'progress_one_more_day', progress_one_more_day)
+    with contextlib.redirect_stdout(io.StringIO()):
+        resume_simulation(resumed)
+    assert not os.path.exists(checkpoint_file) and not os.path.exists(static_file)
+
+    for suffix in ['_counts.csv', '_traj.csv']:
+        assert open(complete + suffix).read() == open(resumed + suffix).read()
@@ -0,0 +1,79 @@
+'''Tests of the typed Parquet output of the state data against the state tables of the world and the csv output of
+the same simulation
+
+'''
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from analysis import property_count_progression, state_table_progression
+from array_engine import ArrayWorld, Population
+from columnar_output import StateTableWriter, read_state_table, state_file_name
+from graph_growth_classes import RandomStream
+from simulation_templates import EngineOptions, OutputOptions, simulation
+
+def _report_tables():
+    population = Population(['Person {}'.format(k) for k in range(6)], caution_interaction=[0.0, 0.5] * 3)
+    world = ArrayWorld('test', population, [0, 1, 2], [1, 2, 3], [0.2, 0.3, 0.4], random_stream=RandomStream(0))
+    tables = []
+    for day in range(1, 4):
+        world.synchronize(day)
+        population.transition('infect', np.array([day]))
+        tables.append(world.report_table())
+    return tables
+
+def test_state_tables_round_trip(tmp_path):
+    tables = _report_tables()
+    file_name = str(tmp_path / 'state.parquet')
+    writer = StateTableWriter(file_name)
+    for df_table in tables:
+        writer.write(df_table)
+    writer.close()
+
+    df = read_state_table(file_name)
+    expected = pd.concat(tables, ignore_index=True)
+    assert df['name'].dtype == 'category'
+    pd.testing.assert_frame_equal(df.astype({'name' : str}), expected)
+
+def test_no_file_without_tables(tmp_path):
+    file_name = str(tmp_path / 'state.parquet')
+    StateTableWriter(file_name).close()
+    assert not (tmp_path / 'state.parquet').exists()
+
+@pytest.mark.parametrize('engine', ['object', 'array'])
+def test_parquet_progression_as_csv(tmp_path, engine):
+    outputs = {}
+    for state_format in ['csv', 'parquet']:
+        out = str(tmp_path / state_format)
+        with contextlib.redirect_stdout(io.StringIO()):
+            simulation('Virus Y High Base Transmitter', 'Small World Beta 1p Cautious 50_200', 10, 2, out,
+                       seed=1, engine_options=EngineOptions(engine=engine),
+                       output_options=OutputOptions(state_format=state_format, trajectory_format=None))
+        outputs[state_format] = out
+
+    for selector in [None, lambda caution: caution > 0.0]:
+        df_csv = property_count_progression(outputs['csv'] + '_data.csv', 'infected', selector)
+        df_parquet = state_table_progression(state_file_name(outputs['parquet']), 'infected', selector)
+        pd.testing.assert_frame_equal(df_parquet, df_csv, check_dtype=False)
+        assert len(df_parquet) == 5
+
+def test_dataset_partitioned_by_run(tmp_path):
+    dataset_dir = str(tmp_path / 'dataset')
+    for seed in [1, 2]:
+        out = str(tmp_path / 'run{}'.format(seed))
+        with contextlib.redirect_stdout(io.StringIO()):
+            simulation('Virus Y High Base Transmitter', 'Small World Beta 1p', 5, 1, out, seed=seed,
+                       engine_options=EngineOptions(engine='array'),
+                       output_options=OutputOptions(state_format='parquet', state_dataset_dir=dataset_dir,
+                                                    trajectory_format=None))
+
+    df = read_state_table(dataset_dir, columns=['name', 'time_coordinate', 'infected', 'run'])
+    assert sorted(df['run'].unique()) == ['run1', 'run2']
+    assert len(df) == 2 * 5 * 1000
+    df_run = read_state_table(dataset_dir, columns=['time_coordinate', 'infected'], run='run2')
+    assert (df_run['infected'].to_numpy() == df.loc[df['run'] == 'run2', 'infected'].to_numpy()).all()
@@ -0,0 +1,79 @@
+'''Tests of the effective contacts of the complete mix world against the meetings and transmissions along the
+explicit edges of a complete graph
+
+'''
+import itertools
+
+import numpy as np
+import pytest
+
+from array_engine import ArrayDisease, ArrayWorld, CompleteMixWorld, Population
+from graph_growth_classes import RandomStream
+from simulation_templates import DISEASES
+
+N_PEOPLE = 120
+N_AVG_MEET = 20
+BASE_PROB = 0.2
+
+def _population():
+    '''Population with contagious persons of two caution levels, and persons unable to meet or to be infected'''
+    population = Population(['Person {}'.format(k) for k in range(N_PEOPLE)],
+                            caution_interaction=np.where(np.arange(N_PEOPLE) % 3 == 0, 0.5, 0.0))
+    population.transition('infect', np.arange(20))
+    population.transition('activate', np.arange(15))
+    population.transition('quarantine', np.array([0, 1]))
+    population.transition('immunize', np.arange(100, 110))
+    population.transition('succumb', np.array([110]))
+    return population
+
+def test_effective_contacts_as_binomial():
+    world = CompleteMixWorld('test', _population(), N_AVG_MEET, random_stream=RandomStream(1))
+    n_runs = 400
+    susceptible, sources, level_starts, level_counts, n_contacts = world.effective_contacts(BASE_PROB)
+
+    assert susceptible.tolist() == list(range(20, 100)) + list(range(111, N_PEOPLE))
+    assert sources.tolist() == [k for k in range(2, 15) if k % 3 != 0] + [k for k in range(2, 15) if k % 3 == 0]
+    assert (level_starts == [0, 9]).all() and (level_counts == [9, 4]).all()
+
+    total = np.zeros(n_contacts.shape)
+    for _ in range(n_runs):
+        total += world.effective_contacts(BASE_PROB)[4]
+    caution = np.maximum(world.population.caution_interaction[susceptible][:, np.newaxis], [[0.0, 0.5]])
+    expected = np.array([[9, 4]]) * world.meet_weight * BASE_PROB * (1.0 - caution)
+
+    assert total.mean(axis=0) / n_runs == pytest.approx(expected.mean(axis=0), rel=0.05)
+
+def _infections(world, n_runs):
+    '''Number of times each person is infected, and is the transmitter, in one day of transmissions'''
+
+    disease = ArrayDisease('test', random_stream=world.random_stream,
+                           **dict(DISEASES['Virus Y Baseline'], transmission_base_prob=BASE_PROB))
+    population = world.population
+    n_infected = np.zeros(N_PEOPLE)
+    n_transmitted = np.zeros(N_PEOPLE)
+    for _ in range(n_runs):
+        world.population = population.reordered(np.arange(N_PEOPLE))
+        if isinstance(world, CompleteMixWorld):
+            transmitters, receivers = disease._transmission_complete_mix(world)
+        else:
+            transmitters, receivers = disease._transmission_edges(world)
+        n_infected[receivers] += 1
+        n_transmitted[transmitters] += 1
+
+    return n_infected, n_transmitted
+
+def test_transmissions_as_complete_graph():
+    n_runs = 1000
+    edge_a, edge_b = np.array(list(itertools.combinations(range(N_PEOPLE), 2))).T
+    graph_world = ArrayWorld('graph', _population(), edge_a, edge_b, np.full(len(edge_a), N_AVG_MEET / (N_PEOPLE - 1)),
+                             random_stream=RandomStream(2))
+    mix_world = CompleteMixWorld('mix', _population(), N_AVG_MEET, random_stream=RandomStream(3))
+    infected_graph, transmitted_graph = _infections(graph_world, n_runs)
+    infected_mix, transmitted_mix = _infections(mix_world, n_runs)
+
+    assert infected_mix.sum() / n_runs > 10
+    assert infected_mix.sum() == pytest.approx(infected_graph.sum(), rel=0.05)
+    assert np.abs(infected_mix - infected_graph).max() / n_runs < 0.06
+    for cautious in [True, False]:
+        level = (np.arange(N_PEOPLE) % 3 == 0) == cautious
+        assert transmitted_mix[level].sum() == pytest.approx(transmitted_graph[level].sum(), rel=0.05)
@@ -0,0 +1,62 @@
+'''Tests of the per-day state counts against the counts of the per-person snapshots of the same simulation
+
+'''
+import contextlib
+import io
+
+import networkx as nx
+import pandas as pd
+import pytest
+
+from graph_growth_classes import STATE_LABELS
+from simulation_templates import DISEASES, WORLDS, EngineOptions, OutputOptions, simulation
+
+@pytest.fixture
+def test_world(monkeypatch):
+    monkeypatch.setitem(DISEASES, 'Test Virus', dict(DISEASES['Virus Y Baseline'], transmission_base_prob=0.1))
+    monkeypatch.setitem(WORLDS, 'Test Small World',
+                        {'quarantine_policy' : 'revealed',
+                         'social_graph' : {'n_people' : 300,
+                                           'n_infect_init' : 5,
+                                           'n_avg_meet' : 10,
+                                           'caution_level' : 0.5,
+                                           'cautious_size' : 60,
+                                           'social_graph_creator' : nx.watts_strogatz_graph,
+                                           'social_graph_creator_kwargs' : {'n' : 300, 'k' : 20, 'p' : 0.1,
+                                                                            'seed' : 3}}})
+
+def _run(tmp_path, engine, report_mode, report_caution_strata=False):
+    out = str(tmp_path / '{}_{}_{}'.format(engine, report_mode, report_caution_strata))
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulation('Test Virus', 'Test Small World', 30, 1, out, seed=2, engine_options=EngineOptions(engine=engine),
+                   output_options=OutputOptions(report_mode=report_mode, report_caution_strata=report_caution_strata,
+                                                trajectory_format=None))
+    return out
+
+def _snapshot_counts(out, by):
+    '''Number of persons in each state by the given columns, from the snapshots of the data file'''
+    df = pd.read_csv(out + '_data.csv').pivot_table(index=['name', 'time_coordinate'], columns='property',
+                                                    values='0', aggfunc='first')
+    df = df.rename_axis(columns=None).reset_index()
+    for label in STATE_LABELS:
+        df[label] = df[label] == 'True'
+    df['caution_interaction'] = df['caution_interaction'].astype(float)
+    df_counts = df.groupby(by)[STATE_LABELS].sum()
+    df_counts.insert(0, 'n_people', df.groupby(by).size())
+    return df_counts.reset_index()
+
+@pytest.mark.parametrize('engine', ['object', 'array'])
+def test_counts_as_snapshots(tmp_path, test_world, engine):
+    df_snapshot = _snapshot_counts(_run(tmp_path, engine, 'snapshot'), ['time_coordinate'])
+    df_counts = pd.read_csv(_run(tmp_path, engine, 'counts') + '_counts.csv')
+
+    assert len(df_counts) > 10 and df_counts['infected'].max() > 20
+    pd.testing.assert_frame_equal(df_counts, df_snapshot, check_dtype=False)
+
+@pytest.mark.parametrize('engine', ['object', 'array'])
+def test_caution_strata_counts_as_snapshots(tmp_path, test_world, engine):
+    df_snapshot = _snapshot_counts(_run(tmp_path, engine, 'snapshot'), ['time_coordinate', 'caution_interaction'])
+    df_counts = pd.read_csv(_run(tmp_path, engine, 'counts', True) + '_counts.csv')
+
+    assert df_counts['caution_interaction'].nunique() == 2
+    pd.testing.assert_frame_equal(df_counts, df_snapshot, check_dtype=False)
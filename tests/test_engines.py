@@ -0,0 +1,151 @@
+'''Tests of the object engine against the array engine and its transmission modes, and of the adjacency index of
+the array engine
+
+'''
+import contextlib
+import io
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+from array_engine import (ArrayDisease, ArrayWorld, Population, csr_rows, edges_to_csr, graph_edge_arrays,
+                          make_array_world)
+from graph_growth_classes import Person, RandomStream
+from simulation_templates import DISEASES, WORLDS, EngineOptions, OutputOptions, simulation
+
+DISEASE = dict(DISEASES['Virus Y Baseline'], transmission_base_prob=0.03)
+SMALL_WORLD = {'quarantine_policy' : None,
+               'social_graph' : {'n_people' : 400,
+                                 'n_infect_init' : 4,
+                                 'n_avg_meet' : 8,
+                                 'social_graph_creator' : nx.watts_strogatz_graph,
+                                 'social_graph_creator_kwargs' : {'n' : 400, 'k' : 20, 'p' : 0.1, 'seed' : 3}}}
+MIX_WORLD = {'quarantine_policy' : None,
+             'social_graph' : {'n_people' : 300,
+                               'n_infect_init' : 3,
+                               'n_avg_meet' : 8,
+                               'social_graph_creator' : nx.complete_graph,
+                               'social_graph_creator_kwargs' : {'n' : 300}}}
+
+def _attack_sizes(tmp_path, world_name, engine, seeds, disease_kwargs={}):
+    '''Final number of persons ever infected in simulations of the given seeds'''
+
+    sizes = []
+    for seed in seeds:
+        out = str(tmp_path / '{}_{}'.format(engine, seed))
+        with contextlib.redirect_stdout(io.StringIO()):
+            simulation('Test Virus', world_name, 200, 1, out, seed=seed,
+                       engine_options=EngineOptions(engine=engine, disease_kwargs=disease_kwargs),
+                       output_options=OutputOptions(report_mode='counts', trajectory_format=None))
+        df = pd.read_csv(out + '_counts.csv')
+        last = df.iloc[-1]
+        sizes.append(last['immune'] + last['dead'] + last['infected'])
+
+    return np.array(sizes, dtype=np.float64)
+
+@pytest.fixture
+def test_worlds(monkeypatch):
+    monkeypatch.setitem(DISEASES, 'Test Virus', DISEASE)
+    monkeypatch.setitem(WORLDS, 'Test Small World', SMALL_WORLD)
+    monkeypatch.setitem(WORLDS, 'Test Complete Mix', MIX_WORLD)
+
+def test_array_engine_reproducible(tmp_path, test_worlds):
+    assert (_attack_sizes(tmp_path, 'Test Small World', 'array', [5, 6]) ==
+            _attack_sizes(tmp_path, 'Test Small World', 'array', [5, 6])).all()
+
+@pytest.mark.parametrize('world_name', ['Test Small World', 'Test Complete Mix'])
+def test_array_engine_attack_size_as_object_engine(tmp_path, test_worlds, world_name):
+    '''The two engines draw different random numbers, so only the distributions of the outcomes agree'''
+    seeds = list(range(8))
+    size_object = _attack_sizes(tmp_path, world_name, 'object', seeds)
+    size_array = _attack_sizes(tmp_path, world_name, 'array', seeds)
+
+    assert size_object.mean() > 100
+    assert size_array.mean() == pytest.approx(size_object.mean(), rel=0.1)
+
+def test_frontier_attack_size_as_all_edges(tmp_path, test_worlds):
+    seeds = list(range(8))
+    size_edges = _attack_sizes(tmp_path, 'Test Small World', 'array', seeds, {'transmission_mode' : 'all edges'})
+    size_frontier = _attack_sizes(tmp_path, 'Test Small World', 'array', seeds, {'transmission_mode' : 'frontier'})
+
+    assert size_frontier.mean() == pytest.approx(size_edges.mean(), rel=0.1)
+
+def test_csr_rows_as_graph_neighbours():
+    graph = nx.relabel_nodes(nx.gnm_random_graph(50, 200, seed=1), dict([(k, Person(str(k))) for k in range(50)]))
+    for k, (p_a, p_b) in enumerate(graph.edges):
+        graph[p_a][p_b]['weight'] = k
+    persons, edge_a, edge_b, edge_weight = graph_edge_arrays(graph)
+    indptr, indices, weights = edges_to_csr(len(persons), edge_a, edge_b, edge_weight)
+
+    rows = np.array([3, 0, 49, 17])
+    positions, row_of = csr_rows(indptr, rows)
+    for row in rows:
+        neighbours = dict([(persons.index(person), data['weight'])
+                           for person, data in graph[persons[row]].items()])
+        in_row = positions[row_of == row]
+        assert dict(zip(indices[in_row].tolist(), weights[in_row].tolist())) == neighbours
+
+def test_array_world_meets_along_edges_only():
+    persons = [Person(str(k)) for k in range(30)]
+    graph = nx.relabel_nodes(nx.gnm_random_graph(30, 80, seed=5), dict(enumerate(persons)))
+    for k, (p_a, p_b) in enumerate(graph.edges):
+        graph[p_a][p_b]['weight'] = float(k % 2)
+    world = make_array_world('test', graph, random_stream=RandomStream(1))
+    views = world.persons
+
+    for k_a, p_a in enumerate(persons):
+        for k_b, p_b in enumerate(persons):
+            weight = graph[p_a][p_b]['weight'] if graph.has_edge(p_a, p_b) else 0.0
+            assert world.do_they_meet_today(views[k_a], views[k_b]) == (weight == 1.0)
+    assert world._state_index is None
+
+def _one_day_receivers(transmission_mode, base_prob, edge_weight, caution_level, n_runs):
+    '''Number of times each person is infected by the transmission pass of one day, from the same state of a world
+    with contagious, infected, immune, quarantined and dead persons'''
+
+    n_people = 200
+    edge_a, edge_b = np.array(list(nx.gnm_random_graph(n_people, 1500, seed=7).edges)).T
+    state = Population(['Person {}'.format(k) for k in range(n_people)],
+                       caution_interaction=np.where(np.arange(n_people) % 5 == 0, caution_level, 0.0))
+    state.transition('infect', np.arange(0, 40, 2))
+    state.transition('activate', np.arange(0, 30, 2))
+    state.transition('immunize', np.arange(41, 60, 2))
+    state.transition('quarantine', np.array([0, 2, 61]))
+    state.transition('succumb', np.array([4, 63]))
+
+    disease = ArrayDisease('test', random_stream=RandomStream(11), transmission_mode=transmission_mode,
+                           **dict(DISEASES['Virus Y Baseline'], transmission_base_prob=base_prob))
+    n_infected = np.zeros(n_people)
+    for _ in range(n_runs):
+        population = state.reordered(np.arange(n_people))
+        world = ArrayWorld('test', population, edge_a, edge_b, np.full(len(edge_a), edge_weight),
+                           random_stream=disease.random_stream)
+        if transmission_mode == 'all edges':
+            transmitters, receivers = disease._transmission_edges(world)
+        else:
+            transmitters, receivers = disease._transmission_frontier(world)
+        assert population.contagious[transmitters].all()
+        n_infected[receivers] += 1
+
+    return n_infected, state
+
+def test_frontier_receivers_as_all_edges():
+    '''With certain meetings and transmissions the two modes infect the same persons, the susceptible neighbours
+    able to meet of the contagious persons able to meet'''
+    all_edges, state = _one_day_receivers('all edges', 1.0, 1.0, 0.0, 1)
+    frontier, _ = _one_day_receivers('frontier', 1.0, 1.0, 0.0, 1)
+
+    assert all_edges.sum() > 0
+    assert (all_edges == frontier).all()
+    assert not (state.infected | state.immune | state.quarantined | state.dead)[all_edges > 0].any()
+
+def test_frontier_infection_probability_as_all_edges():
+    n_runs = 2000
+    all_edges, _ = _one_day_receivers('all edges', 0.3, 0.5, 0.5, n_runs)
+    frontier, _ = _one_day_receivers('frontier', 0.3, 0.5, 0.5, n_runs)
+
+    assert all_edges.sum() / n_runs > 10
+    assert frontier.sum() == pytest.approx(all_edges.sum(), rel=0.05)
+    assert np.abs(frontier - all_edges).max() / n_runs < 0.06
@@ -0,0 +1,90 @@
+'''Tests of the event driven progression mode of the disease against the daily hazard mode
+
+'''
+from collections import Counter
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from graph_growth_classes import Disease, Person, RandomStream, World
+from simulation_templates import DISEASES
+
+DISEASE = dict(DISEASES['Virus Y Baseline'], transmission_base_prob=0.3, succumb_mean=20.0, succumb_spread=3.0)
+
+def _run(progression_mode, seed, n_people=300, n_infect_init=3, n_days=80, disease_kwargs={}, seeds_contagious=False):
+    '''Simulate a small world, and count the transitions of each person by label'''
+
+    random_stream = RandomStream(seed)
+    persons = [Person('Person {}'.format(k)) for k in range(n_people)]
+    for person in persons:
+        person.general_health = random_stream.generator.normal(0.0, 0.3)
+    for person in persons[:n_infect_init]:
+        person.infect()
+        if seeds_contagious:
+            person.activate()
+
+    graph = nx.relabel_nodes(nx.watts_strogatz_graph(n_people, 6, 0.1, seed=seed), dict(enumerate(persons)))
+    nx.set_edge_attributes(graph, 0.5, 'weight')
+    world = World('test', graph, random_stream=random_stream)
+
+    transitions = Counter()
+    for person in persons:
+        person.add_transition_observer(lambda person, label: transitions.update([(person.name, label)]))
+
+    disease = Disease('test', progression_mode=progression_mode, random_stream=random_stream,
+                      **dict(DISEASE, **disease_kwargs))
+    for _ in range(n_days):
+        disease.progress_one_more_day(world)
+        if world.is_disease_free():
+            break
+
+    return persons, transitions
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('seeds_contagious', [False, True])
+def test_event_driven_transitions_once_per_infection(seed, seeds_contagious):
+    '''Persons infected on the first day, by seeds contagious from the start, are scheduled once'''
+    persons, transitions = _run('event driven', seed, seeds_contagious=seeds_contagious)
+
+    n_infected_by_transmission = sum([transitions[(person.name, 'infect')] for person in persons])
+    assert n_infected_by_transmission > 10
+
+    # The baseline disease immunizes every recovered person, so every person is infected at most once
+    seeds = persons[:3]
+    for person in persons:
+        n_activate = transitions[(person.name, 'activate')]
+        if person in seeds and seeds_contagious:
+            assert n_activate == 0
+        else:
+            assert n_activate <= 1
+        assert transitions[(person.name, 'recover')] + transitions[(person.name, 'succumb')] <= 1
+
+def test_event_driven_progression_distribution_as_daily_hazard():
+    '''Without transmission, every person is infected from the start, and the days of the transitions of the two
+    modes follow the same distribution'''
+
+    days = {}
+    for mode in ['daily hazard', 'event driven']:
+        persons, _ = _run(mode, 7, n_people=3000, n_infect_init=3000, n_days=150,
+                          disease_kwargs={'transmission_base_prob' : 0.0})
+        days[mode] = dict([(label, np.array([person.get_time_stamp(label) for person in persons
+                                             if not person.get_time_stamp(label) is None]))
+                           for label in ['activate', 'reveal', 'recover', 'succumb']])
+
+    for label in ['activate', 'reveal', 'recover', 'succumb']:
+        hazard = days['daily hazard'][label]
+        event = days['event driven'][label]
+        assert len(event) == pytest.approx(len(hazard), rel=0.1, abs=30)
+        assert event.mean() == pytest.approx(hazard.mean(), abs=0.5)
+
+def test_event_driven_epidemic_size_as_daily_hazard():
+    attack = {}
+    for mode in ['daily hazard', 'event driven']:
+        sizes = []
+        for seed in range(8):
+            persons, _ = _run(mode, seed)
+            sizes.append(sum([not person.get_time_stamp('infect') is None for person in persons]))
+        attack[mode] = np.mean(sizes)
+
+    assert attack['event driven'] == pytest.approx(attack['daily hazard'], rel=0.15)
@@ -0,0 +1,72 @@
+'''Tests of the graph cache against the construction of the social graph without a cache
+
+'''
+import contextlib
+import io
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from graph_cache import CachedTopology, GraphCache, graph_cache_key
+from graph_growth_classes import Person
+from simulation_templates import EngineOptions, OutputOptions, make_edge_weights, simulation
+
+KWARGS = {'n' : 200, 'k' : 6, 'p' : 0.1, 'seed' : 1}
+
+def test_social_graph_as_constructed():
+    '''The graph of persons from the topology is the relabelled graph of the generator, in iteration order too'''
+    people = [Person(str(k)) for k in range(200)]
+    graph = nx.relabel_nodes(nx.connected_watts_strogatz_graph(**KWARGS), dict(enumerate(people)))
+    graph = make_edge_weights(graph, 4)
+    cached = GraphCache().topology(nx.connected_watts_strogatz_graph, KWARGS, 4, make_edge_weights)
+    cached_graph = cached.social_graph(people)
+
+    assert list(cached_graph.nodes) == list(graph.nodes)
+    assert list(cached_graph.edges(data='weight')) == list(graph.edges(data='weight'))
+
+def test_hits_and_misses(tmp_path):
+    cache = GraphCache(str(tmp_path), max_entries=2)
+    topology = cache.topology(nx.watts_strogatz_graph, KWARGS, 4, make_edge_weights)
+    assert cache.topology(nx.watts_strogatz_graph, dict(KWARGS), 4, make_edge_weights) is topology
+    cache.topology(nx.watts_strogatz_graph, KWARGS, 5, make_edge_weights)
+    cache.topology(nx.watts_strogatz_graph, dict(KWARGS, seed=2), 4, make_edge_weights)
+    assert (cache.n_hits, cache.n_misses, len(cache)) == (1, 3, 2)
+
+    # Evicted from memory, loaded from disk
+    loaded = cache.topology(nx.watts_strogatz_graph, KWARGS, 4, make_edge_weights)
+    assert loaded is not topology and (cache.n_hits, cache.n_misses) == (2, 3)
+    for key in CachedTopology.ARRAYS:
+        assert (getattr(loaded, key) == getattr(topology, key)).all()
+
+def test_unseeded_generator_not_cached(tmp_path):
+    cache = GraphCache(str(tmp_path))
+    cache.topology(nx.watts_strogatz_graph, dict(KWARGS, seed=None), 4, make_edge_weights)
+    cache.topology(nx.watts_strogatz_graph, dict(KWARGS, seed=None), 4, make_edge_weights)
+
+    assert (cache.n_hits, cache.n_misses, len(cache)) == (0, 2, 0)
+    assert len(list(tmp_path.iterdir())) == 0
+
+def test_keys_of_arguments():
+    keys = set([graph_cache_key(nx.watts_strogatz_graph, KWARGS, 4),
+                graph_cache_key(nx.watts_strogatz_graph, dict(KWARGS, p=0.2), 4),
+                graph_cache_key(nx.watts_strogatz_graph, KWARGS, 5),
+                graph_cache_key(nx.connected_watts_strogatz_graph, KWARGS, 4)])
+    assert len(keys) == 4
+    assert graph_cache_key(nx.watts_strogatz_graph, dict(reversed(list(KWARGS.items()))), 4) == \
+           graph_cache_key(nx.watts_strogatz_graph, KWARGS, 4)
+
+@pytest.mark.parametrize('engine', ['object', 'array'])
+def test_simulation_with_cache_as_without(tmp_path, engine):
+    cache = GraphCache()
+    outputs = []
+    for run, graph_cache in enumerate([None, cache, cache]):
+        out = str(tmp_path / 'run{}'.format(run))
+        with contextlib.redirect_stdout(io.StringIO()):
+            simulation('Virus Y High Base Transmitter', 'Small World Beta 1p', 20, 1, out, seed=6,
+                       engine_options=EngineOptions(engine=engine), output_options=OutputOptions(report_mode='counts'),
+                       graph_cache=graph_cache)
+        outputs.append([open(out + suffix).read() for suffix in ['_counts.csv', '_traj.csv', '_social_graph.gml']])
+
+    assert cache.n_hits == 1
+    assert outputs[0] == outputs[1] == outputs[2]
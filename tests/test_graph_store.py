@@ -0,0 +1,44 @@
+'''Tests of the graph store and of the sharing of topologies between simulations
+
+'''
+import contextlib
+import io
+import os
+
+import numpy as np
+
+from graph_store import GraphStore, read_run_graph
+from simulation_templates import EngineOptions, OutputOptions, simulation
+
+def test_replicas_share_topology(tmp_path):
+    '''Replicas of a cautious world draw different cautious persons, and share the topology of the world only'''
+    graphs = []
+    for seed in [1, 2]:
+        out = str(tmp_path / 'run{}'.format(seed))
+        with contextlib.redirect_stdout(io.StringIO()):
+            simulation('Virus Y Baseline', 'Small World Beta 1p Cautious 50_200', 2, 1, out, seed=seed,
+                       engine_options=EngineOptions(engine='array'), output_options=OutputOptions(graph_output='store'))
+        graphs.append(read_run_graph(out + '_sim_data.csv'))
+
+    topology_hashes = [graph.graph_hash.split('/')[0] for graph in graphs]
+    assert topology_hashes[0] == topology_hashes[1]
+    assert graphs[0].graph_hash != graphs[1].graph_hash
+    assert os.listdir(str(tmp_path / 'graph_store')) == [topology_hashes[0]]
+    assert (graphs[0].indptr == graphs[1].indptr).all() and (graphs[0].indices == graphs[1].indices).all()
+    assert not (graphs[0].caution_interaction == graphs[1].caution_interaction).all()
+
+def test_put_arrays_round_trip(tmp_path):
+    arrays = {'indptr' : np.array([0, 1, 2]),
+              'indices' : np.array([1, 0]),
+              'weights' : np.array([0.5, 0.5]),
+              'names' : np.array(['a', 'b']),
+              'caution_interaction' : np.array([0.0, 0.3]),
+              'general_health' : np.array([0.1, -0.1])}
+    store = GraphStore(str(tmp_path))
+    graph_hash = store.put_arrays(arrays)
+
+    assert store.put_arrays(arrays) == graph_hash
+    graph = store.get(graph_hash, mmap_mode=None)
+    for key, array in arrays.items():
+        assert (getattr(graph, key) == array).all()
+    assert list(graph.to_networkx().edges(data='weight')) == [(0, 1, 0.5)]
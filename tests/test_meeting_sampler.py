@@ -0,0 +1,74 @@
+'''Tests of the geometric skip meeting sampler of the world against Bernoulli trials per edge
+
+'''
+import networkx as nx
+import numpy as np
+import pytest
+
+from graph_growth_classes import Person, RandomStream, World
+
+def _graph(n_people, n_edges, weights, seed):
+    persons = [Person(str(k)) for k in range(n_people)]
+    graph = nx.relabel_nodes(nx.gnm_random_graph(n_people, n_edges, seed=seed), dict(enumerate(persons)))
+    for k, (p_a, p_b) in enumerate(graph.edges):
+        graph[p_a][p_b]['weight'] = weights[k % len(weights)]
+    return graph
+
+def test_geometric_skip_positions_as_bernoulli_trials():
+    world = World('test', nx.Graph(), random_stream=RandomStream(0), meeting_sampler='geometric skip')
+    n_items = 5000
+    hits = np.zeros(n_items)
+    n_runs = 200
+    for _ in range(n_runs):
+        positions = world._geometric_skip_positions(0.02, n_items)
+        assert (np.diff(positions) > 0).all() and positions[0] >= 0 and positions[-1] < n_items
+        hits[positions] += 1
+
+    assert hits.sum() / n_runs == pytest.approx(n_items * 0.02, rel=0.05)
+    assert hits[:n_items // 2].sum() == pytest.approx(hits[n_items // 2:].sum(), rel=0.1)
+
+def test_geometric_skip_meetings_as_per_edge():
+    '''Each edge is met with the probability of its weight, by either sampler'''
+    graph = _graph(100, 1000, [0.1, 0.4], 2)
+    expected = np.array([weight for _, _, weight in graph.edges(data='weight')])
+
+    for sampler in ['per edge', 'geometric skip']:
+        world = World('test', graph, random_stream=RandomStream(4), meeting_sampler=sampler)
+        edge_index = dict([(frozenset(edge), k) for k, edge in enumerate(graph.edges)])
+        n_met = np.zeros(len(expected))
+        n_days = 300
+        for _ in range(n_days):
+            for p_a, p_b in world.meetings_today():
+                n_met[edge_index[frozenset((p_a, p_b))]] += 1
+
+        for weight in [0.1, 0.4]:
+            assert n_met[expected == weight].mean() / n_days == pytest.approx(weight, rel=0.05)
+
+def test_meetings_exclude_quarantined_and_dead():
+    graph = _graph(50, 300, [1.0], 3)
+    persons = list(graph.nodes)
+    persons[0].quarantine()
+    persons[1].succumb()
+    world = World('test', graph, random_stream=RandomStream(5), meeting_sampler='geometric skip')
+
+    meetings = world.meetings_today()
+    assert len(meetings) == len([edge for edge in graph.edges if persons[0] not in edge and persons[1] not in edge])
+
+def test_many_weights_fall_back_to_per_edge():
+    graph = _graph(50, 300, list(np.linspace(0.1, 0.9, 40)), 4)
+    world = World('test', graph, random_stream=RandomStream(6), meeting_sampler='geometric skip',
+                  max_weight_groups=16)
+    world_per_edge = World('test', graph, random_stream=RandomStream(6))
+
+    assert world._edge_weight_groups()[1] is None
+    assert list(world.meetings_today()) == list(world_per_edge.meetings_today())
+
+def test_removed_persons_not_met():
+    graph = _graph(50, 300, [1.0], 7)
+    world = World('test', graph, random_stream=RandomStream(8), meeting_sampler='geometric skip')
+    world.meetings_today()
+    removed = list(graph.nodes)[:5]
+    world.remove_persons(removed)
+
+    met = set([person for edge in world.meetings_today() for person in edge])
+    assert len(met) > 0 and met.isdisjoint(removed)
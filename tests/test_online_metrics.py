@@ -0,0 +1,118 @@
+'''Tests of the online metrics against the trajectory and the counts files of the same simulation
+
+'''
+import contextlib
+import io
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+from array_engine import ArrayWorld
+from online_metrics import OnlineMetric, Offspring, metrics_file_name, read_metrics
+from simulation_templates import DISEASES, WORLDS, EngineOptions, OutputOptions, simulation
+from trajectory_analytics import EncodedTrajectory
+
+METRICS = {'incidence' : {},
+           'prevalence' : {},
+           'offspring' : {'nth_infected' : 40},
+           'generation_interval' : {'nth_infected' : 40}}
+
+@pytest.fixture
+def test_worlds(monkeypatch):
+    monkeypatch.setitem(DISEASES, 'Test Virus', dict(DISEASES['Virus Y Baseline'], transmission_base_prob=0.06))
+    monkeypatch.setitem(WORLDS, 'Test Small World',
+                        {'quarantine_policy' : 'revealed',
+                         'social_graph' : {'n_people' : 400,
+                                           'n_infect_init' : 4,
+                                           'n_avg_meet' : 8,
+                                           'social_graph_creator' : nx.watts_strogatz_graph,
+                                           'social_graph_creator_kwargs' : {'n' : 400, 'k' : 20, 'p' : 0.1,
+                                                                            'seed' : 3}}})
+    monkeypatch.setitem(WORLDS, 'Test Complete Mix',
+                        {'quarantine_policy' : None,
+                         'social_graph' : {'n_people' : 300,
+                                           'n_infect_init' : 3,
+                                           'n_avg_meet' : 8,
+                                           'social_graph_creator' : nx.complete_graph,
+                                           'social_graph_creator_kwargs' : {'n' : 300}}})
+
+def _padded(histogram, n):
+    return np.pad(np.asarray(histogram, dtype=np.int64), (0, n - len(histogram)))
+
+@pytest.mark.parametrize('world_name, engine, disease_kwargs',
+                         [('Test Small World', 'object', {}),
+                          ('Test Small World', 'array', {'transmission_mode' : 'all edges'}),
+                          ('Test Small World', 'array', {'transmission_mode' : 'frontier'}),
+                          ('Test Complete Mix', 'array', {})])
+def test_metrics_as_trajectory_and_counts(tmp_path, test_worlds, world_name, engine, disease_kwargs):
+    out = str(tmp_path / 'run')
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulation('Test Virus', world_name, 200, 1, out, seed=5,
+                   engine_options=EngineOptions(engine=engine, disease_kwargs=disease_kwargs),
+                   output_options=OutputOptions(report_mode='counts', online_metrics=METRICS))
+    metrics = read_metrics(metrics_file_name(out))
+    df_traj = pd.read_csv(out + '_traj.csv')
+    df_counts = pd.read_csv(out + '_counts.csv')
+    trajectory = EncodedTrajectory.from_file(out + '_traj.csv')
+    assert len(df_traj) > 50
+
+    # Daily new infections by transmission, after the infections of the initial persons
+    incidence = pd.Series(metrics['incidence']['infect'], index=metrics['incidence']['day'])
+    by_day = df_traj.groupby('day counter').size()
+    assert incidence.loc[incidence.index > 0].sum() == len(df_traj)
+    assert (incidence.loc[by_day.index] == by_day).all()
+
+    prevalence = pd.DataFrame(metrics['prevalence']).set_index('day')
+    df_counts = df_counts.set_index('time_coordinate')
+    for label in ['infected', 'contagious', 'revealed', 'immune', 'dead', 'quarantined']:
+        assert (prevalence.loc[df_counts.index, label] == df_counts[label]).all()
+    assert metrics['prevalence']['peak_infected'] == df_counts['infected'].max()
+
+    offspring = metrics['offspring']['offspring_histogram']
+    expected = trajectory.offspring_histogram(40)
+    n = max(len(offspring), len(expected))
+    assert (_padded(offspring, n) == _padded(expected, n)).all()
+
+    intervals = metrics['generation_interval']['generation_interval_histogram']
+    expected = trajectory.generation_interval_histogram(40)
+    n = max(len(intervals), len(expected))
+    assert (_padded(intervals, n) == _padded(expected, n)).all()
+
+    # Mean offspring of each cohort of infection day, over the persons infected by transmission
+    n_transmits = df_traj.groupby('transmitter').size()
+    day_of = df_traj.set_index('receiver')['day counter']
+    cohort_mean = n_transmits.reindex(day_of.index, fill_value=0).groupby(day_of.values).mean()
+    r_t = pd.Series(metrics['offspring']['R_t'], index=metrics['offspring']['cohort_day'])
+    assert r_t.loc[cohort_mean.index].to_numpy() == pytest.approx(cohort_mean.to_numpy())
+
+def test_counts_only_for_metrics_of_counts(tmp_path, test_worlds, monkeypatch):
+    def no_counts(self, caution_strata=False):
+        raise AssertionError('State counts computed without a metric of them')
+    monkeypatch.setattr(ArrayWorld, 'report_counts', no_counts)
+
+    out = str(tmp_path / 'run')
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulation('Test Virus', 'Test Small World', 200, 1, out, seed=5, engine_options=EngineOptions(engine='array'),
+                   output_options=OutputOptions(report_mode='none', trajectory_format=None,
+                                                online_metrics={'incidence' : {}, 'offspring' : {}}))
+
+    assert sum(read_metrics(metrics_file_name(out))['incidence']['infect']) > 50
+
+def test_offspring_by_first_infection():
+    '''Person 0 infects person 1 on day 1 and is infected again on day 5'''
+    metric = Offspring()
+    metric.start(3, 0)
+    metric.transitions('infect', np.array([0]), 0)
+    metric.transitions('infect', np.array([1]), 1)
+    metric.transmissions(np.array([0]), np.array([1]), np.array([1]), 1)
+    metric.transitions('infect', np.array([0]), 5)
+
+    summary = metric.summary()
+    assert summary['cohort_day'] == [0, 1]
+    assert summary['cohort_size'] == [1, 1]
+    assert summary['R_t'] == [1.0, 0.0]
+
+def test_empty_summary_of_base_metric():
+    assert OnlineMetric().summary() == {}
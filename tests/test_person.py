@@ -0,0 +1,71 @@
+'''Tests of the state transitions, time stamps and report of the compact person
+
+'''
+import pickle
+
+import pandas as pd
+import pytest
+
+from graph_growth_classes import STATE_LABELS, TRANSITION_LABELS, Person
+
+def test_transitions_and_time_stamps():
+    person = Person('a', caution_interaction=0.5)
+    assert person.time_stamp == dict([(label, None) for label in TRANSITION_LABELS])
+    assert person.days_infected() is None
+
+    person.time_coordinate = 3
+    person.infect()
+    person.time_coordinate = 5
+    person.activate()
+    person.reveal()
+    person.quarantine()
+    assert person.is_infected() and person.is_contagious() and person.is_revealed() and person.is_quarantined()
+
+    person.time_coordinate = 9
+    person.recover()
+    person.immunize()
+    assert not (person.is_infected() or person.is_contagious() or person.is_revealed() or person.is_quarantined())
+    assert person.is_immune() and not person.is_dead()
+    assert person.days_infected() == 6 and person.days_revealed() == 4 and person.days_recovered() == 0
+    assert person.get_time_stamp('quarantine') == 5 and person.get_time_stamp('succumb') is None
+
+def test_no_attributes_per_instance():
+    person = Person('a')
+    assert not hasattr(person, '__dict__') and not hasattr(person.state, '__dict__')
+    with pytest.raises(AttributeError):
+        person.age = 40
+
+def test_persons_do_not_share_time_stamps():
+    person_a, person_b = Person('a'), Person('b')
+    person_a.infect()
+    assert person_b.get_time_stamp('infect') is None
+
+def test_transition_observers():
+    transitions = []
+    person = Person('a')
+    person.add_transition_observer(lambda observed, label: transitions.append((observed.name, label)))
+    person.infect()
+    person.succumb()
+
+    assert transitions == [('a', 'infect'), ('a', 'succumb')]
+    assert person.is_dead() and not person.is_infected()
+
+def test_report():
+    person = Person('a', general_health=-0.2)
+    person.time_coordinate = 2
+    person.infect()
+    report = person.report()
+
+    assert report.index.tolist() == ['name', 'time_coordinate', 'caution_interaction', 'general_health'] + \
+                                    STATE_LABELS + ['time_' + label for label in TRANSITION_LABELS]
+    assert report['infected'] and not report['contagious']
+    assert report['time_infect'] == 2 and pd.isna(report['time_activate'])
+
+def test_pickled_person():
+    person = Person('a', caution_interaction=0.25)
+    person.time_coordinate = 4
+    person.infect()
+    person_copy = pickle.loads(pickle.dumps(person))
+
+    assert person_copy.name == 'a' and person_copy.caution_interaction == 0.25
+    assert person_copy.is_infected() and person_copy.days_infected() == 0
@@ -0,0 +1,51 @@
+'''Tests of the reproducibility of the random stream and of simulations seeded by it
+
+'''
+import contextlib
+import io
+
+import numpy as np
+
+from graph_growth_classes import RandomStream
+from simulation_templates import OutputOptions, simulation
+
+def test_scalars_as_generator_sequence():
+    '''Scalars handed out from blocks follow the sequence of the generator across block boundaries'''
+    stream = RandomStream(7, block_size=16)
+    values = [stream.ranf() for _ in range(50)]
+
+    assert values == np.random.Generator(np.random.PCG64(np.random.SeedSequence(7))).random(64)[:50].tolist()
+
+def test_same_seed_same_stream():
+    streams = [RandomStream(11, block_size=8), RandomStream(11, block_size=8)]
+    draws = [[stream.ranf() for _ in range(5)] + stream.ranf(20).tolist() + [stream.ranf() for _ in range(20)]
+             for stream in streams]
+
+    assert draws[0] == draws[1]
+    assert draws[0] != [RandomStream(12, block_size=8).ranf() for _ in range(45)]
+
+def test_stream_from_metadata():
+    stream = RandomStream(np.random.SeedSequence(5).spawn(3)[2])
+    metadata = stream.metadata()
+    stream_copy = RandomStream(np.random.SeedSequence(metadata['entropy'], spawn_key=metadata['spawn_key']))
+
+    assert stream.ranf(10).tolist() == stream_copy.ranf(10).tolist()
+
+def test_spawned_streams():
+    children = RandomStream(3).spawn(2)
+    children_copy = RandomStream(3).spawn(2)
+
+    assert children[0].ranf(10).tolist() == children_copy[0].ranf(10).tolist()
+    assert children[0].ranf(10).tolist() != children[1].ranf(10).tolist()
+
+def test_seeded_simulation_reproducible(tmp_path):
+    outputs = []
+    for run, seed in enumerate([4, 4, 5]):
+        out = str(tmp_path / 'run{}'.format(run))
+        with contextlib.redirect_stdout(io.StringIO()):
+            simulation('Virus Y High Base Transmitter', 'Small World Beta 1p', 30, 1, out, seed=seed,
+                       output_options=OutputOptions(report_mode='counts'))
+        outputs.append(open(out + '_counts.csv').read() + open(out + '_traj.csv').read())
+
+    assert outputs[0] == outputs[1]
+    assert outputs[0] != outputs[2]
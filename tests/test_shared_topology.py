@@ -0,0 +1,60 @@
+'''Tests of the topologies shared between processes through shared memory
+
+'''
+import os
+import subprocess
+import sys
+from multiprocessing import shared_memory
+
+import networkx as nx
+import numpy as np
+
+from graph_cache import GraphCache
+from shared_topology import SharedGraphCache, SharedTopologyPublisher
+from simulation_templates import make_edge_weights
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ATTACH_SCRIPT = '''
+import sys
+sys.path.insert(0, {repo_dir!r})
+from shared_topology import _attach_block
+block = _attach_block({block_name!r}, {owner_pid})
+assert block.buf[0] == 7
+block.close()
+'''
+
+def test_shared_topology_as_cached():
+    kwargs = {'n' : 200, 'k' : 6, 'p' : 0.1, 'seed' : 1}
+    publisher = SharedTopologyPublisher()
+    try:
+        publisher.publish_world({'social_graph_creator' : nx.watts_strogatz_graph,
+                                 'social_graph_creator_kwargs' : kwargs, 'n_avg_meet' : 2}, make_edge_weights)
+        # The cache holds the attached blocks, so it must outlive the arrays of its topologies
+        shared_cache = SharedGraphCache(publisher.handles)
+        shared = shared_cache.topology(nx.watts_strogatz_graph, kwargs, 2, make_edge_weights)
+        cached = GraphCache().topology(nx.watts_strogatz_graph, kwargs, 2, make_edge_weights)
+
+        assert (shared.iter_a == cached.iter_a).all() and (shared.iter_weight == cached.iter_weight).all()
+        for shared_array, cached_array in zip(shared.adjacency(), cached.adjacency()):
+            assert (shared_array == cached_array).all()
+        assert not shared.iter_a.flags.writeable
+    finally:
+        publisher.close()
+
+def test_block_outlives_other_attaching_process():
+    '''A process not started by the publishing process leaves the block to be unlinked by the publisher'''
+    block = shared_memory.SharedMemory(create=True, size=16)
+    try:
+        block.buf[0] = 7
+        script = ATTACH_SCRIPT.format(repo_dir=REPO_DIR, block_name=block.name, owner_pid=os.getpid())
+        completed = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True)
+        assert completed.returncode == 0, completed.stderr
+        assert not 'leaked' in completed.stderr
+
+        attached = shared_memory.SharedMemory(name=block.name)
+        assert attached.buf[0] == 7
+        attached.close()
+    finally:
+        block.close()
+        block.unlink()
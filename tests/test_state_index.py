@@ -0,0 +1,67 @@
+'''Tests of the state index of the world against a full scan of its persons, and of the time stamps of the
+quarantine policies, which quarantine the revealed persons not yet quarantined
+
+'''
+import networkx as nx
+import numpy as np
+import pytest
+
+from array_engine import ArrayDisease, make_array_world
+from graph_growth_classes import STATE_LABELS, Disease, RandomStream, World
+from simulation_templates import DISEASES, create_population
+
+DISEASE = dict(DISEASES['Virus Y Baseline'], transmission_base_prob=0.1)
+
+def _world(quarantine_policy, quarantine_policy_kwargs={}, seed=0):
+    random_stream = RandomStream(seed)
+    social_graph = create_population(300, 5, 10, caution_level=0.5, cautious_size=50,
+                                     social_graph_creator=nx.watts_strogatz_graph,
+                                     social_graph_creator_kwargs={'n' : 300, 'k' : 20, 'p' : 0.1, 'seed' : 1},
+                                     random_stream=random_stream)
+    world = World('test', social_graph, quarantine_policy=quarantine_policy,
+                  quarantine_policy_kwargs=quarantine_policy_kwargs, random_stream=random_stream)
+    disease = Disease('test', random_stream=random_stream, **DISEASE)
+
+    return world, disease
+
+@pytest.mark.parametrize('quarantine_policy, quarantine_policy_kwargs',
+                         [('revealed', {}), ('revealed with chance', {'chance' : 0.5})])
+def test_state_index_as_full_scan(quarantine_policy, quarantine_policy_kwargs):
+    world, disease = _world(quarantine_policy, quarantine_policy_kwargs)
+    persons = list(world.social_graph.nodes)
+
+    for _ in range(80):
+        disease.progress_one_more_day(world)
+        for label in STATE_LABELS:
+            assert set(getattr(world._state_index, label)) == \
+                   set([person for person in persons if getattr(person.state, label)])
+        assert set(world._state_index.revealed_not_quarantined) == \
+               set([person for person in persons if person.is_revealed() and not person.is_quarantined()])
+        assert set(world.infected_persons()) == set([person for person in persons if person.is_infected()])
+        assert world.is_disease_free() == (not any([person.is_infected() for person in persons]))
+
+    assert len(world.dead_persons()) + len(world._state_index.immune) > 50
+
+@pytest.mark.parametrize('engine', ['object', 'array'])
+def test_quarantine_stamped_on_entry(engine):
+    '''A person is stamped once, when they enter quarantine, rather than every day they are revealed'''
+    world, disease = _world('revealed')
+    if engine == 'array':
+        world = make_array_world('test', world.social_graph, quarantine_policy='revealed',
+                                 random_stream=disease.random_stream)
+        disease = ArrayDisease('test', random_stream=disease.random_stream, **DISEASE)
+
+    entered = {}
+    n_days_in_quarantine = 0
+    for day in range(1, 60):
+        disease.progress_one_more_day(world)
+        for person in world.persons if engine == 'array' else world.social_graph.nodes:
+            if person.is_quarantined():
+                entered.setdefault(person.name, day)
+                assert person.get_time_stamp('quarantine') == entered[person.name]
+                assert person.days_quarantined() == day - entered[person.name]
+                n_days_in_quarantine += person.days_quarantined()
+            elif person.name in entered:
+                del entered[person.name]
+
+    assert n_days_in_quarantine > 100
@@ -0,0 +1,119 @@
+'''Tests of the trajectory analytics on hand-built trajectories
+
+'''
+import numpy as np
+import pytest
+
+from trajectory_analytics import EncodedTrajectory, TransmissionTree, tree_file_name
+
+def _trajectory(events, names):
+    '''Encoded trajectory of events of transmitter, receiver, days since transmitter infected and day, by name'''
+    ids = dict([(name, k) for k, name in enumerate(names)])
+    return EncodedTrajectory([ids[event[0]] for event in events], [ids[event[1]] for event in events],
+                             [event[2] for event in events], [event[3] for event in events], np.array(names))
+
+# Two trees, of seeds A and F, infected on day 0
+#   A -> B (day 3), A -> C (day 4), B -> D (day 6), D -> E (day 9), F -> G (day 5)
+NAMES = ['A', 'B', 'C', 'D', 'E', 'F', 'G']
+FOREST = [('A', 'B', 3, 3), ('A', 'C', 4, 4), ('F', 'G', 5, 5), ('B', 'D', 3, 6), ('D', 'E', 3, 9)]
+
+def test_forest_index():
+    tree = TransmissionTree.from_trajectory(_trajectory(FOREST, NAMES))
+    k = dict([(name, i) for i, name in enumerate(NAMES)])
+
+    assert tree.parent.tolist() == [-1, k['A'], k['A'], k['B'], k['D'], -1, k['F']]
+    assert tree.depth.tolist() == [0, 1, 1, 2, 3, 0, 1]
+    assert tree.infection_day.tolist() == [0, 3, 4, 6, 9, 0, 5]
+    assert sorted(tree.names[tree.seeds].tolist()) == ['A', 'F']
+    assert tree.cluster_size(tree.ids(['A', 'F', 'B', 'E'])).tolist() == [5, 2, 3, 1]
+    assert tree.chain_length(tree.ids(['A', 'F'])).tolist() == [3, 1]
+    assert tree.names[tree.root_of(tree.ids(['E', 'G', 'A']))].tolist() == ['A', 'F', 'A']
+    assert tree.offspring.tolist() == [2, 1, 0, 1, 0, 1, 0]
+    assert sorted(tree.names[tree.children_of(k['A'])].tolist()) == ['B', 'C']
+    assert tree.chain_length_histogram().tolist() == [0, 2, 0, 1]
+    assert tree.superspreaders(1)['name'].tolist() == ['A']
+    assert tree.superspreaders(1, by='cluster')['name'].tolist() == ['A']
+
+def test_effective_reproduction_number():
+    tree = TransmissionTree.from_trajectory(_trajectory(FOREST, NAMES))
+    r_t = tree.effective_reproduction_number()
+
+    assert r_t[0] == pytest.approx(1.5)
+    assert r_t[3] == pytest.approx(1.0)
+    assert r_t[9] == pytest.approx(0.0)
+    assert np.isnan(r_t[1])
+
+def test_reinfection():
+    '''Seed A infects B, B infects A after A recovered, and C is infected twice. Only the first infection of a
+    person, and none of a seed, is part of the forest'''
+    names = ['A', 'B', 'C']
+    events = [('A', 'B', 2, 2), ('B', 'C', 3, 5), ('B', 'A', 20, 22), ('A', 'C', 1, 23)]
+    tree = TransmissionTree.from_trajectory(_trajectory(events, names))
+
+    assert tree.parent.tolist() == [-1, 0, 1]
+    assert tree.infection_day.tolist() == [0, 2, 5]
+    assert tree.seeds.tolist() == [0]
+    assert tree.cluster_size().tolist() == [3]
+    assert tree.chain_length().tolist() == [2]
+    assert tree.root_of([0, 1, 2]).tolist() == [0, 0, 0]
+    assert len(tree.level_order) == 3
+
+def test_persisted_index(tmp_path):
+    traj_file = str(tmp_path / 'hand_traj.csv')
+    with open(traj_file, 'w') as fout:
+        print('transmitter,receiver,time since transmitter infected,day counter', file=fout)
+        for event in FOREST:
+            print(','.join([str(value) for value in event]), file=fout)
+
+    tree = TransmissionTree.from_file(traj_file)
+    loaded = TransmissionTree.from_file(traj_file)
+    for name in TransmissionTree.ARRAYS:
+        assert np.array_equal(getattr(tree, name), getattr(loaded, name))
+    assert tree.cluster_size(tree.ids(['A'])).tolist() == [5]
+    assert tree_file_name(traj_file).endswith('_tree.npz')
+
+def _write_csv_trajectory(traj_file, events):
+    with open(traj_file, 'w') as fout:
+        print('transmitter,receiver,time since transmitter infected,day counter', file=fout)
+        for event in events:
+            print(','.join([str(value) for value in event]), file=fout)
+
+def test_trajectory_reductions(tmp_path):
+    '''The cohort B, C, D, E, G transmits 1, 0, 1, 0, 0 times, with lags of 3 days'''
+    from analysis import trajectory_reductions
+
+    traj_file = str(tmp_path / 'hand_traj.csv')
+    _write_csv_trajectory(traj_file, FOREST)
+    df_events, df_lags = trajectory_reductions(traj_file)
+
+    assert df_events.index.tolist() == [0, 1]
+    assert df_events['empirical frequency'].tolist() == pytest.approx([0.6, 0.4])
+    assert df_lags.index.tolist() == [3]
+    assert df_lags['empirical frequency'].tolist() == pytest.approx([1.0])
+
+@pytest.mark.parametrize('file_format', ['csv', 'binary'])
+def test_empty_trajectory(tmp_path, file_format):
+    '''A trajectory without transmissions, as when the seed recovers without infecting anyone'''
+    from analysis import map_files, trajectory_reductions
+    from graph_growth_classes import TrajectorySink
+
+    traj_file = str(tmp_path / 'empty_traj.{}'.format('bin' if file_format == 'binary' else 'csv'))
+    TrajectorySink(traj_file, file_format).close()
+
+    trajectory = EncodedTrajectory.from_file(traj_file)
+    assert trajectory.n_events == 0
+    assert trajectory.offspring_histogram(200).tolist() == []
+
+    df_events, df_lags = trajectory_reductions(traj_file)
+    assert df_events.index.tolist() == [0]
+    assert np.isnan(df_events['empirical frequency'].iloc[0])
+    assert len(df_lags) == 0
+
+    forest_file = str(tmp_path / 'hand_traj.csv')
+    _write_csv_trajectory(forest_file, FOREST)
+    reductions = map_files(trajectory_reductions, [traj_file, forest_file], n_workers=1)
+    assert len(reductions) == 2
+
+    tree = TransmissionTree.from_trajectory(trajectory)
+    assert len(tree.seeds) == 0
+    assert len(tree.cluster_size()) == 0
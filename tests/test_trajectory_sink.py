@@ -0,0 +1,66 @@
+'''Tests of the trajectory sink of the disease, its opening within the simulation and its two formats
+
+'''
+import contextlib
+import io
+import os
+
+import numpy as np
+import pytest
+
+from graph_growth_classes import Disease, TrajectorySink
+from simulation_templates import DISEASES, EngineOptions, OutputOptions, simulation
+from trajectory_analytics import EncodedTrajectory
+
+WORLD = 'Small World Beta 1p'
+
+def test_sink_opened_on_first_day(tmp_path):
+    traj_file = str(tmp_path / 'traj.csv')
+    disease = Disease('test', transmit_trajectory_file=traj_file, **DISEASES['Virus Y Baseline'])
+    assert not os.path.exists(traj_file)
+
+    disease.open()
+    disease.close()
+    assert open(traj_file).read() == TrajectorySink.header + '\n'
+
+def test_no_trajectory_on_failed_setup(tmp_path):
+    out = str(tmp_path / 'run')
+    with pytest.raises(KeyError):
+        simulation('Virus Y Baseline', 'No Such World', 5, 1, out)
+    assert not os.path.exists(out + '_traj.csv')
+
+@pytest.mark.parametrize('engine', ['object', 'array'])
+def test_binary_trajectory_as_csv(tmp_path, engine):
+    trajectories = []
+    for trajectory_format in ['csv', 'binary']:
+        out = str(tmp_path / trajectory_format)
+        with contextlib.redirect_stdout(io.StringIO()):
+            simulation('Virus Y High Base Transmitter', WORLD, 60, 10, out, seed=4,
+                       engine_options=EngineOptions(engine=engine),
+                       output_options=OutputOptions(report_mode='none', trajectory_format=trajectory_format))
+        extension = 'bin' if trajectory_format == 'binary' else 'csv'
+        trajectories.append(EncodedTrajectory.from_file('{}_traj.{}'.format(out, extension)))
+
+    csv, binary = trajectories
+    assert csv.n_events > 10
+    assert (csv.names[csv.transmitter] == binary.names[binary.transmitter]).all()
+    assert (csv.names[csv.receiver] == binary.names[binary.receiver]).all()
+    assert (csv.lag == binary.lag).all() and (csv.day == binary.day).all()
+
+def test_indeces_of_binary_sink(tmp_path):
+    '''Ids are given in order of first appearance, across days and flushes'''
+    traj_file = str(tmp_path / 'traj.bin')
+    names = ['Person {}'.format(k) for k in range(10)]
+    sink = TrajectorySink(traj_file, 'binary', buffer_size=3)
+    sink.add_indeces(np.array([7, 7, 2]), np.array([2, 4, 9]), np.array([1, 2, 3]), 1, names)
+    sink.end_of_day()
+    sink.add_indeces(np.array([4, 9]), np.array([0, 5]), np.array([1, 1]), 2, names)
+    sink.close()
+
+    trajectory = EncodedTrajectory.from_file(traj_file)
+    assert trajectory.names.tolist() == ['Person 7', 'Person 2', 'Person 4', 'Person 9', 'Person 0', 'Person 5']
+    assert trajectory.names[trajectory.transmitter].tolist() == ['Person 7', 'Person 7', 'Person 2',
+                                                                  'Person 4', 'Person 9']
+    assert trajectory.names[trajectory.receiver].tolist() == ['Person 2', 'Person 4', 'Person 9',
+                                                               'Person 0', 'Person 5']
+    assert trajectory.day.tolist() == [1, 1, 1, 2, 2]
@@ -0,0 +1,51 @@
+'''Tests of the reconstruction of states and state counts from the transition event log against the state and counts
+files of the same simulation
+
+'''
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+from columnar_output import read_state_table, state_file_name
+from simulation_templates import EngineOptions, OutputOptions, simulation
+from transition_log import epidemic_statistics, reconstruct_counts, reconstruct_state_table
+
+SNAPSHOT_DAYS = [3, 12, 25]
+
+def _run(tmp_path, engine, report_mode, **kwargs):
+    out = str(tmp_path / '{}_{}'.format(engine, report_mode))
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulation('Virus Y High Base Transmitter', 'Small World Beta 1p Q Cautious 50_200', 40, 1, out,
+                   seed=3, engine_options=EngineOptions(engine=engine),
+                   output_options=OutputOptions(report_mode=report_mode, trajectory_format=None, **kwargs))
+    return out
+
+@pytest.mark.parametrize('engine', ['object', 'array'])
+def test_reconstructed_state_as_snapshot(tmp_path, engine):
+    pytest.importorskip('pyarrow')
+    out = _run(tmp_path, engine, 'events', snapshot_days=SNAPSHOT_DAYS, state_format='parquet')
+    df_snapshots = read_state_table(state_file_name(out)).drop(columns=['degree', 'expectation_meetings_per_day'])
+
+    assert sorted(df_snapshots['time_coordinate'].unique()) == SNAPSHOT_DAYS
+    for day in SNAPSHOT_DAYS:
+        df_state = reconstruct_state_table(out + '_events.csv', day)
+        df_snapshot = df_snapshots.loc[df_snapshots['time_coordinate'] == day].reset_index(drop=True)
+        pd.testing.assert_frame_equal(df_state, df_snapshot.astype({'name' : str}), check_dtype=False)
+
+@pytest.mark.parametrize('engine', ['object', 'array'])
+def test_reconstructed_counts_as_counts(tmp_path, engine):
+    events_file = _run(tmp_path, engine, 'events') + '_events.csv'
+    df_counts = pd.read_csv(_run(tmp_path, engine, 'counts', report_caution_strata=True) + '_counts.csv')
+    df_reconstructed = reconstruct_counts(events_file, days=df_counts['time_coordinate'].unique(),
+                                          caution_strata=True)
+
+    pd.testing.assert_frame_equal(df_reconstructed, df_counts, check_dtype=False)
+
+    statistics = epidemic_statistics(events_file)
+    df_total = df_counts.groupby('time_coordinate').sum()
+    assert statistics['peak_infected'] == df_total['infected'].max() > 20
+    assert statistics['peak_day'] == df_total['infected'].idxmax()
+    assert statistics['deaths'] == df_total['dead'].iloc[-1]
+    assert statistics['attack_size'] >= df_total['immune'].iloc[-1] + df_total['dead'].iloc[-1]
@@ -0,0 +1,76 @@
+'''Tests of the tables of transition trial probabilities against the distributions they tabulate, and of the trials
+of the disease made from the tables against trials made from the distributions directly
+
+'''
+import pickle
+
+import numpy as np
+import pytest
+from scipy.stats import gamma, norm
+
+from graph_growth_classes import Disease, RandomStream, _TransitionTables
+from simulation_templates import DISEASES
+
+def test_table_as_normal_cdf():
+    tables = _TransitionTables()
+    n_days = np.arange(60)
+
+    assert tables.cdf(n_days, 'recover', 13.0, 3.0) == pytest.approx(norm.cdf(n_days, loc=13.0, scale=3.0),
+                                                                     abs=1e-12)
+    assert tables.cdf(7, 'reveal', 8.0, 2.0) == norm.cdf(7, loc=8.0, scale=2.0)
+    assert tables.last_day('recover', 13.0, 3.0) < 60
+    assert tables.cdf(10 ** 6, 'recover', 13.0, 3.0) == pytest.approx(1.0)
+
+def test_table_of_binned_locations():
+    tables = _TransitionTables(loc_resolution=0.01)
+    n_days = np.arange(40)
+    loc = 13.0 + np.linspace(-4.0, 4.0, 40)
+    expected = norm.cdf(n_days, loc=np.round(loc, 2), scale=3.0)
+
+    assert tables.cdf(n_days, 'recover', loc, 3.0) == pytest.approx(expected, abs=1e-12)
+    assert tables.cdf(n_days, 'recover', loc, 3.0) == pytest.approx(norm.cdf(n_days, loc=loc, scale=3.0), abs=2e-3)
+
+def test_table_of_other_distribution():
+    tables = _TransitionTables({'activate' : (gamma, {'a' : 2.0})})
+    n_days = np.arange(30)
+
+    assert tables.cdf(n_days, 'activate', 1.0, 1.5) == pytest.approx(gamma.cdf(n_days, 2.0, loc=1.0, scale=1.5),
+                                                                     abs=1e-12)
+    assert tables.cdf(n_days, 'reveal', 8.0, 2.0) == pytest.approx(norm.cdf(n_days, loc=8.0, scale=2.0), abs=1e-12)
+
+def test_least_recently_used_tables_evicted():
+    tables = _TransitionTables(max_tables=2)
+    for loc in [3.0, 8.0, 3.0, 13.0]:
+        tables.cdf(5, 'reveal', loc, 1.0)
+
+    assert list(tables._tables) == [('reveal', 300, 1.0), ('reveal', 1300, 1.0)]
+    assert tables.cdf(5, 'reveal', 8.0, 1.0) == norm.cdf(5, loc=8.0, scale=1.0)
+
+def test_tables_not_pickled():
+    tables = _TransitionTables()
+    tables.cdf(5, 'reveal', 8.0, 2.0)
+    tables_copy = pickle.loads(pickle.dumps(tables))
+
+    assert len(tables_copy._tables) == 0
+    assert tables_copy.cdf(5, 'reveal', 8.0, 2.0) == tables.cdf(5, 'reveal', 8.0, 2.0)
+
+def test_trials_from_tables_as_direct_trials():
+    '''The trials draw the same random numbers whatever the source of the probabilities, so with the same seed they
+    have the same outcomes'''
+    params = dict(DISEASES['Virus Y Baseline'])
+    disease_tables = Disease('tables', random_stream=RandomStream(3), **params)
+    disease_direct = Disease('direct', random_stream=RandomStream(3), **params)
+
+    outcomes_tables = []
+    outcomes_direct = []
+    for n_days in range(30):
+        for label, loc, scale in [('activate', 3.0, 1.0), ('reveal', 8.0, 2.0), ('recover', 12.37, 3.0)]:
+            for _ in range(20):
+                outcomes_tables.append(disease_tables._trial(lambda : None, n_days,
+                                                             disease_tables._transition_tables.cdf,
+                                                             {'label' : label, 'loc' : loc, 'scale' : scale}))
+                outcomes_direct.append(disease_direct._trial(lambda : None, n_days, norm.cdf,
+                                                             {'loc' : loc, 'scale' : scale}))
+
+    assert 0 < sum(outcomes_tables) < len(outcomes_tables)
+    assert outcomes_tables == outcomes_direct
@@ -0,0 +1,318 @@
+'''Analytics of the transmission trajectory of a simulation, in which the persons are encoded as integer ids once, such
+that the distribution of the number of transmissions per infected person, the offspring distribution, and of the lag
+from infection of the transmitter to transmission, the generation interval distribution, are counted by `bincount`
+over arrays of ids rather than by grouping on names. The trajectory is a forest of transmission trees, the persisted
+index of which answers queries on clusters, chains, the effective reproduction number and superspreaders
+
+No guarantee of being bug free
+
+'''
+import os
+
+import numpy as np
+import pandas as pd
+
+from graph_growth_classes import TrajectorySink
+from array_engine import csr_rows
+
+TRAJECTORY_COLUMNS = ['transmitter', 'receiver', 'time since transmitter infected', 'day counter']
+
+class EncodedTrajectory():
+    '''Transmission events of a trajectory as arrays, one element per event in the order of the trajectory, with the
+    transmitter and receiver of each event as integer ids into the array of person names
+
+    '''
+    @classmethod
+    def from_file(cls, traj_file):
+        '''Read the transmission trajectory file of a simulation, in the csv or the binary format. The persons of the
+        binary format are integer ids already, the names of the csv format are encoded in one pass over the events'''
+
+        if traj_file.endswith('.bin'):
+            records = np.fromfile(traj_file, dtype=TrajectorySink.binary_dtype)
+            if len(records) == 0:
+                names = np.zeros(0, dtype=object)
+            else:
+                names = pd.read_csv(traj_file + '.names', header=None).iloc[:, 0].to_numpy()
+            return cls(records['transmitter'], records['receiver'], records['time since transmitter infected'],
+                       records['day counter'], names)
+
+        df = pd.read_csv(traj_file, usecols=TRAJECTORY_COLUMNS,
+                         dtype={'transmitter' : str, 'receiver' : str,
+                                'time since transmitter infected' : np.int64, 'day counter' : np.int64})
+        n_events = len(df)
+        ids, names = pd.factorize(np.concatenate([df['transmitter'].to_numpy(), df['receiver'].to_numpy()]))
+
+        return cls(ids[:n_events], ids[n_events:], df['time since transmitter infected'].to_numpy(),
+                   df['day counter'].to_numpy(), np.asarray(names))
+
+    @property
+    def n_events(self):
+        return len(self.transmitter)
+
+    @property
+    def n_persons(self):
+        return len(self.names)
+
+    def cohort(self, nth_infected=None):
+        '''Ids of the persons infected by the earliest `nth_infected` transmission events, by default all events'''
+        return np.unique(self.receiver[:nth_infected])
+
+    def offspring_counts(self):
+        '''Number of transmissions by each person, indexed by id'''
+        return np.bincount(self.transmitter, minlength=self.n_persons)
+
+    def offspring_histogram(self, nth_infected=None):
+        '''Number of persons of the early infected cohort by their number of transmissions, the element k of which is
+        the number of persons of the cohort that transmitted k times'''
+        return np.bincount(self.offspring_counts()[self.cohort(nth_infected)])
+
+    def generation_interval_histogram(self, nth_infected=None):
+        '''Number of transmissions by persons of the early infected cohort by the time since the transmitter was
+        infected, the element t of which is the number of transmissions t days after infection of the transmitter'''
+
+        in_cohort = np.zeros(self.n_persons, dtype=bool)
+        in_cohort[self.cohort(nth_infected)] = True
+
+        return np.bincount(self.lag[in_cohort[self.transmitter]])
+
+    def __init__(self, transmitter, receiver, lag, day, names):
+
+        self.transmitter = np.asarray(transmitter, dtype=np.int64)
+        self.receiver = np.asarray(receiver, dtype=np.int64)
+        self.lag = np.asarray(lag, dtype=np.int64)
+        self.day = np.asarray(day, dtype=np.int64)
+        self.names = names
+
+def frequencies(histogram):
+    '''Empirical frequencies of a histogram of counts'''
+    total = histogram.sum()
+    if total == 0:
+        return np.zeros(len(histogram), dtype=float)
+
+    return histogram / total
+
+def ensemble_mean(histograms):
+    '''Mean over the ensemble of histograms, or of frequencies, of different lengths, where a histogram counts zero
+    beyond its length'''
+
+    n_bins = max([len(histogram) for histogram in histograms])
+    padded = np.zeros((len(histograms), n_bins), dtype=float)
+    for k, histogram in enumerate(histograms):
+        padded[k, :len(histogram)] = histogram
+
+    return padded.mean(axis=0)
+
+def offspring_distribution(traj_files, nth_infected=None):
+    '''Ensemble mean of the offspring frequencies of the early infected cohorts of the trajectory files'''
+    histograms = []
+    for traj_file in traj_files:
+        trajectory = EncodedTrajectory.from_file(traj_file)
+        histograms.append(frequencies(trajectory.offspring_histogram(nth_infected)))
+
+    return ensemble_mean(histograms)
+
+def generation_interval_distribution(traj_files, nth_infected=None):
+    '''Ensemble mean of the generation interval frequencies of the early infected cohorts of the trajectory files'''
+    histograms = []
+    for traj_file in traj_files:
+        trajectory = EncodedTrajectory.from_file(traj_file)
+        histograms.append(frequencies(trajectory.generation_interval_histogram(nth_infected)))
+
+    return ensemble_mean(histograms)
+
+def tree_file_name(traj_file):
+    '''Name of the file of the transmission tree index of the trajectory file of given name'''
+    return traj_file + '_tree.npz'
+
+class TransmissionTree():
+    '''Index of the forest of transmission trees of a trajectory, over the persons of the trajectory by id. The index
+    holds the parent of each person, or -1 for a seed case, the depth of each person below its seed case, the day of
+    infection of each person and the children of each person in compressed sparse row layout, where the children of
+    person i are `children[child_offsets[i]:child_offsets[i + 1]]`. The persons ordered by depth, `level_order`, with
+    the offsets of each depth, `level_offsets`, give the subtree size and height of each person, from which the
+    queries are answered without a pass over the events
+
+    '''
+    ARRAYS = ['names', 'parent', 'depth', 'infection_day', 'child_offsets', 'children', 'level_order', 'level_offsets',
+              'subtree_size', 'height']
+
+    @classmethod
+    def from_trajectory(cls, trajectory):
+        '''Build the index of an encoded trajectory. The parent of a person is the transmitter of the first
+        transmission to the person, unless the person transmitted before, as a seed case does. Later transmissions to
+        a person, after recovery without immunity, are not part of the forest. The first transmission to a person
+        comes after the first transmission to its parent, so the forest has no cycles. The day of infection of a seed
+        case is the day of its first transmission less the time since it was infected'''
+
+        n_persons = trajectory.n_persons
+        n_events = trajectory.n_events
+        arrays = {'names' : np.asarray(trajectory.names).astype(str)}
+
+        transmitters, first_transmit = np.unique(trajectory.transmitter, return_index=True)
+        first_transmit_of = np.full(n_persons, n_events, dtype=np.int64)
+        first_transmit_of[transmitters] = first_transmit
+
+        receivers, first_receive = np.unique(trajectory.receiver, return_index=True)
+        infected_by_transmission = first_receive < first_transmit_of[receivers]
+        receivers = receivers[infected_by_transmission]
+        first_receive = first_receive[infected_by_transmission]
+
+        parent = np.full(n_persons, -1, dtype=np.int64)
+        parent[receivers] = trajectory.transmitter[first_receive]
+        infection_day = np.zeros(n_persons, dtype=np.int64)
+        infection_day[transmitters] = trajectory.day[first_transmit] - trajectory.lag[first_transmit]
+        infection_day[receivers] = trajectory.day[first_receive]
+        arrays['parent'] = parent
+        arrays['infection_day'] = infection_day
+
+        children = np.flatnonzero(parent >= 0)
+        child_offsets = np.zeros(n_persons + 1, dtype=np.int64)
+        np.cumsum(np.bincount(parent[children], minlength=n_persons), out=child_offsets[1:])
+        arrays['children'] = children[np.argsort(parent[children], kind='stable')]
+        arrays['child_offsets'] = child_offsets
+
+        # Descend from the seed cases one depth at a time
+        depth = np.zeros(n_persons, dtype=np.int64)
+        level = np.flatnonzero(parent < 0)
+        levels = []
+        while len(level) > 0:
+            levels.append(level)
+            level = arrays['children'][csr_rows(child_offsets, level)[0]]
+            depth[level] = len(levels)
+        arrays['depth'] = depth
+        arrays['level_order'] = np.concatenate(levels) if len(levels) > 0 else np.zeros(0, dtype=np.int64)
+        if len(arrays['level_order']) != n_persons:
+            raise RuntimeError('Transmissions of trajectory do not form a forest')
+        arrays['level_offsets'] = np.cumsum([0] + [len(level) for level in levels]).astype(np.int64)
+
+        # Ascend from the deepest persons one depth at a time
+        subtree_size = np.ones(n_persons, dtype=np.int64)
+        height = np.zeros(n_persons, dtype=np.int64)
+        for level in levels[:0:-1]:
+            np.add.at(subtree_size, parent[level], subtree_size[level])
+            np.maximum.at(height, parent[level], height[level] + 1)
+        arrays['subtree_size'] = subtree_size
+        arrays['height'] = height
+
+        return cls(arrays)
+
+    @classmethod
+    def from_file(cls, traj_file, rebuild=False):
+        '''Index of a trajectory file, read from the index file if it is at least as recent as the trajectory file,
+        else built from the trajectory file and saved to the index file'''
+
+        tree_file = tree_file_name(traj_file)
+        if not rebuild and os.path.isfile(tree_file) and os.path.getmtime(tree_file) >= os.path.getmtime(traj_file):
+            return cls.load(tree_file)
+
+        tree = cls.from_trajectory(EncodedTrajectory.from_file(traj_file))
+        tree.save(tree_file)
+
+        return tree
+
+    @classmethod
+    def load(cls, file_name):
+        '''Read index from file'''
+        with np.load(file_name) as data:
+            return cls(dict([(name, data[name]) for name in cls.ARRAYS]))
+
+    def save(self, file_name):
+        '''Write index to file, by way of a temporary file'''
+        tmp_file_name = '{}.tmp{}.npz'.format(file_name[:-len('.npz')], os.getpid())
+        np.savez(tmp_file_name, **dict([(name, getattr(self, name)) for name in self.ARRAYS]))
+        os.replace(tmp_file_name, file_name)
+
+    @property
+    def n_persons(self):
+        return len(self.parent)
+
+    @property
+    def seeds(self):
+        '''Ids of the seed cases, the roots of the transmission trees'''
+        return self.level_order[self.level_offsets[0]:self.level_offsets[min(1, len(self.level_offsets) - 1)]]
+
+    @property
+    def offspring(self):
+        '''Number of persons of the forest infected by each person'''
+        return np.diff(self.child_offsets)
+
+    def ids(self, names):
+        '''Ids of persons of given names'''
+        if self._name_index is None:
+            self._name_index = pd.Index(self.names)
+        ids = self._name_index.get_indexer(np.atleast_1d(names))
+        if np.any(ids < 0):
+            raise KeyError('Persons not in trajectory: {}'.format(np.atleast_1d(names)[ids < 0]))
+
+        return ids
+
+    def children_of(self, person):
+        '''Ids of the persons infected by person of given id'''
+        return self.children[self.child_offsets[person]:self.child_offsets[person + 1]]
+
+    def root_of(self, persons):
+        '''Ids of the seed cases of the trees of persons of given ids'''
+        roots = np.array(persons, dtype=np.int64)
+        for _ in range(self.depth[roots].max(initial=0)):
+            roots = np.where(self.parent[roots] >= 0, self.parent[roots], roots)
+
+        return roots
+
+    def cluster_size(self, persons=None):
+        '''Number of persons infected downstream of persons of given ids, the persons included, by default of every
+        seed case'''
+        if persons is None:
+            persons = self.seeds
+        return self.subtree_size[persons]
+
+    def chain_length(self, persons=None):
+        '''Number of transmissions of the longest chain of transmissions from persons of given ids, by default of
+        every seed case'''
+        if persons is None:
+            persons = self.seeds
+        return self.height[persons]
+
+    def chain_length_histogram(self):
+        '''Number of persons that are ends of chains of transmissions, persons who infected no one, by the number of
+        transmissions from their seed case'''
+        return np.bincount(self.depth[self.offspring == 0])
+
+    def effective_reproduction_number(self):
+        '''Effective reproduction number by cohort of infection, the mean number of transmissions by the persons
+        infected on each day, from the first day of infection. Cohorts without persons are NaN. The cohorts of the last
+        days of the trajectory are censored, since their transmissions after the end of the trajectory are missing'''
+
+        day_first = self.infection_day.min(initial=0)
+        cohort = self.infection_day - day_first
+        n_cohort = np.bincount(cohort)
+        n_transmits = np.bincount(cohort, weights=self.offspring)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            r_t = n_transmits / n_cohort
+
+        return pd.Series(r_t, index=pd.RangeIndex(day_first, day_first + len(r_t), name='infection day'),
+                         name='R_t')
+
+    def superspreaders(self, n_top=10, by='offspring'):
+        '''Persons ranked by their number of transmissions, `by='offspring'`, or by the size of the cluster they seeded,
+        `by='cluster'`, the top `n_top` of them'''
+
+        if by == 'offspring':
+            score = self.offspring
+        elif by == 'cluster':
+            score = self.subtree_size - 1
+        else:
+            raise ValueError('Unknown superspreader ranking: {}'.format(by))
+
+        top = np.argpartition(-score, n_top)[:n_top] if n_top < len(score) else np.arange(len(score))
+        top = top[np.argsort(-score[top], kind='stable')]
+
+        return pd.DataFrame({'name' : self.names[top], 'offspring' : self.offspring[top],
+                             'cluster size' : self.subtree_size[top], 'depth' : self.depth[top],
+                             'infection day' : self.infection_day[top]},
+                            index=pd.Index(top, name='id'))
+
+    def __init__(self, arrays):
+
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self._name_index = None
@@ -0,0 +1,189 @@
+'''Log of the state transition events of the persons of a simulation, and reconstruction of the state of the persons
+and of the state counts at any day and of summary statistics of the epidemic from the log
+
+No guarantee of being bug free
+
+'''
+import numpy as np
+import pandas as pd
+
+from graph_growth_classes import NO_TIME_STAMP
+from array_engine import ArrayWorld, Population, TRANSITION_LABELS
+
+def persons_file_name(events_file):
+    '''Name of the persons file that accompanies an events file'''
+    if not events_file.endswith('_events.csv'):
+        raise ValueError('Events file name {} does not end with _events.csv'.format(events_file))
+    return events_file[:-len('_events.csv')] + '_persons.csv'
+
+class TransitionEventLog():
+    '''Log of the state transition events of the persons of a world, written as one line of person id, transition
+    label and day per event to the events file. The persons are written once to the persons file, with their id,
+    name and predispositions, when the log is attached to the world. Transitions the persons made before the log was
+    attached are logged at attachment, by day and in the order of the transition labels. Events are buffered in memory
+    and written in bulk when the buffer reaches a size threshold and on close
+
+    '''
+    def attach(self, world):
+        '''Attach log to the persons of a world, either a `World` of `Person` objects or an `ArrayWorld`'''
+
+        if isinstance(world, ArrayWorld):
+            pop = world.population
+            names = pop.names
+            caution_interaction = pop.caution_interaction
+            general_health = pop.general_health
+            time_stamps = pop.time_stamp
+            pop.add_transition_observer(self._population_transition)
+
+        else:
+            persons = list(world.social_graph.nodes)
+            self._person_ids = dict([(person, k) for k, person in enumerate(persons)])
+            names = [person.name for person in persons]
+            caution_interaction = [person.caution_interaction for person in persons]
+            general_health = [person.general_health for person in persons]
+            time_stamps = np.array([[NO_TIME_STAMP if person.get_time_stamp(label) is None
+                                     else person.get_time_stamp(label) for person in persons]
+                                    for label in TRANSITION_LABELS], dtype=np.int64)
+            for person in persons:
+                person.add_transition_observer(self._person_transition)
+
+        pd.DataFrame({'person' : np.arange(len(names)), 'name' : names,
+                      'caution_interaction' : caution_interaction,
+                      'general_health' : general_health}).to_csv(self.persons_file, index=False)
+
+        k_label, k_person = np.nonzero(time_stamps != NO_TIME_STAMP)
+        days = time_stamps[k_label, k_person]
+        for k in np.lexsort((k_label, days)):
+            self._buffer.append((k_person[k], TRANSITION_LABELS[k_label[k]], days[k]))
+
+    def _person_transition(self, person, label):
+        self._buffer.append((self._person_ids[person], label, person.get_time_stamp(label)))
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def _population_transition(self, pop, label, inds):
+        for k_person in np.atleast_1d(inds):
+            self._buffer.append((k_person, label, pop.time_coordinate))
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        '''Write buffered events to file'''
+        if len(self._buffer) > 0:
+            self._fout.write(''.join(['{},{},{}\n'.format(*event) for event in self._buffer]))
+            self._fout.flush()
+            self._buffer = []
+
+    def close(self):
+        '''Flush buffered events and close file'''
+        if not self._fout.closed:
+            self.flush()
+            self._fout.close()
+
+    def __getstate__(self):
+        '''State of the log without the open events file, after the buffered events are flushed'''
+        self.flush()
+        state = self.__dict__.copy()
+        state.pop('_fout')
+        return state
+
+    def __setstate__(self, state):
+        '''Restore state of the log and reopen its events file for appending'''
+        self.__dict__.update(state)
+        self._fout = open(self.events_file, 'a')
+
+    def __init__(self, events_file, buffer_size=10000):
+
+        self.events_file = events_file
+        self.persons_file = persons_file_name(events_file)
+        self.buffer_size = buffer_size
+        self._buffer = []
+
+        self._fout = open(events_file, 'w')
+        print('person,transition,day', file=self._fout)
+        self._fout.flush()
+
+def read_transition_log(events_file):
+    '''Read the persons and the events of a transition event log into two DataFrames'''
+    df_persons = pd.read_csv(persons_file_name(events_file))
+    df_events = pd.read_csv(events_file)
+
+    return df_persons, df_events
+
+def _replay(pop, df_events, start, end):
+    '''Make the state transitions of the events of the given row range in the population, in order of the log, with
+    consecutive events of the same day and label made together'''
+
+    days = df_events['day'].to_numpy()[start:end]
+    labels = df_events['transition'].to_numpy()[start:end]
+    persons = df_events['person'].to_numpy()[start:end]
+    if len(days) == 0:
+        return
+
+    run_starts = np.flatnonzero(np.concatenate([[True], (days[1:] != days[:-1]) | (labels[1:] != labels[:-1])]))
+    run_ends = np.append(run_starts[1:], len(days))
+    for run_start, run_end in zip(run_starts, run_ends):
+        pop.time_coordinate = int(days[run_start])
+        pop.transition(labels[run_start], persons[run_start:run_end])
+
+def _reconstructed_world(events_file, delete_dead_from_social_graph):
+    '''World without edges of a population of the persons of the log, in which no transition is made yet'''
+
+    df_persons, df_events = read_transition_log(events_file)
+    pop = Population(names=df_persons['name'],
+                     caution_interaction=df_persons['caution_interaction'],
+                     general_health=df_persons['general_health'])
+    world = ArrayWorld('reconstructed', pop, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                       np.zeros(0), delete_dead_from_social_graph=delete_dead_from_social_graph)
+
+    return world, df_events
+
+def reconstruct_state_table(events_file, day, delete_dead_from_social_graph=False):
+    '''Reconstruct the state of all persons at the end of a given day from a transition event log, in the layout of
+    `World.report_table` without the columns of the social graph. Set `delete_dead_from_social_graph` as in the
+    world of the simulation to leave out dead persons as the simulation did
+
+    '''
+    world, df_events = _reconstructed_world(events_file, delete_dead_from_social_graph)
+    _replay(world.population, df_events, 0, np.searchsorted(df_events['day'].to_numpy(), day, side='right'))
+    world.population.time_coordinate = day
+
+    return world.report_table().drop(columns=['degree', 'expectation_meetings_per_day'])
+
+def reconstruct_counts(events_file, days=None, caution_strata=False, delete_dead_from_social_graph=False):
+    '''Reconstruct the number of persons in each disease state at the end of the given days, by default every day from
+    the first to the last day of the log, from a transition event log, in the layout of `World.report_counts`. Set
+    `delete_dead_from_social_graph` as in the world of the simulation to count persons as the simulation did
+
+    '''
+    world, df_events = _reconstructed_world(events_file, delete_dead_from_social_graph)
+    event_days = df_events['day'].to_numpy()
+    if days is None:
+        days = range(event_days.min(), event_days.max() + 1) if len(event_days) > 0 else [0]
+
+    dfs_counts = []
+    k_event = 0
+    for day in sorted(days):
+        k_event_next = np.searchsorted(event_days, day, side='right')
+        _replay(world.population, df_events, k_event, k_event_next)
+        k_event = k_event_next
+        world.population.time_coordinate = day
+        dfs_counts.append(world.report_counts(caution_strata))
+
+    return pd.concat(dfs_counts, ignore_index=True)
+
+def epidemic_statistics(events_file):
+    '''Summary statistics of the epidemic of a simulation from its transition event log: the peak number of infected
+    persons, the first day of the peak, the final attack size, which is the number of persons ever infected, and the
+    number of deaths
+
+    '''
+    df_counts = reconstruct_counts(events_file)
+    k_peak = df_counts['infected'].to_numpy().argmax()
+    _, df_events = read_transition_log(events_file)
+    transitions = df_events['transition']
+
+    return {'peak_infected' : int(df_counts['infected'].iloc[k_peak]),
+            'peak_day' : int(df_counts['time_coordinate'].iloc[k_peak]),
+            'attack_size' : int(df_events.loc[transitions == 'infect', 'person'].nunique()),
+            'deaths' : int((transitions == 'succumb').sum())}